@@ -54,6 +54,34 @@ class MongoDB:
                 detail=f"Unable to access auth collection: {str(e)}"
             )     
                  
+    def get_jobs_collection(self):
+        try:
+            if not self.mongodb_client:
+                raise HTTPException(
+                    status_code=503,
+                    detail="MongoDB client is not connected."
+                )
+            return self.mongodb_client[settings.MONGODB_DB_NAME][settings.MONGODB_JOBS_COLLECTION_NAME]
+        except Exception as e:
+            raise HTTPException(
+                status_code=500,
+                detail=f"Unable to access jobs collection: {str(e)}"
+            )
+
+    def get_documents_collection(self):
+        try:
+            if not self.mongodb_client:
+                raise HTTPException(
+                    status_code=503,
+                    detail="MongoDB client is not connected."
+                )
+            return self.mongodb_client[settings.MONGODB_DB_NAME][settings.MONGODB_DOCUMENTS_COLLECTION_NAME]
+        except Exception as e:
+            raise HTTPException(
+                status_code=500,
+                detail=f"Unable to access documents collection: {str(e)}"
+            )
+
     def disconnect(self):
         try:
             if self.mongodb_client:
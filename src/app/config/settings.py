@@ -14,6 +14,106 @@ class Settings(BaseSettings):
     UNSTRUCTURED_API_URL: str
     UNSTRUCTURED_API_KEY: str
 
+    # Per-provider ingestion budgets, refilled continuously over one minute.
+    PINECONE_INFERENCE_TOKENS_PER_MINUTE: int = 250000
+    GEMINI_REQUESTS_PER_MINUTE: int = 60
+    UNSTRUCTURED_REQUESTS_PER_MINUTE: int = 20
+
+    # Background ingestion jobs.
+    INGESTION_WORKER_CONCURRENCY: int = 2
+    # A document claimed for ingestion longer ago than this is assumed abandoned by a crashed worker.
+    DOCUMENT_INGESTION_STALE_SECONDS: float = 3600.0
+    INGESTION_SPOOL_DIR: str = "ingestion_spool"
+    MONGODB_JOBS_COLLECTION_NAME: str = "ingestion_jobs"
+    # Ingested documents by content hash, with the ids of their chunks and images.
+    MONGODB_DOCUMENTS_COLLECTION_NAME: str = "documents"
+
+    # Number of 50-chunk batches embedded/upserted concurrently during ingestion.
+    EMBED_UPSERT_WINDOW: int = 4
+
+    # Query embedding cache; the shared tier lives in MongoDB.
+    QUERY_EMBEDDING_CACHE_SIZE: int = 4096
+    QUERY_EMBEDDING_CACHE_TTL_SECONDS: int = 3600
+    QUERY_EMBEDDING_SHARED_CACHE: bool = False
+    MONGODB_EMBEDDING_CACHE_COLLECTION_NAME: str = "query_embedding_cache"
+
+    # Semantic answer cache: a query within the similarity threshold of a cached one reuses its answer,
+    # unless the two differ in a number or capitalised name (see SemanticAnswerCache.lookup).
+    # Off by default: 0.95 is a conservative starting point, not tuned on this corpus, where
+    # queries differing only in a year or company can exceed it.
+    ANSWER_CACHE_ENABLED: bool = False
+    ANSWER_CACHE_SIMILARITY_THRESHOLD: float = 0.95
+    ANSWER_CACHE_TTL_SECONDS: int = 86400
+    ANSWER_CACHE_DIR: str = "answer_cache"
+
+    # Cascade reranking: local scores from dense, BM25 and RRF signals decide which candidates
+    # the remote cross-encoder scores. Remote scores are cached by (query hash, chunk hash).
+    # Off until the weights and thresholds are tuned with src/testing/cascade_rerank_eval.py.
+    CASCADE_RERANK_ENABLED: bool = False
+    CASCADE_DENSE_WEIGHT: float = 0.4
+    CASCADE_SPARSE_WEIGHT: float = 0.3
+    CASCADE_RRF_WEIGHT: float = 0.3
+    CASCADE_MARGIN: float = 0.1
+    CASCADE_ACCEPT_SCORE: float = 0.6
+    RERANK_SCORE_CACHE_SIZE: int = 50000
+
+    # Local query planner; train the model with python -m src.testing.train_query_planner.
+    # Off by default: leave-one-out recall on multi-passage questions is only 0.62 (25/40) at
+    # these settings, and the effect of skipped decompositions on answer quality is unmeasured.
+    QUERY_PLANNER_ENABLED: bool = False
+    QUERY_PLANNER_MODEL_PATH: str = "query_planner_model.json"
+    QUERY_PLANNER_DECOMPOSE_THRESHOLD: float = 0.3
+    # Queries of at most this many words skip decomposition without the classifier; 0 disables the rule.
+    QUERY_PLANNER_SHORT_QUERY_WORDS: int = 0
+    # In-process cache of decompositions by normalized query.
+    QUERY_DECOMPOSITION_CACHE_SIZE: int = 2048
+    QUERY_DECOMPOSITION_CACHE_TTL_SECONDS: int = 86400
+
+    # Retrieve the raw query while it is decomposed, and reuse the results if it comes back unchanged.
+    SPECULATIVE_RETRIEVAL_ENABLED: bool = True
+
+    # Per-source retrieval timeouts for the sub-query fan-out.
+    RETRIEVAL_DENSE_TIMEOUT_SECONDS: float = 5.0
+    RETRIEVAL_SPARSE_TIMEOUT_SECONDS: float = 5.0
+    RETRIEVAL_IMAGES_TIMEOUT_SECONDS: float = 5.0
+
+    # Chunk sizing: "characters", or "tokens" to read chunk_size and chunk_overlap as token counts.
+    CHUNK_SIZE_UNIT: str = "characters"
+    # Tokenizer for token-aware chunking and embedding budgets: "whitespace", "regex" or "hf:<name>".
+    # The default is an approximation that undercounts subword tokens and does NOT prevent
+    # truncation: chunks may still exceed EMBEDDING_MAX_INPUT_TOKENS. For exact counts, set
+    # "hf:<tokenizer of the embedding model>" (needs the `tokenizers` package).
+    CHUNK_TOKENIZER: str = "whitespace"
+    # llama-text-embed-v2 truncates inputs beyond this many tokens.
+    EMBEDDING_MAX_INPUT_TOKENS: int = 2048
+
+    # PDF to markdown conversion. 0 processes converts in a thread of the server process.
+    PDF_CONVERSION_PROCESSES: int = 4
+    PDF_CONVERSION_PAGES_PER_TASK: int = 8
+    PDF_CONVERSION_TIMEOUT_SECONDS: float = 600.0
+    # Stream converted page ranges into the chunker instead of converting the whole PDF first.
+    # Gives the same chunks; src/testing/pdf_conversion_check.py compares the two.
+    PDF_STREAMING_CONVERSION: bool = True
+
+    # BM25 corpus statistics, updated per ingested document; imported once from the legacy pickle.
+    BM25_STATS_PATH: str = "bm25_stats.bin"
+    BM25_LEGACY_MODEL_PATH: str = "bm25_model.pkl"
+    # Worker processes for batch BM25 tokenization; 0 tokenizes in the calling process.
+    BM25_ENCODER_PROCESSES: int = 0
+
+    # "pinecone" or "local". The local backends run fully offline (see VectorStoreRegistry).
+    VECTOR_STORE_BACKEND: str = "pinecone"
+    INFERENCE_BACKEND: str = "pinecone"
+    LOCAL_VECTOR_INDEX_DIR: str = "local_vector_index"
+    # "flat" (exact scan) or "hnsw" (approximate graph search) for the local dense indexes.
+    # The graph is only built once a namespace holds HNSW_MIN_ROWS vectors; smaller ones are
+    # faster to scan exactly.
+    LOCAL_VECTOR_INDEX_TYPE: str = "flat"
+    HNSW_MIN_ROWS: int = 50000
+    HNSW_M: int = 16
+    HNSW_EF_CONSTRUCTION: int = 200
+    HNSW_EF_SEARCH: int = 64
+
     class Config:
         env_file = "src/.env"
 
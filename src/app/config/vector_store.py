@@ -0,0 +1,141 @@
+import asyncio
+import os
+from typing import Dict, Optional
+from fastapi import HTTPException
+from pinecone import PineconeAsyncio
+from src.app.config.settings import settings
+from src.app.services.local_inference import LocalInference
+from src.app.services.local_sparse_index import LocalSparseIndex
+from src.app.services.local_vector_index import LocalVectorIndex
+
+
+class VectorStoreRegistry:
+    def __init__(self, api_key: str, vector_store_backend: str = "pinecone", inference_backend: str = "pinecone", local_index_dir: str = "local_vector_index", local_index_type: str = "flat", hnsw_params: Optional[Dict] = None) -> None:
+        """
+        Application-scoped vector store clients. One PineconeAsyncio client and one IndexAsyncio
+        session per index are opened lazily and reused, so the request path only makes
+        data-plane calls once an index has been resolved.
+
+        With vector_store_backend="local", indexes are persisted under `local_index_dir`: dense
+        ones as LocalVectorIndex (exact search, or HNSW with local_index_type="hnsw") and sparse
+        ones as LocalSparseIndex. With inference_backend="local", embed/rerank use LocalInference.
+        With both set to "local" the ingest and query paths need no network access to Pinecone.
+        """
+        for backend in (vector_store_backend, inference_backend):
+            if backend not in ("pinecone", "local"):
+                raise ValueError(f"Unknown vector store backend '{backend}'.")
+        self.api_key = api_key
+        self.vector_store_backend = vector_store_backend
+        self.inference_backend = inference_backend
+        self.local_index_dir = local_index_dir
+        self.local_index_type = local_index_type
+        self.hnsw_params = hnsw_params
+        self.client: Optional[PineconeAsyncio] = None
+        self.local_inference: Optional[LocalInference] = None
+        self.connected = False
+        self.index_hosts: Dict[str, str] = {}
+        self.indexes: Dict[str, object] = {}
+        self._index_lock: Optional[asyncio.Lock] = None
+
+    async def connect(self):
+        try:
+            if "pinecone" in (self.vector_store_backend, self.inference_backend):
+                self.client = PineconeAsyncio(api_key=self.api_key)
+            if self.inference_backend == "local":
+                self.local_inference = LocalInference()
+            self._index_lock = asyncio.Lock()
+            self.connected = True
+        except Exception as e:
+            raise HTTPException(
+                status_code=500,
+                detail=f"Unable to create Pinecone client: {str(e)}"
+            )
+
+    def get_registry(self):
+        if not self.connected:
+            raise HTTPException(
+                status_code=503,
+                detail="Vector store registry is not connected."
+            )
+        return self
+
+    @property
+    def inference(self):
+        self.get_registry()
+        if self.inference_backend == "local":
+            return self.local_inference
+        return self.client.inference
+
+    async def get_index(self, index_name: str, create_kwargs: Optional[Dict] = None):
+        """
+        Returns a cached index handle for `index_name`.
+
+        Args:
+            index_name (str): Name of the index.
+            create_kwargs (Dict, optional): Arguments for create_index. If given, a missing
+                index is created; otherwise a missing index raises ValueError.
+        """
+        if index_name in self.indexes:
+            return self.indexes[index_name]
+
+        self.get_registry()
+        async with self._index_lock:
+            # Another request may have resolved it while we were waiting.
+            if index_name in self.indexes:
+                return self.indexes[index_name]
+
+            if self.vector_store_backend == "local":
+                self.indexes[index_name] = await self._get_local_index(index_name, create_kwargs)
+                return self.indexes[index_name]
+
+            if not await self.client.has_index(index_name):
+                if create_kwargs is None:
+                    raise ValueError(f"Index '{index_name}' does not exist.")
+                print(f"Index '{index_name}' not found. Creating index...")
+                await self.client.create_index(name=index_name, **create_kwargs)
+                print("Index created successfully.")
+
+            index_info = await self.client.describe_index(name=index_name)
+            self.index_hosts[index_name] = index_info.host
+            self.indexes[index_name] = self.client.IndexAsyncio(host=index_info.host)
+            return self.indexes[index_name]
+
+    async def _get_local_index(self, index_name: str, create_kwargs: Optional[Dict]):
+        directory = os.path.join(self.local_index_dir, index_name)
+        if not os.path.isdir(directory) and create_kwargs is None:
+            raise ValueError(f"Index '{index_name}' does not exist.")
+        if (create_kwargs or {}).get("vector_type") == "sparse" or LocalSparseIndex.is_sparse_index(directory):
+            return await asyncio.to_thread(LocalSparseIndex, directory)
+        dimension = (create_kwargs or {}).get("dimension")
+        return await asyncio.to_thread(LocalVectorIndex, directory, dimension, self.local_index_type, self.hnsw_params)
+
+    async def disconnect(self):
+        try:
+            for index in self.indexes.values():
+                await index.close()
+            self.indexes = {}
+            if self.client:
+                await self.client.close()
+                self.client = None
+            self.connected = False
+        except Exception as e:
+            raise HTTPException(
+                status_code=500,
+                detail=f"Unable to close Pinecone clients: {str(e)}"
+            )
+
+
+# Instantiate the registry; connected in the FastAPI lifespan.
+vector_store_registry = VectorStoreRegistry(
+    settings.PINECONE_API_KEY,
+    vector_store_backend=settings.VECTOR_STORE_BACKEND,
+    inference_backend=settings.INFERENCE_BACKEND,
+    local_index_dir=settings.LOCAL_VECTOR_INDEX_DIR,
+    local_index_type=settings.LOCAL_VECTOR_INDEX_TYPE,
+    hnsw_params={
+        "m": settings.HNSW_M,
+        "ef_construction": settings.HNSW_EF_CONSTRUCTION,
+        "ef_search": settings.HNSW_EF_SEARCH,
+        "min_rows": settings.HNSW_MIN_ROWS,
+    },
+)
@@ -1,19 +1,26 @@
+from typing import Optional
 from fastapi import Depends
-from src.app.usecases.file_processing_usecase import FileProcessingUsecase
+from src.app.usecases.ingestion_job_usecase import IngestionJobUsecase
 from src.app.usecases.retrieval_and_response_usecase import RetrievalAndResponseUsecase
 
 
 
 class FileuploadController:
-    def __init__(self, file_upload_usecase = Depends(FileProcessingUsecase), retrieval_and_response_usecase = Depends(RetrievalAndResponseUsecase)) -> None:
-        self.file_upload_usecase = file_upload_usecase
+    def __init__(self, ingestion_job_usecase = Depends(IngestionJobUsecase), retrieval_and_response_usecase = Depends(RetrievalAndResponseUsecase)) -> None:
+        self.ingestion_job_usecase = ingestion_job_usecase
         self.retrieval_and_response_usecase = retrieval_and_response_usecase
         
         
-    async def process_file(self,file_bytes : bytes,chunk_size,chunk_overlap ):
-        return await self.file_upload_usecase.process_file_storage(file_bytes, chunk_size, chunk_overlap)
+    async def process_file(self,file_bytes : bytes,chunk_size,chunk_overlap, document_key: Optional[str] = None):
+        return await self.ingestion_job_usecase.enqueue_file(file_bytes, chunk_size, chunk_overlap, document_key)
+    
+    async def get_job(self, job_id: str):
+        return await self.ingestion_job_usecase.get_job(job_id)
     
     async def generate_response(self, query : str):
         return await self.retrieval_and_response_usecase.retrieve_and_generate(query)
+
+    def stream_response(self, query : str):
+        return self.retrieval_and_response_usecase.stream_retrieve_and_generate(query)
     
         
\ No newline at end of file
@@ -16,13 +16,29 @@ from fastapi import FastAPI, UploadFile
 from pydantic import BaseModel
 from src.app.routes.rag_route import file_upload_router
 from src.app.config.database import mongodb_database
+from src.app.repositories.documents_repository import DocumentRepo
+from src.app.config.vector_store import vector_store_registry
+from src.app.usecases.ingestion_job_usecase import ingestion_worker_pool
+from src.app.services.sparse_embedding_service import SparseEmbeddingsService
+from src.app.services.bm25_batch_encoder import bm25_batch_encoder
+from src.app.services.file_conversion_service import pdf_conversion_pool
+from src.app.utils.answer_cache import semantic_answer_cache
 from contextlib import asynccontextmanager
 
 
 @asynccontextmanager
 async def db_lifespan(app: FastAPI):
     mongodb_database.connect()
+    await DocumentRepo(mongodb_database.get_documents_collection()).ensure_indexes()
+    await vector_store_registry.connect()
+    await asyncio.to_thread(SparseEmbeddingsService.preload)
+    await ingestion_worker_pool.start()
     yield
+    await ingestion_worker_pool.stop()
+    bm25_batch_encoder.shutdown()
+    pdf_conversion_pool.shutdown()
+    await semantic_answer_cache.close()
+    await vector_store_registry.disconnect()
     mongodb_database.disconnect()
 
 
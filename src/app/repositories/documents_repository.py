@@ -0,0 +1,156 @@
+from datetime import datetime, timedelta, timezone
+from typing import Dict, Iterable, List, Optional, Set
+from fastapi import Depends
+from pymongo import ReturnDocument
+from pymongo.errors import DuplicateKeyError
+from src.app.config.database import mongodb_database
+
+DOCUMENT_INGESTING = "ingesting"
+DOCUMENT_INGESTED = "ingested"
+DOCUMENT_FAILED = "failed"
+# Counter bumped whenever ingestion changes the indexes; stored next to the documents.
+INDEX_GENERATION_KEY = "__index_generation__"
+# Ids dropped by a version while another document was ingesting; deleted by a later version.
+DEFERRED_DELETIONS_KEY = "__deferred_deletions__"
+
+
+class DocumentRepo:
+    def __init__(self, collection = Depends(mongodb_database.get_documents_collection)):
+        self.collection = collection
+
+    async def ensure_indexes(self):
+        # Reference checks look documents up by the chunk and image ids they contain.
+        await self.collection.create_index("chunk_ids")
+        await self.collection.create_index("image_ids")
+        await self.collection.create_index("content_sha256")
+
+    async def get_document(self, document_key: str) -> Optional[Dict]:
+        return await self.collection.find_one({"_id": document_key})
+
+    async def find_ingested_copy(self, content_sha256: str, chunk_size: int, chunk_overlap: int, chunk_size_unit: str) -> Optional[Dict]:
+        """
+        Returns an ingested document with the same content and chunk settings, under any key.
+        """
+        return await self.collection.find_one({
+            "content_sha256": content_sha256,
+            "chunk_size": chunk_size,
+            "chunk_overlap": chunk_overlap,
+            "chunk_size_unit": chunk_size_unit,
+            "status": DOCUMENT_INGESTED,
+        })
+
+    async def start_version(self, document_key: str, file_name: str, stale_after_seconds: float) -> Optional[Dict]:
+        """
+        Claims a document for ingestion. The claim is one conditional update, so of two
+        ingestions of the same key only one gets it. The chunk and image ids of the current
+        version are kept until complete_version replaces them.
+
+        Args:
+            document_key (str): Stable name of the document across versions.
+            file_name (str): Name of the uploaded file.
+            stale_after_seconds (float): A claim older than this is taken to be from a crashed
+                ingestion and can be claimed again.
+
+        Returns:
+            Optional[Dict]: The document as it was before the claim; None for a new key.
+
+        Raises:
+            ValueError: Another ingestion of the key is in progress.
+        """
+        now = datetime.now(timezone.utc)
+        try:
+            return await self.collection.find_one_and_update(
+                {
+                    "_id": document_key,
+                    "$or": [
+                        {"status": {"$ne": DOCUMENT_INGESTING}},
+                        {"updated_at": {"$lt": now - timedelta(seconds=stale_after_seconds)}},
+                    ],
+                },
+                {
+                    "$set": {"status": DOCUMENT_INGESTING, "file_name": file_name, "updated_at": now},
+                    "$setOnInsert": {"created_at": now, "version": 0, "chunk_ids": [], "image_ids": []},
+                },
+                upsert=True,
+                return_document=ReturnDocument.BEFORE,
+            )
+        except DuplicateKeyError:
+            # The key exists but did not match: it is claimed by a running ingestion.
+            raise ValueError(f"Document '{document_key}' is already being ingested; upload it again when that finishes.")
+
+    async def complete_version(self, document_key: str, content_sha256: str, chunk_size: int, chunk_overlap: int, chunk_size_unit: str, chunk_ids: List[str], image_ids: List[str]):
+        await self.collection.update_one(
+            {"_id": document_key},
+            {
+                "$set": {
+                    "status": DOCUMENT_INGESTED,
+                    "content_sha256": content_sha256,
+                    "chunk_size": chunk_size,
+                    "chunk_overlap": chunk_overlap,
+                    "chunk_size_unit": chunk_size_unit,
+                    "chunk_ids": chunk_ids,
+                    "image_ids": image_ids,
+                    "updated_at": datetime.now(timezone.utc),
+                },
+                "$inc": {"version": 1},
+            }
+        )
+
+    async def fail_version(self, document_key: str, error: str):
+        await self.collection.update_one(
+            {"_id": document_key},
+            {"$set": {"status": DOCUMENT_FAILED, "error": error, "updated_at": datetime.now(timezone.utc)}}
+        )
+
+    async def get_index_generation(self) -> int:
+        document = await self.collection.find_one({"_id": INDEX_GENERATION_KEY})
+        return document["generation"] if document else 0
+
+    async def bump_index_generation(self) -> int:
+        """
+        Marks the dense, sparse and image indexes as changed. Cached answers from an older
+        generation are no longer served.
+        """
+        document = await self.collection.find_one_and_update(
+            {"_id": INDEX_GENERATION_KEY}, {"$inc": {"generation": 1}}, upsert=True, return_document=ReturnDocument.AFTER
+        )
+        return document["generation"]
+
+    async def other_ingestion_running(self, document_key: str, stale_after_seconds: float) -> bool:
+        """
+        Whether another document is being ingested. Its new chunk and image ids are not
+        recorded until it completes, so until then it may rely on any stored vector.
+        """
+        cutoff = datetime.now(timezone.utc) - timedelta(seconds=stale_after_seconds)
+        return await self.collection.find_one(
+            {"_id": {"$ne": document_key}, "status": DOCUMENT_INGESTING, "updated_at": {"$gte": cutoff}}, {"_id": 1}
+        ) is not None
+
+    async def defer_deletions(self, chunk_ids: List[str], image_ids: List[str]):
+        if not chunk_ids and not image_ids:
+            return
+        await self.collection.update_one(
+            {"_id": DEFERRED_DELETIONS_KEY},
+            {"$addToSet": {"deferred_chunk_ids": {"$each": chunk_ids}, "deferred_image_ids": {"$each": image_ids}}},
+            upsert=True,
+        )
+
+    async def take_deferred_deletions(self) -> Dict[str, List[str]]:
+        """Removes and returns the deferred ids as {"chunk_ids": [...], "image_ids": [...]}."""
+        document = await self.collection.find_one_and_delete({"_id": DEFERRED_DELETIONS_KEY}) or {}
+        return {"chunk_ids": document.get("deferred_chunk_ids", []), "image_ids": document.get("deferred_image_ids", [])}
+
+    async def referenced_ids(self, field: str, ids: Iterable[str], exclude_key: str) -> Set[str]:
+        """
+        Returns the ids (of `field`, "chunk_ids" or "image_ids") that another document still uses.
+        Content-addressed vectors are shared, so only unreferenced ones may be deleted.
+        """
+        ids = list(ids)
+        if not ids:
+            return set()
+        cursor = self.collection.find({"_id": {"$ne": exclude_key}, field: {"$in": ids}}, {field: 1})
+        wanted = set(ids)
+        referenced = set()
+        async for document in cursor:
+            referenced.update(wanted.intersection(document[field]))
+        return referenced
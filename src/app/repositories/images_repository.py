@@ -1,5 +1,6 @@
 from typing import List, Dict
 from fastapi import Depends
+from pymongo import UpdateOne
 from src.app.config.database import mongodb_database
 
 class ImageMappingRepo:
@@ -42,3 +43,39 @@ class ImageMappingRepo:
         documents = await cursor.to_list(length=None)
         imgs = [doc["base64_image"] for doc in documents if "base64_image" in doc]
         return imgs
+
+    async def store_image_summaries(self, image_ids: List[str], base64_list: List[str], summaries: List[str]):
+        """
+        Stores images by content hash together with their summaries, so the same image found
+        in a later upload reuses the summary. The hash doubles as the record_id of the image's
+        vector, which is what fetch_base64_images looks up.
+
+        Args:
+            image_ids (List[str]): SHA-256 of each image (see content_hash.image_id).
+            base64_list (List[str]): List of base64 encoded images.
+            summaries (List[str]): Summary of each image.
+        """
+        if not (len(image_ids) == len(base64_list) == len(summaries)):
+            raise ValueError("The number of image ids, base64 images and summaries must match.")
+        if not image_ids:
+            return
+        await self.collection.bulk_write([
+            UpdateOne(
+                {"record_id": image_id},
+                {"$set": {"record_id": image_id, "base64_image": b64, "summary": summary}},
+                upsert=True,
+            )
+            for image_id, b64, summary in zip(image_ids, base64_list, summaries)
+        ])
+
+    async def fetch_summaries(self, image_ids: List[str]) -> Dict[str, str]:
+        """
+        Returns image id -> summary for the images that have already been summarized.
+        """
+        cursor = self.collection.find({"record_id": {"$in": image_ids}, "summary": {"$exists": True}}, {"record_id": 1, "summary": 1})
+        documents = await cursor.to_list(length=None)
+        return {doc["record_id"]: doc["summary"] for doc in documents}
+
+    async def delete_images(self, image_ids: List[str]) -> int:
+        result = await self.collection.delete_many({"record_id": {"$in": image_ids}})
+        return result.deleted_count
@@ -0,0 +1,90 @@
+from datetime import datetime, timezone
+from typing import Dict, List, Optional
+from fastapi import Depends
+from src.app.config.database import mongodb_database
+
+JOB_QUEUED = "queued"
+JOB_RUNNING = "running"
+JOB_COMPLETED = "completed"
+JOB_FAILED = "failed"
+
+
+class IngestionJobRepo:
+    def __init__(self, collection = Depends(mongodb_database.get_jobs_collection)):
+        self.collection = collection
+
+    async def create_job(self, job_id: str, file_name: str, file_path: str, chunk_size: int, chunk_overlap: int, content_sha256: Optional[str] = None, document_key: Optional[str] = None) -> str:
+        """
+        Stores a new queued ingestion job.
+
+        Args:
+            job_id (str): Unique job id, used as the document _id.
+            file_name (str): Original name of the uploaded file.
+            file_path (str): Location of the spooled upload on disk.
+            chunk_size (int): Chunk size requested by the client.
+            chunk_overlap (int): Chunk overlap requested by the client.
+            content_sha256 (str, optional): SHA-256 of the upload, taken while spooling it.
+            document_key (str, optional): Document this upload is a version of; the content hash if omitted.
+
+        Returns:
+            str: The job id.
+        """
+        await self.collection.insert_one({
+            "_id": job_id,
+            "status": JOB_QUEUED,
+            "file_name": file_name,
+            "file_path": file_path,
+            "chunk_size": chunk_size,
+            "chunk_overlap": chunk_overlap,
+            "content_sha256": content_sha256,
+            "document_key": document_key or content_sha256,
+            "created_at": datetime.now(timezone.utc),
+            "started_at": None,
+            "finished_at": None,
+            "error": None,
+            "stages": {},
+        })
+        return job_id
+
+    async def get_job(self, job_id: str) -> Optional[Dict]:
+        return await self.collection.find_one({"_id": job_id})
+
+    async def find_unfinished_job_ids(self) -> List[str]:
+        """
+        Returns the ids of jobs that were queued or running when the process last stopped,
+        oldest first, and resets the running ones back to queued.
+        """
+        await self.collection.update_many({"status": JOB_RUNNING}, {"$set": {"status": JOB_QUEUED}})
+        cursor = self.collection.find({"status": JOB_QUEUED}, {"_id": 1}).sort("created_at", 1)
+        documents = await cursor.to_list(length=None)
+        return [doc["_id"] for doc in documents]
+
+    async def mark_running(self, job_id: str):
+        await self.collection.update_one(
+            {"_id": job_id},
+            {"$set": {"status": JOB_RUNNING, "started_at": datetime.now(timezone.utc)}}
+        )
+
+    async def mark_completed(self, job_id: str):
+        await self.collection.update_one(
+            {"_id": job_id},
+            {"$set": {"status": JOB_COMPLETED, "finished_at": datetime.now(timezone.utc)}}
+        )
+
+    async def mark_failed(self, job_id: str, error: str):
+        await self.collection.update_one(
+            {"_id": job_id},
+            {"$set": {"status": JOB_FAILED, "finished_at": datetime.now(timezone.utc), "error": error}}
+        )
+
+    async def record_memory(self, job_id: str, memory: Dict):
+        await self.collection.update_one({"_id": job_id}, {"$set": {"memory": memory}})
+
+    async def update_stage(self, job_id: str, stage: str, fields: Dict):
+        """
+        Sets fields on a single stage entry, e.g. {"status": "running", "started_at": ...}.
+        """
+        await self.collection.update_one(
+            {"_id": job_id},
+            {"$set": {f"stages.{stage}.{key}": value for key, value in fields.items()}}
+        )
@@ -1,6 +1,15 @@
+import json
+from typing import Optional
 from fastapi import APIRouter, Depends, UploadFile, File, Form
+from fastapi.responses import StreamingResponse
 from src.app.controllers.upload_controller import FileuploadController
-from src.app.utils.error_handler import error_handler
+from src.app.utils.error_handler import error_handler, JsonResponseError
+from src.app.utils.ingestion_scheduler import ingestion_scheduler
+from src.app.usecases.ingestion_job_usecase import ingestion_worker_pool
+from src.app.utils.embedding_cache import query_embedding_cache
+from src.app.utils.answer_cache import semantic_answer_cache
+from src.app.services.re_ranking_service import rerank_metrics
+from src.app.usecases.retrieval_and_response_usecase import speculation_metrics
 
 file_upload_router = APIRouter()
 
@@ -10,13 +19,27 @@ async def create_upload_file(
     chunk_size: int = Form(...),
     chunk_overlap: int = Form(...),
     file: UploadFile = File(...),
+    document_key: Optional[str] = Form(None),
     file_upload_controller=Depends(FileuploadController),
 ):
     if not file:
         return {"message": "No upload file sent"}
     else:
-        await file_upload_controller.process_file(file, chunk_size, chunk_overlap)
-        return {"message": "File processed successfully!"}
+        # Uploads with the same document key are versions of one document. Without a key the
+        # upload's content hash is used, so unrelated files that share a name never replace each other.
+        job_id = await file_upload_controller.process_file(file, chunk_size, chunk_overlap, document_key)
+        return {"message": "File queued for processing.", "job_id": job_id}
+
+@file_upload_router.get("/jobs/{job_id}")
+@error_handler
+async def get_job_status(
+    job_id: str,
+    file_upload_controller=Depends(FileuploadController)
+):
+    job = await file_upload_controller.get_job(job_id)
+    if job is None:
+        raise JsonResponseError(status_code=404, detail=f"Job '{job_id}' not found.")
+    return job
 
 @file_upload_router.post("/query/")
 @error_handler
@@ -24,5 +47,60 @@ async def generate_response(
     query: str = Form(...),
     file_upload_controller=Depends(FileuploadController)
 ):
-    response, final_chunks = await file_upload_controller.generate_response(query)
-    return {"response": response, "final_chunks": final_chunks}
+    response, final_chunks, plan = await file_upload_controller.generate_response(query)
+    return {"response": response, "final_chunks": final_chunks, "plan": plan}
+
+@file_upload_router.post("/query/stream/")
+@error_handler
+async def stream_response(
+    query: str = Form(...),
+    file_upload_controller=Depends(FileuploadController)
+):
+    """
+    Server-sent events for a query: sub_queries, retrieval, sub_answer, delta (final answer
+    text as it is generated) and done; see RetrievalAndResponseUsecase.stream_retrieve_and_generate.
+    A failure after the stream has started is sent as an "error" event.
+    """
+    async def event_stream():
+        try:
+            async for event, data in file_upload_controller.stream_response(query):
+                yield f"event: {event}\ndata: {json.dumps(data, default=str)}\n\n"
+        except Exception as e:
+            print(e)
+            yield f"event: error\ndata: {json.dumps({'detail': str(e)})}\n\n"
+
+    return StreamingResponse(
+        event_stream(),
+        media_type="text/event-stream",
+        # Stop proxies from buffering the stream.
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
+
+@file_upload_router.get("/metrics/ingestion/")
+@error_handler
+async def ingestion_metrics():
+    return {**ingestion_scheduler.metrics(), "jobs": ingestion_worker_pool.metrics()}
+
+
+@file_upload_router.get("/metrics/query-embedding-cache/")
+@error_handler
+async def query_embedding_cache_metrics():
+    return query_embedding_cache.metrics()
+
+
+@file_upload_router.get("/metrics/answer-cache/")
+@error_handler
+async def answer_cache_metrics():
+    return semantic_answer_cache.metrics()
+
+
+@file_upload_router.get("/metrics/rerank/")
+@error_handler
+async def rerank_metrics_endpoint():
+    return rerank_metrics.to_dict()
+
+
+@file_upload_router.get("/metrics/speculative-retrieval/")
+@error_handler
+async def speculative_retrieval_metrics():
+    return speculation_metrics
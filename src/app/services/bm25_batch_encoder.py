@@ -0,0 +1,150 @@
+from concurrent.futures import ProcessPoolExecutor
+from typing import Dict, List, Optional, Tuple
+
+import mmh3
+import numpy as np
+from nltk import word_tokenize
+from pinecone_text.sparse.bm25_tokenizer import BM25Tokenizer
+
+from src.app.config.settings import settings
+
+# BM25Encoder's default tokenizer settings.
+TOKENIZER_PARAMS = {
+    "lower_case": True,
+    "remove_punctuation": True,
+    "remove_stopwords": True,
+    "stem": True,
+    "language": "english",
+}
+
+_FILTERED = -1
+
+
+class BM25BatchEncoder:
+    def __init__(self, processes: int = 0, tokenizer_params: Optional[Dict] = None) -> None:
+        """
+        Batch version of BM25Encoder's document encoding. Chunks are split with the same
+        word_tokenize call as BM25Tokenizer, but the lower-case / punctuation / stopword / stem /
+        mmh3 steps run once per distinct raw token and are cached across batches. Term
+        frequencies and TF-saturation weights are computed with array operations over the
+        whole batch. The output is CSR arrays that match BM25Encoder._tf and
+        _encode_single_document exactly, including index order.
+
+        Args:
+            processes (int): Worker processes for tokenization; 0 tokenizes in this process.
+            tokenizer_params (Dict, optional): BM25Tokenizer arguments; BM25Encoder's defaults if omitted.
+        """
+        self.processes = processes
+        self.tokenizer_params = dict(tokenizer_params or TOKENIZER_PARAMS)
+        self._tokenizer: Optional[BM25Tokenizer] = None
+        self._term_ids: Dict[str, int] = {}
+        self._executor: Optional[ProcessPoolExecutor] = None
+
+    @property
+    def tokenizer(self) -> BM25Tokenizer:
+        if self._tokenizer is None:
+            self._tokenizer = BM25Tokenizer(**self.tokenizer_params)
+        return self._tokenizer
+
+    def _term_id(self, token: str) -> int:
+        # Per-token steps of BM25Tokenizer.__call__ followed by BM25Encoder._hash_text.
+        tokenizer = self.tokenizer
+        word = token.lower() if tokenizer.lower_case else token
+        if tokenizer.remove_punctuation and word in tokenizer._punctuation:
+            return _FILTERED
+        if tokenizer.remove_stopwords and (word if tokenizer.lower_case else word.lower()) in tokenizer._stop_words:
+            return _FILTERED
+        if tokenizer.stem:
+            word = tokenizer._stemmer.stem(word)
+        return mmh3.hash(word, signed=False)
+
+    def _token_term_ids(self, texts: List[str]) -> Tuple[np.ndarray, np.ndarray]:
+        """Returns (term id per kept token, number of kept tokens per text)."""
+        term_ids = self._term_ids
+        ids: List[int] = []
+        lengths = np.zeros(len(texts), dtype=np.int64)
+        for position, text in enumerate(texts):
+            before = len(ids)
+            for token in word_tokenize(text, self.tokenizer.language):
+                term_id = term_ids.get(token)
+                if term_id is None:
+                    term_id = term_ids[token] = self._term_id(token)
+                if term_id != _FILTERED:
+                    ids.append(term_id)
+            lengths[position] = len(ids) - before
+        return np.asarray(ids, dtype=np.uint32), lengths
+
+    def _term_frequencies_local(self, texts: List[str]) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+        ids, lengths = self._token_term_ids(texts)
+        docs = np.repeat(np.arange(len(texts), dtype=np.uint64), lengths)
+        keys = (docs << np.uint64(32)) | ids.astype(np.uint64)
+        unique_keys, first_seen, counts = np.unique(keys, return_index=True, return_counts=True)
+        # Back to first-occurrence order within each text, which is Counter's (and _tf's) order.
+        order = np.argsort(first_seen, kind="stable")
+        unique_keys, counts = unique_keys[order], counts[order]
+        indices = (unique_keys & np.uint64(0xFFFFFFFF)).astype(np.uint32)
+        terms_per_doc = np.bincount((unique_keys >> np.uint64(32)).astype(np.int64), minlength=len(texts))
+        indptr = np.concatenate([[0], np.cumsum(terms_per_doc)]).astype(np.int64)
+        return indptr, indices, counts.astype(np.int64)
+
+    def term_frequencies(self, texts: List[str]) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+        """
+        Term frequencies of each text as CSR arrays (indptr, term ids, counts): text i owns
+        entries indptr[i]:indptr[i + 1]. With `processes` set, large batches are split
+        into contiguous shards and tokenized in worker processes.
+        """
+        if self.processes <= 1 or len(texts) < 2 * self.processes:
+            return self._term_frequencies_local(texts)
+
+        if self._executor is None:
+            self._executor = ProcessPoolExecutor(
+                max_workers=self.processes, initializer=_init_worker, initargs=(self.tokenizer_params,)
+            )
+        bounds = np.linspace(0, len(texts), self.processes + 1).astype(int)
+        shards = [texts[start:end] for start, end in zip(bounds[:-1], bounds[1:])]
+        results = list(self._executor.map(_worker_term_frequencies, shards))
+
+        indptrs, indices, counts = [np.zeros(1, dtype=np.int64)], [], []
+        for shard_indptr, shard_indices, shard_counts in results:
+            indptrs.append(shard_indptr[1:] + indptrs[-1][-1])
+            indices.append(shard_indices)
+            counts.append(shard_counts)
+        return np.concatenate(indptrs), np.concatenate(indices), np.concatenate(counts)
+
+    @staticmethod
+    def saturate(indptr: np.ndarray, counts: np.ndarray, avgdl: float, k1: float, b: float) -> np.ndarray:
+        """BM25 document weights tf / (k1 * (1 - b + b * (doc_len / avgdl)) + tf), for every entry."""
+        cumulative = np.concatenate([[0], np.cumsum(counts)])
+        doc_lengths = cumulative[indptr[1:]] - cumulative[indptr[:-1]]
+        doc_norm = k1 * (1.0 - b + b * (doc_lengths / avgdl))
+        return counts / (np.repeat(doc_norm, np.diff(indptr)) + counts)
+
+    @staticmethod
+    def to_sparse_vectors(indptr: np.ndarray, indices: np.ndarray, values: np.ndarray) -> List[Dict]:
+        """Splits CSR arrays into the {"indices", "values"} dicts that Pinecone expects."""
+        indices, values, bounds = indices.tolist(), values.tolist(), indptr.tolist()
+        return [
+            {"indices": indices[start:end], "values": values[start:end]}
+            for start, end in zip(bounds[:-1], bounds[1:])
+        ]
+
+    def shutdown(self):
+        if self._executor is not None:
+            self._executor.shutdown()
+            self._executor = None
+
+
+_worker_encoder: Optional[BM25BatchEncoder] = None
+
+
+def _init_worker(tokenizer_params: Dict):
+    global _worker_encoder
+    _worker_encoder = BM25BatchEncoder(tokenizer_params=tokenizer_params)
+
+
+def _worker_term_frequencies(texts: List[str]):
+    return _worker_encoder._term_frequencies_local(texts)
+
+
+# Shared by every SparseEmbeddingsService so the token cache and worker pool are reused.
+bm25_batch_encoder = BM25BatchEncoder(processes=settings.BM25_ENCODER_PROCESSES)
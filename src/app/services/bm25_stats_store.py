@@ -0,0 +1,222 @@
+import fcntl
+import os
+import pickle
+import struct
+import threading
+from contextlib import contextmanager
+from typing import Dict, Iterable, List, Optional, Tuple
+
+import numpy as np
+
+from src.app.config.settings import settings
+
+# magic, format version, reserved, n_docs, sum_doc_len, n_terms, k1, b
+_HEADER = struct.Struct("<4sHHqdqdd")
+_MAGIC = b"BM25"
+FORMAT_VERSION = 1
+
+
+class BM25StatsStore:
+    def __init__(self, path: str, legacy_pickle_path: Optional[str] = None, k1: float = 1.2, b: float = 0.75) -> None:
+        """
+        Corpus statistics for BM25 (document count, total document length and per-term document
+        frequencies) that are updated per ingested document instead of being fitted once.
+
+        On-disk format (little-endian, version 1):
+            48-byte header   - b"BM25", format version, reserved, n_docs, sum_doc_len, n_terms, k1, b
+            uint32[n_terms]  - term ids (mmh3 hashes, as produced by BM25Encoder), sorted
+            uint32[n_terms]  - document frequency of each term
+        Every section starts on a 4-byte boundary. The arrays are memory-mapped read-only, so
+        worker processes share one copy through the page cache. Writes go to a temp file that
+        replaces the old one, and readers re-map when they see the file has been replaced.
+        Updates hold an exclusive lock on `<path>.lock` (flock) while they re-read the latest
+        file, apply their change and save, so processes ingesting at once do not lose each
+        other's counts.
+
+        Args:
+            path (str): Location of the statistics file.
+            legacy_pickle_path (str, optional): A pickled, fitted BM25Encoder to import from
+                when `path` does not exist yet.
+            k1 (float), b (float): BM25 parameters recorded with a new store.
+        """
+        self.path = path
+        self.legacy_pickle_path = legacy_pickle_path
+        self.k1 = k1
+        self.b = b
+        self.n_docs = 0
+        self.sum_doc_len = 0.0
+        self.term_ids = np.zeros(0, dtype=np.uint32)
+        self.doc_freq = np.zeros(0, dtype=np.uint32)
+        self.pending: Dict[int, int] = {}  # df changes not yet merged into the sorted arrays
+        self.loaded = False
+        self._file_signature = None
+        self.lock = threading.RLock()
+
+    @property
+    def avgdl(self) -> float:
+        return self.sum_doc_len / self.n_docs if self.n_docs else 1.0
+
+    def _signature(self):
+        stat = os.stat(self.path)
+        return stat.st_ino, stat.st_mtime_ns, stat.st_size
+
+    def ensure_loaded(self):
+        with self.lock:
+            if self.loaded:
+                # Another process may have written a newer version.
+                if not self.pending and os.path.exists(self.path) and self._signature() != self._file_signature:
+                    self._read()
+                return
+            if os.path.exists(self.path):
+                self._read()
+            elif self.legacy_pickle_path and os.path.exists(self.legacy_pickle_path):
+                with self._file_lock():
+                    # Another process may have migrated it while we waited for the lock.
+                    if os.path.exists(self.path):
+                        self._read()
+                    else:
+                        self._migrate_pickle()
+            self.loaded = True
+
+    @contextmanager
+    def _file_lock(self):
+        # flock is per open file, so this is not re-entrant: take it once per update.
+        directory = os.path.dirname(os.path.abspath(self.path))
+        os.makedirs(directory, exist_ok=True)
+        with open(self.path + ".lock", "a+b") as lock_file:
+            fcntl.flock(lock_file, fcntl.LOCK_EX)
+            try:
+                yield
+            finally:
+                fcntl.flock(lock_file, fcntl.LOCK_UN)
+
+    @contextmanager
+    def _update(self):
+        # Load the latest statistics, let the caller change them, then persist, all under the file lock.
+        with self.lock, self._file_lock():
+            self.ensure_loaded()
+            yield
+            self.save()
+
+    def _read(self):
+        with open(self.path, "rb") as f:
+            header = f.read(_HEADER.size)
+            if len(header) < _HEADER.size:
+                raise ValueError(f"{self.path} is not a BM25 statistics file.")
+            magic, version, _, n_docs, sum_doc_len, n_terms, k1, b = _HEADER.unpack(header)
+            if magic != _MAGIC:
+                raise ValueError(f"{self.path} is not a BM25 statistics file.")
+            if version != FORMAT_VERSION:
+                raise ValueError(f"Unsupported BM25 statistics format version {version}.")
+            self._file_signature = self._signature()
+        if n_terms:
+            # Plain ndarray views over the map; slicing np.memmap objects is much slower.
+            mapped = np.memmap(self.path, dtype="<u4", mode="r", offset=_HEADER.size, shape=(2 * n_terms,))
+            mapped = mapped.view(np.ndarray)
+            self.term_ids, self.doc_freq = mapped[:n_terms], mapped[n_terms:]
+        else:
+            self.term_ids = np.zeros(0, dtype=np.uint32)
+            self.doc_freq = np.zeros(0, dtype=np.uint32)
+        self.n_docs, self.sum_doc_len, self.k1, self.b = n_docs, sum_doc_len, k1, b
+        self.pending = {}
+
+    def _migrate_pickle(self):
+        with open(self.legacy_pickle_path, "rb") as f:
+            encoder = pickle.load(f)
+        print(f"Migrating BM25 statistics from {self.legacy_pickle_path} to {self.path}...")
+        self.k1, self.b = encoder.k1, encoder.b
+        self.n_docs = int(encoder.n_docs)
+        self.sum_doc_len = float(encoder.avgdl) * self.n_docs
+        self.term_ids = np.zeros(0, dtype=np.uint32)
+        self.doc_freq = np.zeros(0, dtype=np.uint32)
+        self.pending = {int(term): int(df) for term, df in encoder.doc_freq.items()}
+        self.save()
+
+    def _merge_pending(self):
+        if not self.pending:
+            return
+        pending_terms = np.fromiter(self.pending.keys(), dtype=np.uint32, count=len(self.pending))
+        pending_df = np.fromiter(self.pending.values(), dtype=np.int64, count=len(self.pending))
+        terms = np.concatenate([self.term_ids, pending_terms])
+        dfs = np.concatenate([self.doc_freq.astype(np.int64), pending_df])
+        term_ids, inverse = np.unique(terms, return_inverse=True)
+        merged = np.zeros(len(term_ids), dtype=np.int64)
+        np.add.at(merged, inverse, dfs)
+        # Terms whose documents have all been removed drop out.
+        present = merged > 0
+        self.term_ids = term_ids[present]
+        self.doc_freq = merged[present].astype(np.uint32)
+        self.pending = {}
+
+    def save(self):
+        # Callers hold the file lock (see _update), so the file is not replaced under them.
+        with self.lock:
+            self._merge_pending()
+            directory = os.path.dirname(os.path.abspath(self.path))
+            os.makedirs(directory, exist_ok=True)
+            temp_path = self.path + ".tmp"
+            with open(temp_path, "wb") as f:
+                f.write(_HEADER.pack(
+                    _MAGIC, FORMAT_VERSION, 0, self.n_docs, self.sum_doc_len, len(self.term_ids), self.k1, self.b
+                ))
+                self.term_ids.astype("<u4").tofile(f)
+                self.doc_freq.astype("<u4").tofile(f)
+            os.replace(temp_path, self.path)
+            self._read()
+
+    def add_documents(self, documents: Iterable[Tuple[List[int], List[int]]]):
+        """
+        Adds the (term ids, term frequencies) of each document to the statistics and persists
+        them. Documents without terms are ignored, as in BM25Encoder.fit.
+        """
+        with self._update():
+            for indices, tfs in documents:
+                if len(indices) == 0:
+                    continue
+                self.n_docs += 1
+                self.sum_doc_len += sum(tfs)
+                for term in indices:
+                    self.pending[term] = self.pending.get(term, 0) + 1
+
+    def add_term_frequencies(self, indptr: np.ndarray, indices: np.ndarray, counts: np.ndarray):
+        """
+        Same as add_documents for CSR term frequencies (see BM25BatchEncoder.term_frequencies).
+        """
+        with self._update():
+            terms_per_doc = np.diff(indptr)
+            self.n_docs += int(np.count_nonzero(terms_per_doc))
+            self.sum_doc_len += int(counts.sum())
+            # A term appears at most once per document in CSR form, so its entry count is its df.
+            terms, dfs = np.unique(indices, return_counts=True)
+            for term, df in zip(terms.tolist(), dfs.tolist()):
+                self.pending[term] = self.pending.get(term, 0) + df
+
+    def remove_term_frequencies(self, indptr: np.ndarray, indices: np.ndarray, counts: np.ndarray):
+        """
+        Reverses add_term_frequencies for documents that have been deleted from the index.
+        """
+        with self._update():
+            terms_per_doc = np.diff(indptr)
+            self.n_docs = max(self.n_docs - int(np.count_nonzero(terms_per_doc)), 0)
+            self.sum_doc_len = max(self.sum_doc_len - int(counts.sum()), 0.0)
+            terms, dfs = np.unique(indices, return_counts=True)
+            for term, df in zip(terms.tolist(), dfs.tolist()):
+                self.pending[term] = self.pending.get(term, 0) - df
+
+    def document_frequencies(self, indices: List[int]) -> np.ndarray:
+        """Document frequency of each term id; 0 for terms never seen."""
+        with self.lock:
+            self.ensure_loaded()
+            terms = np.asarray(indices, dtype=np.uint32)
+            dfs = np.zeros(len(terms), dtype=np.int64)
+            if len(self.term_ids):
+                positions = np.minimum(np.searchsorted(self.term_ids, terms), len(self.term_ids) - 1)
+                found = self.term_ids[positions] == terms
+                dfs[found] = self.doc_freq[positions[found]]
+            if self.pending:
+                dfs += np.array([self.pending.get(term, 0) for term in indices], dtype=np.int64)
+            return np.maximum(dfs, 0)
+
+
+# Process-wide statistics shared by every SparseEmbeddingsService.
+bm25_stats_store = BM25StatsStore(settings.BM25_STATS_PATH, legacy_pickle_path=settings.BM25_LEGACY_MODEL_PATH)
@@ -1,11 +1,13 @@
-import asyncio
-from pinecone import PineconeAsyncio
-from src.app.config.settings import settings
+from fastapi import Depends
+from src.app.config.vector_store import vector_store_registry
+from src.app.utils.ingestion_scheduler import ingestion_scheduler, PINECONE_INFERENCE
+from src.app.utils.cost_tracking import cost_tracker
+from src.app.utils.tokenizers import embedding_token_count
 
 
 class EmbeddingService:
-    def __init__(self) -> None:
-        self.token_limit_per_minute = 250000  # Pinecone's token limit
+    def __init__(self, vector_store = Depends(vector_store_registry.get_registry)) -> None:
+        self.vector_store = vector_store
         self.batch_size = 50  # Adjust based on your use case
 
     async def generate_embeddings(self, chunks: list[str]) -> list[dict]:
@@ -15,48 +17,42 @@ class EmbeddingService:
         :param chunks: List of text chunks.
         :return: List of dictionaries containing embeddings.
         """
-        async with PineconeAsyncio(api_key=settings.PINECONE_API_KEY) as pc:
-            try:
-                total_tokens_used = 0
-                all_embeddings = []
-                e_tokens_used = 0
-                # Process in batches
-                for i in range(0, len(chunks), self.batch_size):
-                    batch = chunks[i:i + self.batch_size]
-
-                    # **Count tokens by splitting text on spaces**
-                    batch_token_count = sum(len(text.split()) for text in batch)
-
-                    # If token limit exceeded, wait
-                    if total_tokens_used + batch_token_count > self.token_limit_per_minute:
-                        print("Rate limit reached, sleeping for 60 seconds...")
-                        await asyncio.sleep(60)  # Async sleep before resuming
-                        total_tokens_used = 0  # Reset counter
-
-                    # Generate embeddings
-                    embeddings = await pc.inference.embed(
-                        model="llama-text-embed-v2",
-                        inputs=batch,
-                        parameters={
-                            "input_type": "passage",
-                            "truncate": "END",
-                            "dimension" :  1024
-                        }
-                    )
-                    e_tokens_used += embeddings.usage["total_tokens"]
-                    # Store embeddings in a structured format
-                    batch_embeddings = [
-                        {"text": text, "embedding": emb["values"]}
-                        for text, emb in zip(batch, embeddings)
-                    ]
-
-                    all_embeddings.extend(batch_embeddings)
-
-                    # Update total token usage
-                    total_tokens_used += batch_token_count
-                    
-                return all_embeddings
-            
-            except Exception as e:
-                print(f"Error in generating embeddings: {e}")
-                return []
+        try:
+            all_embeddings = []
+            e_tokens_used = 0
+            # Process in batches
+            for i in range(0, len(chunks), self.batch_size):
+                batch = chunks[i:i + self.batch_size]
+
+                # Counted with the chunking tokenizer; chunks cut by token count reuse their cached count.
+                batch_token_count = embedding_token_count(batch)
+
+                # Wait for the shared Pinecone inference budget.
+                await ingestion_scheduler.acquire(PINECONE_INFERENCE, batch_token_count)
+
+                # Generate embeddings
+                embeddings = await self.vector_store.inference.embed(
+                    model="llama-text-embed-v2",
+                    inputs=batch,
+                    parameters={
+                        "input_type": "passage",
+                        "truncate": "END",
+                        "dimension" :  1024
+                    }
+                )
+                e_tokens_used += embeddings.usage["total_tokens"]
+                cost_tracker.add_embedding_tokens(embeddings.usage["total_tokens"])
+                cost_tracker.add_custom_cost("estimated_embedding_tokens", batch_token_count)
+                # Store embeddings in a structured format
+                batch_embeddings = [
+                    {"text": text, "embedding": emb["values"]}
+                    for text, emb in zip(batch, embeddings)
+                ]
+
+                all_embeddings.extend(batch_embeddings)
+                
+            return all_embeddings
+        
+        except Exception as e:
+            print(f"Error in generating embeddings: {e}")
+            return []
@@ -1,10 +1,22 @@
+import asyncio
 import os
 import tempfile
 
+import pymupdf
 import pymupdf4llm
 from fastapi import UploadFile
 from fastapi.responses import JSONResponse
 from starlette import status
+from src.app.config.settings import settings
+from src.app.services.pdf_conversion_pool import PdfConversionPool
+
+
+# Shared by every FileConversionService; worker processes start on first use.
+pdf_conversion_pool = PdfConversionPool(
+    processes=settings.PDF_CONVERSION_PROCESSES,
+    pages_per_task=settings.PDF_CONVERSION_PAGES_PER_TASK,
+    timeout_seconds=settings.PDF_CONVERSION_TIMEOUT_SECONDS,
+)
 
 
 class FileConversionService:
@@ -52,25 +64,53 @@ class FileConversionService:
                 status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
             )"""
 
-    async def convert_to_makedown(self, file_bytes: UploadFile):
+    async def convert_to_makedown(self, pdf_path: str):
+        if settings.PDF_CONVERSION_PROCESSES > 0:
+            return await self._convert_in_pool(pdf_path)
         try:
-            # ✅ Use in-memory file instead of saving to disk
-            with tempfile.NamedTemporaryFile(
-                delete=False, mode="wb", suffix=".pdf"
-            ) as temp_pdf:
-                # Write the bytes to the temporary file
-                temp_pdf.write(await file_bytes.read())
-                temp_pdf_path = temp_pdf.name  # Get the path of the temporary file
+            # ✅ Open the PDF straight from the spooled upload
+            document = pymupdf.open(pdf_path)
 
-            md_text = pymupdf4llm.to_markdown(
-                temp_pdf,
+            # Conversion is CPU-bound, run it off the event loop so other stages keep going.
+            md_text = await asyncio.to_thread(
+                pymupdf4llm.to_markdown,
+                document,
                 write_images=False,
             )
-            os.remove(temp_pdf_path)
+            document.close()
             return md_text
 
         except Exception as e:
             print(e)
+            raise
+
+    async def _convert_in_pool(self, pdf_path: str):
+        # Workers open the PDF by path, so nothing is pickled per page range.
+        # Errors are raised, so the job fails with the reason rather than on empty markdown.
+        try:
+            return await pdf_conversion_pool.convert(pdf_path)
+
+        except asyncio.TimeoutError as e:
+            message = f"PDF conversion timed out after {pdf_conversion_pool.timeout_seconds}s."
+            print(message)
+            raise asyncio.TimeoutError(message) from e
+        except Exception as e:
+            print(e)
+            raise
+
+    async def stream_markdown(self, pdf_path: str):
+        """
+        Yields the markdown of a PDF one page range at a time, so chunking can start before the
+        last pages are converted. Unlike convert_to_makedown, errors are raised to the caller.
+        """
+        try:
+            async for markdown in pdf_conversion_pool.convert_stream(pdf_path):
+                yield markdown
+
+        except asyncio.TimeoutError as e:
+            message = f"PDF conversion timed out after {pdf_conversion_pool.timeout_seconds}s."
+            print(message)
+            raise asyncio.TimeoutError(message) from e
 
     async def convert_to_text(self, file_bytes: UploadFile):
         try:
@@ -0,0 +1,238 @@
+import heapq
+import math
+import os
+from typing import Callable, Dict, List, Optional, Tuple
+
+import numpy as np
+
+
+class HNSWIndex:
+    def __init__(
+        self,
+        vectors: Callable[[np.ndarray], np.ndarray],
+        m: int = 16,
+        ef_construction: int = 200,
+        ef_search: int = 64,
+        seed: int = 42,
+        expand_batch: int = 16,
+    ) -> None:
+        """
+        Hierarchical Navigable Small World graph (Malkov & Yashunin) for cosine similarity over
+        unit-length vectors. The graph stores only links; vectors are read through `vectors`,
+        which maps an array of storage rows to a (len(rows), dimension) matrix. Nodes are never
+        removed: deleted or overwritten rows are tombstoned, stay usable for navigation, and
+        are filtered out of results.
+
+        Args:
+            vectors (Callable): rows -> matrix of unit-length float32 vectors.
+            m (int): Links per node on upper layers (2 * m on layer 0); at least 2.
+            ef_construction (int): Candidate list size while inserting.
+            ef_search (int): Default candidate list size while searching.
+            seed (int): Seed for level sampling.
+            expand_batch (int): Candidates expanded together per search step; 1 is the
+                classic one-at-a-time search.
+        """
+        if m < 2:
+            raise ValueError("HNSW needs m >= 2.")
+        self.vectors = vectors
+        self.m = m
+        self.m_max0 = 2 * m
+        self.ef_construction = ef_construction
+        self.ef_search = ef_search
+        self.expand_batch = expand_batch
+        self.level_multiplier = 1 / math.log(m)
+        self.rng = np.random.default_rng(seed)
+
+        self.node_row: List[int] = []
+        # node_row as an array (with spare capacity), so neighbour rows are looked up in one step.
+        self._row_array = np.zeros(0, dtype=np.int64)
+        self.node_level: List[int] = []
+        self.deleted: List[bool] = []
+        self.links: List[List[List[int]]] = []  # node -> layer -> neighbour nodes
+        self.row_node: Dict[int, int] = {}  # row -> its live node
+        self.entry_point: Optional[int] = None
+        self.max_level = -1
+        self.applied_seq = 0
+
+    def __len__(self):
+        return len(self.row_node)
+
+    def _add_node_row(self, row: int):
+        node = len(self.node_row)
+        if node >= len(self._row_array):
+            grown = np.zeros(max(1024, 2 * len(self._row_array)), dtype=np.int64)
+            grown[:node] = self._row_array[:node]
+            self._row_array = grown
+        self._row_array[node] = row
+        self.node_row.append(row)
+
+    def _similarities(self, query: np.ndarray, nodes) -> np.ndarray:
+        return self.vectors(self._row_array[np.asarray(nodes, dtype=np.int64)]) @ query
+
+    def _search_layer(self, query: np.ndarray, entry_points: List[Tuple[float, int]], ef: int, layer: int) -> List[Tuple[float, int]]:
+        """
+        Best-first search on one layer. Returns up to `ef` (similarity, node) pairs.
+        """
+        visited = np.zeros(len(self.node_row), dtype=bool)
+        visited[[node for _, node in entry_points]] = True
+        # candidates: max-heap on similarity. The results are kept as arrays, trimmed to the best ef.
+        candidates = [(-sim, node) for sim, node in entry_points]
+        heapq.heapify(candidates)
+        result_sims = np.array([sim for sim, _ in entry_points], dtype=np.float64)
+        result_nodes = np.array([node for _, node in entry_points], dtype=np.int64)
+        result_sims, result_nodes, bound = self._best(result_sims, result_nodes, ef)
+
+        while candidates:
+            # Expand up to `expand_batch` of the best candidates at once, so their neighbours
+            # are scored with one matrix product instead of one per candidate.
+            expanded, popped = [], 0
+            while candidates and popped < self.expand_batch and -candidates[0][0] >= bound:
+                expanded.extend(self.links[heapq.heappop(candidates)[1]][layer])
+                popped += 1
+            if not popped:
+                break
+            neighbours = np.fromiter(dict.fromkeys(expanded), dtype=np.int64)
+            neighbours = neighbours[~visited[neighbours]]
+            if not len(neighbours):
+                continue
+            visited[neighbours] = True
+            sims = self._similarities(query, neighbours)
+            # The admission bound only rises, so neighbours below it could never get in.
+            keep = sims > bound
+            if not keep.any():
+                continue
+            neighbours, sims = neighbours[keep], sims[keep]
+            result_sims, result_nodes, bound = self._best(
+                np.concatenate([result_sims, sims]), np.concatenate([result_nodes, neighbours]), ef
+            )
+            for sim, neighbour in zip(sims.tolist(), neighbours.tolist()):
+                if sim >= bound:
+                    heapq.heappush(candidates, (-sim, neighbour))
+        return list(zip(result_sims.tolist(), result_nodes.tolist()))
+
+    @staticmethod
+    def _best(sims: np.ndarray, nodes: np.ndarray, ef: int):
+        # Keeps the ef most similar; the bound is the worst kept similarity once ef are kept.
+        if len(sims) > ef:
+            top = np.argpartition(-sims, ef - 1)[:ef]
+            sims, nodes = sims[top], nodes[top]
+        bound = float(sims.min()) if len(sims) >= ef else float("-inf")
+        return sims, nodes, bound
+
+    def _shrink(self, node: int, layer: int):
+        limit = self.m_max0 if layer == 0 else self.m
+        neighbours = self.links[node][layer]
+        # Lists may run a quarter over the limit before they are pruned, so the pruning cost
+        # is paid once per few back-links instead of on every one.
+        if len(neighbours) <= limit + max(1, limit // 4):
+            return
+        base = self.vectors(np.array([self.node_row[node]], dtype=np.int64))[0]
+        sims = self._similarities(base, neighbours)
+        keep = np.argsort(-sims)[:limit]
+        self.links[node][layer] = [neighbours[i] for i in keep]
+
+    def insert(self, row: int) -> int:
+        """
+        Adds the vector stored at `row`. If the row already has a live node (the vector was
+        overwritten), that node is tombstoned first.
+        """
+        if row in self.row_node:
+            self.mark_deleted(row)
+
+        query = self.vectors(np.array([row], dtype=np.int64))[0]
+        level = int(-math.log(1.0 - self.rng.random()) * self.level_multiplier)
+        node = len(self.node_row)
+        self._add_node_row(row)
+        self.node_level.append(level)
+        self.deleted.append(False)
+        self.links.append([[] for _ in range(level + 1)])
+        self.row_node[row] = node
+
+        if self.entry_point is None:
+            self.entry_point, self.max_level = node, level
+            return node
+
+        entry = [(float(self._similarities(query, [self.entry_point])[0]), self.entry_point)]
+        for layer in range(self.max_level, level, -1):
+            entry = [max(self._search_layer(query, entry, 1, layer))]
+
+        for layer in range(min(level, self.max_level), -1, -1):
+            candidates = self._search_layer(query, entry, self.ef_construction, layer)
+            limit = self.m_max0 if layer == 0 else self.m
+            neighbours = [n for _, n in heapq.nlargest(limit, candidates)]
+            self.links[node][layer] = neighbours
+            for neighbour in neighbours:
+                self.links[neighbour][layer].append(node)
+                self._shrink(neighbour, layer)
+            entry = candidates
+
+        if level > self.max_level:
+            self.entry_point, self.max_level = node, level
+        return node
+
+    def mark_deleted(self, row: int):
+        node = self.row_node.pop(row, None)
+        if node is not None:
+            self.deleted[node] = True
+
+    def search(self, query: np.ndarray, k: int, ef: Optional[int] = None) -> List[Tuple[int, float]]:
+        """
+        Approximate top-k by cosine similarity.
+
+        Returns:
+            List[Tuple[int, float]]: (row, similarity) pairs, best first.
+        """
+        if self.entry_point is None or not self.row_node:
+            return []
+        ef = max(ef or self.ef_search, k)
+        entry = [(float(self._similarities(query, [self.entry_point])[0]), self.entry_point)]
+        for layer in range(self.max_level, 0, -1):
+            entry = [max(self._search_layer(query, entry, 1, layer))]
+        candidates = self._search_layer(query, entry, ef, 0)
+        live = [(sim, node) for sim, node in candidates if not self.deleted[node]]
+        return [(self.node_row[node], sim) for sim, node in heapq.nlargest(k, live)]
+
+    def save(self, path: str):
+        """
+        Writes the graph (not the vectors) to `path` as a NumPy .npz archive, atomically.
+        Layer links are stored CSR-style: links_<layer>_offsets and links_<layer>_targets.
+        """
+        arrays = {
+            "params": np.array([self.m, self.ef_construction, self.ef_search, self.max_level,
+                                -1 if self.entry_point is None else self.entry_point, self.applied_seq], dtype=np.int64),
+            "node_row": np.array(self.node_row, dtype=np.int64),
+            "node_level": np.array(self.node_level, dtype=np.int32),
+            "deleted": np.array(self.deleted, dtype=bool),
+        }
+        for layer in range(self.max_level + 1):
+            lengths = [len(node_links[layer]) if len(node_links) > layer else 0 for node_links in self.links]
+            arrays[f"links_{layer}_offsets"] = np.concatenate([[0], np.cumsum(lengths)]).astype(np.int64)
+            arrays[f"links_{layer}_targets"] = np.array(
+                [n for node_links in self.links if len(node_links) > layer for n in node_links[layer]], dtype=np.int32
+            )
+        temp_path = path + ".tmp"
+        with open(temp_path, "wb") as f:
+            np.savez(f, **arrays)
+        os.replace(temp_path, path)
+
+    @classmethod
+    def load(cls, path: str, vectors: Callable[[np.ndarray], np.ndarray], seed: int = 42) -> "HNSWIndex":
+        with np.load(path) as data:
+            m, ef_construction, ef_search, max_level, entry_point, applied_seq = data["params"].tolist()
+            index = cls(vectors, m=m, ef_construction=ef_construction, ef_search=ef_search, seed=seed)
+            for row in data["node_row"].tolist():
+                index._add_node_row(row)
+            index.node_level = data["node_level"].tolist()
+            index.deleted = data["deleted"].tolist()
+            index.max_level = max_level
+            index.entry_point = None if entry_point < 0 else entry_point
+            index.applied_seq = applied_seq
+            index.links = [[[] for _ in range(level + 1)] for level in index.node_level]
+            for layer in range(max_level + 1):
+                offsets = data[f"links_{layer}_offsets"]
+                targets = data[f"links_{layer}_targets"].tolist()
+                for node, level in enumerate(index.node_level):
+                    if level >= layer:
+                        index.links[node][layer] = targets[offsets[node]:offsets[node + 1]]
+        index.row_node = {row: node for node, row in enumerate(index.node_row) if not index.deleted[node]}
+        return index
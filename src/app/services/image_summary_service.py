@@ -8,14 +8,16 @@ from src.app.config.settings import settings
 from src.app.services.dense_embedding_service import EmbeddingService
 from fastapi import Depends
 from src.app.config.database import mongodb_database
-from pinecone import PineconeAsyncio, ServerlessSpec, VectorType
+from src.app.config.vector_store import vector_store_registry
 import uuid
 from src.app.repositories.images_repository import ImageMappingRepo
+from src.app.utils.ingestion_scheduler import ingestion_scheduler, GEMINI
+from src.app.utils.content_hash import image_id
 
 
 class ImageSummaryService:
     
-    def __init__(self,dense_embedding_service = Depends(EmbeddingService), images_repossitory = Depends(ImageMappingRepo) ):
+    def __init__(self,dense_embedding_service = Depends(EmbeddingService), images_repossitory = Depends(ImageMappingRepo), vector_store = Depends(vector_store_registry.get_registry) ):
         # Use the provided API key or fall back to an environment variable.
         self.api_key = settings.GEMINI_API_KEY
         if not self.api_key:
@@ -33,6 +35,7 @@ class ImageSummaryService:
                         
         self.dense_embedding_service= dense_embedding_service
         self.images_repository = images_repossitory
+        self.vector_store = vector_store
         self.index_name = "idx001"
         
 
@@ -56,7 +59,8 @@ class ImageSummaryService:
             # Prepare the contents list: prompt + image part.
             contents = [self.prompt, image_part]
             
-            # Asynchronously call the Gemini API to generate content.
+            # Wait for a Gemini request slot, then call the API asynchronously.
+            await ingestion_scheduler.acquire(GEMINI)
             response = await self.client.aio.models.generate_content(
                 model=self.model,
                 contents=contents
@@ -71,41 +75,59 @@ class ImageSummaryService:
             # Log the error or return an error message as summary.
             return {"image_base64": image_base64, "summary": f"Error: {str(e)}"}
 
-    async def pinecone_generate_and_store_embeddings(self, summaries):
-        async with PineconeAsyncio(api_key= settings.PINECONE_API_KEY) as pc:
-            index_info = await pc.describe_index(name= self.index_name)  
-            try:    
-                async with pc.IndexAsyncio(host= index_info.host) as idx: 
-                    
-                    embeddings = await  self.dense_embedding_service.generate_embeddings(summaries)      
-                    records = [
-                        {
-                            "id": str(uuid.uuid4()),  
-                            "values": e["embedding"],  
-                            "metadata": {"text":e["text"] ,"record_id": str(uuid.uuid4())},
-                        }
-                        for e in embeddings
-                    ]
+    async def pinecone_generate_and_store_embeddings(self, summaries, image_ids):
+        idx = await self.vector_store.get_index(self.index_name)
+        try:    
+            embeddings = await  self.dense_embedding_service.generate_embeddings(summaries)      
+            # The image hash is both the vector id and the record_id used to fetch the image back.
+            records = [
+                {
+                    "id": image_id,  
+                    "values": e["embedding"],  
+                    "metadata": {"text":e["text"] ,"record_id": image_id},
+                }
+                for e, image_id in zip(embeddings, image_ids)
+            ]
 
-                    # Upsert records into Pinecone
-                    await idx.upsert(vectors=records, namespace="imgportion")
-                return records                    
-            except Exception as e:
-                print(e) 
+            # Upsert records into Pinecone
+            await idx.upsert(vectors=records, namespace="imgportion")
+            return records                    
+        except Exception as e:
+            print(e)
+            # Raised so the summaries are not recorded as stored and the document fails.
+            raise e
                 
                 
                 
     async def summarize_images(self, base64_images: List[str]):
             """
-            Processes a list of base64 images concurrently and returns summaries.
+            Summarizes and indexes the images that have not been seen before. Images are
+            identified by content hash; one whose summary is already stored is neither sent to
+            Gemini nor embedded again, because its vector already exists under the same id.
             
             Args:
                 base64_images (List[str]): List of base64 encoded images.
             
             Returns:
-                List[Dict[str, str]]: List of dictionaries containing original base64 image and its summary.
+                List[str]: The content hash of every image, in order.
             """
-            tasks = [self._process_single_image(img) for img in base64_images]
+            image_ids = [image_id(img) for img in base64_images]
+            images = dict(zip(image_ids, base64_images))  # Also drops repeats within the document.
+            known = await self.images_repository.fetch_summaries(list(images))
+            new_ids = [i for i in images if i not in known]
+            print(f"Images: {len(new_ids)} new, {len(images) - len(new_ids)} reused.")
+            if not new_ids:
+                return image_ids
+
+            tasks = [self._process_single_image(images[i]) for i in new_ids]
             results = await asyncio.gather(*tasks)
-            records = await self.pinecone_generate_and_store_embeddings(results)
-            await self.images_repository.store_image_mappings([x["metadata"]["record_id"] for x in records], base64_images)
\ No newline at end of file
+            # Failed summaries come back as dicts; leave those images unstored so a later upload retries them.
+            summarized = [(i, summary) for i, summary in zip(new_ids, results) if isinstance(summary, str)]
+            if summarized:
+                summarized_ids = [i for i, _ in summarized]
+                summaries = [summary for _, summary in summarized]
+                await self.pinecone_generate_and_store_embeddings(summaries, summarized_ids)
+                await self.images_repository.store_image_summaries(
+                    summarized_ids, [images[i] for i in summarized_ids], summaries
+                )
+            return image_ids
@@ -162,6 +162,20 @@ class LLMResponseService:
         return response.text.strip()
 
 
+    async def stream_final_response(self, original_query, sub_queries, sub_answers):
+        """
+        Like generate_final_response, but yields the synthesized answer in pieces as Gemini
+        produces them.
+        """
+        prompt = self.create_combined_answer_prompt(original_query, sub_queries, sub_answers)
+        stream = await self.client.aio.models.generate_content_stream(
+            model= self.model,
+            contents= [prompt]
+        )
+        async for chunk in stream:
+            if chunk.text:
+                yield chunk.text
+
     async def generate_final_response(self, original_query, sub_queries, sub_answers):
         prompt = self.create_combined_answer_prompt(original_query, sub_queries, sub_answers)
         response = await self.client.aio.models.generate_content(
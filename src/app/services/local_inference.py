@@ -0,0 +1,88 @@
+import hashlib
+import re
+from typing import Dict, List, Optional
+
+import numpy as np
+
+_TOKEN_PATTERN = re.compile(r"\w+")
+
+
+class LocalEmbedding:
+    """A single embedding, readable as embedding.values or embedding["values"] like Pinecone's."""
+
+    def __init__(self, values: List[float]) -> None:
+        self.values = values
+
+    def __getitem__(self, key):
+        return getattr(self, key)
+
+
+class LocalEmbeddingsList(list):
+    def __init__(self, embeddings: List[LocalEmbedding], total_tokens: int) -> None:
+        super().__init__(embeddings)
+        self.usage = {"total_tokens": total_tokens}
+
+
+class LocalRerankResult:
+    def __init__(self, data: List[Dict]) -> None:
+        self.data = data
+        self.usage = {"rerank_units": 0}
+
+
+class LocalInference:
+    def __init__(self, default_dimension: int = 1024) -> None:
+        """
+        Offline stand-in for Pinecone's hosted inference (embed and rerank), for environments
+        that cannot reach Pinecone. Embeddings are signed feature hashes of word unigrams and
+        bigrams; they are deterministic and need no model download. They capture lexical
+        overlap only, so use them for CI, staging and benchmarks, not for answer quality.
+        """
+        self.default_dimension = default_dimension
+
+    @staticmethod
+    def _tokens(text: str) -> List[str]:
+        return _TOKEN_PATTERN.findall(text.lower())
+
+    def _embed_text(self, text: str, dimension: int) -> np.ndarray:
+        tokens = self._tokens(text)
+        features = tokens + [f"{a} {b}" for a, b in zip(tokens, tokens[1:])]
+        vector = np.zeros(dimension, dtype=np.float32)
+        for feature in features:
+            digest = hashlib.blake2b(feature.encode("utf-8"), digest_size=8).digest()
+            bucket = int.from_bytes(digest[:4], "little") % dimension
+            sign = 1.0 if digest[4] & 1 else -1.0
+            vector[bucket] += sign
+        norm = np.linalg.norm(vector)
+        return vector / norm if norm else vector
+
+    async def embed(self, model: str, inputs: List[str], parameters: Optional[Dict] = None) -> LocalEmbeddingsList:
+        dimension = (parameters or {}).get("dimension", self.default_dimension)
+        embeddings = [LocalEmbedding(self._embed_text(text, dimension).tolist()) for text in inputs]
+        return LocalEmbeddingsList(embeddings, total_tokens=sum(len(self._tokens(text)) for text in inputs))
+
+    async def rerank(
+        self,
+        model: str,
+        query: str,
+        documents: List[str],
+        top_n: Optional[int] = None,
+        return_documents: bool = True,
+        parameters: Optional[Dict] = None,
+        **kwargs,
+    ) -> LocalRerankResult:
+        query_vector = self._embed_text(query, self.default_dimension)
+        scored = [
+            (index, float(self._embed_text(document, self.default_dimension) @ query_vector))
+            for index, document in enumerate(documents)
+        ]
+        scored.sort(key=lambda item: item[1], reverse=True)
+        if top_n is not None:
+            scored = scored[:top_n]
+
+        data = []
+        for index, score in scored:
+            entry = {"index": index, "score": score}
+            if return_documents:
+                entry["document"] = {"text": documents[index]}
+            data.append(entry)
+        return LocalRerankResult(data)
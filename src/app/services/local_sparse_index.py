@@ -0,0 +1,543 @@
+import asyncio
+import json
+import os
+import threading
+from typing import Dict, List, Optional, Tuple
+
+import numpy as np
+
+from src.app.services.local_vector_index import LocalQueryResponse, _record_field
+
+BLOCK_SIZE = 128
+_SPARSE_MARKER = "sparse.json"
+
+
+def encode_varints(values: np.ndarray) -> np.ndarray:
+    """LEB128-encodes non-negative integers (< 2**35) into a uint8 array."""
+    values = values.astype(np.uint64)
+    lengths = np.ones(len(values), dtype=np.int64)
+    for shift in (7, 14, 21, 28):
+        lengths += values >= (1 << shift)
+    starts = np.cumsum(lengths) - lengths
+    out = np.empty(int(lengths.sum()), dtype=np.uint8)
+    for j in range(5):
+        mask = lengths > j
+        if not mask.any():
+            break
+        byte = (values[mask] >> np.uint64(7 * j)) & np.uint64(0x7F)
+        byte |= np.where(lengths[mask] > j + 1, 0x80, 0).astype(np.uint64)
+        out[starts[mask] + j] = byte.astype(np.uint8)
+    return out
+
+
+def decode_varints(data: np.ndarray) -> np.ndarray:
+    """Inverse of encode_varints."""
+    data = np.asarray(data, dtype=np.uint8)
+    if len(data) == 0:
+        return np.zeros(0, dtype=np.int64)
+    starts = np.flatnonzero(np.concatenate([[True], data[:-1] < 0x80]))
+    byte_position = np.arange(len(data)) - np.repeat(starts, np.diff(np.append(starts, len(data))))
+    return np.add.reduceat((data & 0x7F).astype(np.int64) << (7 * byte_position), starts)
+
+
+def _sparse_values(record) -> Tuple[List[int], List[float]]:
+    sparse = _record_field(record, "sparse_values")
+    if sparse is None:
+        raise ValueError("Local sparse index only stores sparse vectors.")
+    return list(_record_field(sparse, "indices")), list(_record_field(sparse, "values"))
+
+
+class _Segment:
+    def __init__(self, directory: str, manifest: Optional[Dict]) -> None:
+        """
+        Immutable, memory-mapped postings for documents numbered below `doc_limit`.
+
+        Postings of a term are sorted by document number and cut into blocks of BLOCK_SIZE.
+        Document numbers are delta-encoded (the first delta of a block is relative to the last
+        document of the previous block) and stored as varints in segment_<gen>.docids; weights
+        are quantized to uint16 relative to their block's max weight in segment_<gen>.weights.
+        segment_<gen>.npz holds the term dictionary (term id, df, max weight, first block, block
+        count) and the block table (last document, max weight, byte and posting offsets), which
+        is what lets queries skip whole blocks.
+        """
+        self.generation = 0
+        self.doc_limit = 0
+        self.term_ids = np.zeros(0, dtype=np.uint32)
+        self.term_df = np.zeros(0, dtype=np.int64)
+        self.term_max_weight = np.zeros(0, dtype=np.float32)
+        self.term_block_start = np.zeros(0, dtype=np.int64)
+        self.term_block_count = np.zeros(0, dtype=np.int64)
+        self.block_last_doc = np.zeros(0, dtype=np.int64)
+        self.block_max_weight = np.zeros(0, dtype=np.float32)
+        self.block_byte_start = np.zeros(1, dtype=np.int64)
+        self.block_posting_start = np.zeros(1, dtype=np.int64)
+        self.docids = np.zeros(0, dtype=np.uint8)
+        self.weights = np.zeros(0, dtype=np.uint16)
+        self.term_positions: Dict[int, int] = {}
+        if manifest is None:
+            return
+
+        self.generation = manifest["generation"]
+        self.doc_limit = manifest["doc_limit"]
+        prefix = os.path.join(directory, f"segment_{self.generation}")
+        with np.load(prefix + ".npz") as data:
+            for name in ("term_ids", "term_df", "term_max_weight", "term_block_start", "term_block_count",
+                         "block_last_doc", "block_max_weight", "block_byte_start", "block_posting_start"):
+                setattr(self, name, data[name])
+        if self.block_byte_start[-1]:
+            # Plain ndarray views over the maps; slicing np.memmap objects is much slower.
+            self.docids = np.memmap(prefix + ".docids", dtype=np.uint8, mode="r").view(np.ndarray)
+            self.weights = np.memmap(prefix + ".weights", dtype=np.uint16, mode="r").view(np.ndarray)
+        self.term_positions = {term_id: term for term, term_id in enumerate(self.term_ids.tolist())}
+
+    @staticmethod
+    def write(directory: str, generation: int, doc_limit: int, terms: np.ndarray, docs: np.ndarray, weights: np.ndarray) -> Dict:
+        """Writes a segment from unsorted (term, doc, weight) postings and returns its manifest."""
+        order = np.lexsort((docs, terms))
+        terms, docs = terms[order], docs[order]
+        weights = weights[order].astype(np.float32)
+
+        term_ids, term_first, term_df = np.unique(terms, return_index=True, return_counts=True)
+        term_block_count = (term_df + BLOCK_SIZE - 1) // BLOCK_SIZE
+        term_block_start = np.cumsum(term_block_count) - term_block_count
+
+        term_of_posting = np.repeat(np.arange(len(term_ids)), term_df)
+        rank = np.arange(len(docs)) - term_first[term_of_posting]
+        deltas = docs - np.concatenate([[0], docs[:-1]])
+        deltas[rank == 0] = docs[rank == 0]
+
+        block_first = np.flatnonzero(rank % BLOCK_SIZE == 0)
+        block_end = np.concatenate([block_first[1:], [len(docs)]])
+        encoded = encode_varints(deltas)
+        byte_lengths = np.ones(len(deltas), dtype=np.int64)
+        for shift in (7, 14, 21, 28):
+            byte_lengths += deltas >= (1 << shift)
+        posting_byte_start = np.concatenate([[0], np.cumsum(byte_lengths)])
+
+        block_max_weight = (
+            np.maximum.reduceat(weights, block_first) if len(block_first) else np.zeros(0, dtype=np.float32)
+        )
+        term_max_weight = (
+            np.maximum.reduceat(weights, term_first) if len(term_first) else np.zeros(0, dtype=np.float32)
+        )
+        block_of_posting = np.repeat(np.arange(len(block_first)), block_end - block_first)
+        scale = block_max_weight[block_of_posting] if len(docs) else np.zeros(0, dtype=np.float32)
+        quantized = np.round(weights / np.where(scale > 0, scale, 1) * 65535).astype(np.uint16)
+
+        prefix = os.path.join(directory, f"segment_{generation}")
+        encoded.tofile(prefix + ".docids")
+        quantized.tofile(prefix + ".weights")
+        with open(prefix + ".npz.tmp", "wb") as f:
+            np.savez(
+                f,
+                term_ids=term_ids.astype(np.uint32),
+                term_df=term_df.astype(np.int64),
+                term_max_weight=term_max_weight.astype(np.float32),
+                term_block_start=term_block_start.astype(np.int64),
+                term_block_count=term_block_count.astype(np.int64),
+                block_last_doc=docs[block_end - 1].astype(np.int64),
+                block_max_weight=block_max_weight.astype(np.float32),
+                block_byte_start=posting_byte_start[np.concatenate([block_first, [len(docs)]])].astype(np.int64),
+                block_posting_start=np.concatenate([block_first, [len(docs)]]).astype(np.int64),
+            )
+        os.replace(prefix + ".npz.tmp", prefix + ".npz")
+        return {"generation": generation, "doc_limit": doc_limit}
+
+    def lookup(self, term_id: int) -> int:
+        return self.term_positions.get(term_id, -1)
+
+    def decode_blocks(self, term: int, first_block: int, last_block: int) -> Tuple[np.ndarray, np.ndarray]:
+        """Decodes blocks [first_block, last_block) of a term (block numbers are global)."""
+        start_byte, end_byte = self.block_byte_start[first_block], self.block_byte_start[last_block]
+        start, end = self.block_posting_start[first_block], self.block_posting_start[last_block]
+        data = self.docids[start_byte:end_byte]
+        # One byte per posting means every delta fits in a single varint byte.
+        docs = np.cumsum(data.astype(np.int64) if end_byte - start_byte == end - start else decode_varints(data))
+        if first_block > self.term_block_start[term]:
+            docs += self.block_last_doc[first_block - 1]
+        if last_block - first_block == 1:
+            scale = self.block_max_weight[first_block] / 65535
+        else:
+            scale = np.repeat(
+                self.block_max_weight[first_block:last_block] / 65535,
+                np.diff(self.block_posting_start[first_block:last_block + 1]),
+            )
+        return docs, self.weights[start:end] * scale
+
+    def decode_term(self, term: int) -> Tuple[np.ndarray, np.ndarray]:
+        first_block = self.term_block_start[term]
+        return self.decode_blocks(term, first_block, first_block + self.term_block_count[term])
+
+    def all_postings(self) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+        terms, docs, weights = [], [], []
+        for term, term_id in enumerate(self.term_ids):
+            term_docs, term_weights = self.decode_term(term)
+            terms.append(np.full(len(term_docs), term_id, dtype=np.uint32))
+            docs.append(term_docs)
+            weights.append(term_weights)
+        if not terms:
+            return np.zeros(0, dtype=np.uint32), np.zeros(0, dtype=np.int64), np.zeros(0, dtype=np.float32)
+        return np.concatenate(terms), np.concatenate(docs), np.concatenate(weights)
+
+
+class _SparseNamespace:
+    def __init__(self, directory: str, compact_every: int = 2048) -> None:
+        """
+        One namespace on disk:
+            records.jsonl   - append-only log of {"id", "doc", "indices", "values", "metadata"} / {"id", "deleted"}
+            segment.json    - generation and doc_limit of the current segment
+            segment_<gen>.* - compressed postings of documents below doc_limit (see _Segment)
+        Documents written since the last compaction live in an in-memory delta and are scored
+        exhaustively; every `compact_every` writes they are merged into a new segment, dropping
+        deleted documents. Each write gets a new document number, so overwrites and deletes
+        only tombstone the old number.
+        """
+        self.directory = directory
+        self.compact_every = compact_every
+        self.doc_ids: List[Optional[str]] = []
+        self.metadata: List[Optional[Dict]] = []
+        self.deleted = np.zeros(0, dtype=bool)
+        self.doc_of: Dict[str, int] = {}
+        self.delta: Dict[int, List[Tuple[int, float]]] = {}
+        self.delta_docs = 0
+        self._score_base: Optional[np.ndarray] = None
+        self.lock = threading.RLock()
+        os.makedirs(directory, exist_ok=True)
+        self._load()
+
+    @property
+    def _records_path(self):
+        return os.path.join(self.directory, "records.jsonl")
+
+    @property
+    def _manifest_path(self):
+        return os.path.join(self.directory, "segment.json")
+
+    def _load(self):
+        manifest = None
+        if os.path.exists(self._manifest_path):
+            with open(self._manifest_path) as f:
+                manifest = json.load(f)
+        self.segment = _Segment(self.directory, manifest)
+
+        if not os.path.exists(self._records_path):
+            return
+        with open(self._records_path) as f:
+            for line in f:
+                if not line.strip():
+                    continue
+                entry = json.loads(line)
+                if entry.get("deleted"):
+                    doc = self.doc_of.pop(entry["id"], None)
+                    if doc is not None:
+                        self._tombstone(doc)
+                    continue
+                self._add_document(entry["id"], entry["doc"], entry["indices"], entry["values"], entry.get("metadata"))
+
+    def _ensure_docs(self, doc_count: int):
+        while len(self.doc_ids) < doc_count:
+            self.doc_ids.append(None)
+            self.metadata.append(None)
+        if len(self.deleted) < doc_count:
+            self.deleted = np.concatenate([self.deleted, np.ones(doc_count - len(self.deleted), dtype=bool)])
+
+    def _tombstone(self, doc: int):
+        self.deleted[doc] = True
+        self._score_base = None
+        self.doc_ids[doc] = None
+        self.metadata[doc] = None
+
+    def _add_document(self, record_id: str, doc: int, indices: List[int], values: List[float], metadata: Optional[Dict]):
+        previous = self.doc_of.get(record_id)
+        if previous is not None:
+            self._tombstone(previous)
+        self._ensure_docs(doc + 1)
+        self.doc_ids[doc] = record_id
+        self.metadata[doc] = metadata
+        self.deleted[doc] = False
+        self.doc_of[record_id] = doc
+        if doc >= self.segment.doc_limit:
+            for term_id, weight in zip(indices, values):
+                self.delta.setdefault(int(term_id), []).append((doc, float(weight)))
+            self.delta_docs += 1
+
+    def upsert(self, records: list) -> int:
+        with self.lock:
+            log_lines = []
+            for record in records:
+                record_id = _record_field(record, "id")
+                indices, values = _sparse_values(record)
+                metadata = _record_field(record, "metadata") or {}
+                doc = len(self.doc_ids)
+                self._add_document(record_id, doc, indices, values, metadata)
+                log_lines.append(json.dumps(
+                    {"id": record_id, "doc": doc, "indices": [int(i) for i in indices],
+                     "values": [float(v) for v in values], "metadata": metadata}
+                ))
+            if log_lines:
+                with open(self._records_path, "a") as f:
+                    f.write("\n".join(log_lines) + "\n")
+            if self.delta_docs >= self.compact_every:
+                self.compact()
+            return len(log_lines)
+
+    def delete(self, ids: List[str]) -> int:
+        with self.lock:
+            log_lines = []
+            for record_id in ids:
+                doc = self.doc_of.pop(record_id, None)
+                if doc is None:
+                    continue
+                self._tombstone(doc)
+                log_lines.append(json.dumps({"id": record_id, "deleted": True}))
+            if log_lines:
+                with open(self._records_path, "a") as f:
+                    f.write("\n".join(log_lines) + "\n")
+            return len(log_lines)
+
+    def compact(self):
+        """Merges the delta into a new segment and drops the postings of deleted documents."""
+        with self.lock:
+            terms, docs, weights = self.segment.all_postings()
+            delta_postings = [(term_id, doc, weight) for term_id, postings in self.delta.items() for doc, weight in postings]
+            if delta_postings:
+                delta_terms, delta_docs, delta_weights = zip(*delta_postings)
+                terms = np.concatenate([terms, np.asarray(delta_terms, dtype=np.uint32)])
+                docs = np.concatenate([docs, np.asarray(delta_docs, dtype=np.int64)])
+                weights = np.concatenate([weights, np.asarray(delta_weights, dtype=np.float32)])
+            live = ~self.deleted[docs] if len(docs) else np.zeros(0, dtype=bool)
+
+            old_generation = self.segment.generation if os.path.exists(self._manifest_path) else None
+            generation = self.segment.generation + 1
+            manifest = _Segment.write(self.directory, generation, len(self.doc_ids), terms[live], docs[live], weights[live])
+            with open(self._manifest_path + ".tmp", "w") as f:
+                json.dump(manifest, f)
+            os.replace(self._manifest_path + ".tmp", self._manifest_path)
+
+            self.segment = _Segment(self.directory, manifest)
+            self.delta = {}
+            self.delta_docs = 0
+            if old_generation is not None:
+                for suffix in (".npz", ".docids", ".weights"):
+                    path = os.path.join(self.directory, f"segment_{old_generation}{suffix}")
+                    if os.path.exists(path):
+                        os.remove(path)
+
+    def _delta_scores(self, query_terms: Dict[int, float]) -> Dict[int, float]:
+        scores: Dict[int, float] = {}
+        for term_id, query_weight in query_terms.items():
+            for doc, weight in self.delta.get(term_id, ()):
+                if not self.deleted[doc]:
+                    scores[doc] = scores.get(doc, 0.0) + query_weight * weight
+        return scores
+
+    @staticmethod
+    def _kth_best(scores: np.ndarray, extra: np.ndarray, k: int) -> float:
+        pool = np.concatenate([scores, extra]) if len(extra) else scores
+        if len(pool) < k:
+            return 0.0
+        return max(0.0, float(np.partition(pool, len(pool) - k)[len(pool) - k]))
+
+    def _initial_scores(self) -> np.ndarray:
+        # Deleted documents start at -inf so they never become candidates.
+        if self._score_base is None or len(self._score_base) != self.segment.doc_limit:
+            self._score_base = np.where(self.deleted[:self.segment.doc_limit], -np.inf, 0).astype(np.float32)
+        return self._score_base.copy()
+
+    def query(self, indices: List[int], values: List[float], top_k: int, include_metadata: bool, include_values: bool) -> List[Dict]:
+        """
+        Dot-product top-k with MaxScore pruning. Query terms are visited in decreasing order of
+        their score upper bound (query weight x max document weight). Terms are scored in full
+        until the upper bounds of the remaining terms cannot lift an unseen document above the
+        current k-th best score. The remaining terms then only score existing candidates, and
+        decode only the blocks that hold those candidates. Candidates that cannot reach the
+        k-th best score are dropped after each term.
+        """
+        with self.lock:
+            query_terms: Dict[int, float] = {}
+            for term_id, value in zip(indices, values):
+                query_terms[int(term_id)] = query_terms.get(int(term_id), 0.0) + float(value)
+
+            delta_scores = self._delta_scores(query_terms)
+            delta_values = np.fromiter(delta_scores.values(), dtype=np.float32, count=len(delta_scores))
+
+            segment = self.segment
+            terms = []
+            for term_id, query_weight in query_terms.items():
+                term = segment.lookup(term_id)
+                if term >= 0 and query_weight > 0:
+                    terms.append((query_weight * float(segment.term_max_weight[term]), query_weight, term))
+            terms.sort(reverse=True)
+            remaining_bound = np.cumsum([bound for bound, _, _ in terms][::-1])[::-1].tolist() + [0.0]
+
+            scores = self._initial_scores()
+            threshold = self._kth_best(np.zeros(0, dtype=np.float32), delta_values, top_k)
+            top_docs = np.zeros(0, dtype=np.int64)
+            position = 0
+            # Essential terms: every posting can introduce a new candidate.
+            while position < len(terms):
+                if threshold > 0 and remaining_bound[position] <= threshold:
+                    break
+                _, query_weight, term = terms[position]
+                docs, weights = segment.decode_term(term)
+                scores[docs] += query_weight * weights
+                # Scores only grow, so the top-k is among the previous top-k and this term's documents.
+                found = np.searchsorted(docs, top_docs)
+                seen = docs[np.minimum(found, len(docs) - 1)] == top_docs
+                top_docs = np.concatenate([top_docs[~seen], docs])
+                if len(top_docs) > top_k:
+                    top_docs = top_docs[np.argpartition(-scores[top_docs], top_k - 1)[:top_k]]
+                threshold = self._kth_best(scores[top_docs], delta_values, top_k)
+                position += 1
+
+            candidates = np.flatnonzero(scores > 0)
+            # Non-essential terms: only existing candidates can still make the top-k.
+            for position in range(position, len(terms)):
+                candidates = candidates[scores[candidates] + remaining_bound[position] >= threshold]
+                if not len(candidates):
+                    break
+                _, query_weight, term = terms[position]
+                first_block = segment.term_block_start[term]
+                block_count = segment.term_block_count[term]
+                last_docs = segment.block_last_doc[first_block:first_block + block_count]
+                blocks = np.searchsorted(last_docs, candidates)
+                in_range = candidates[blocks < block_count]
+                if len(in_range):
+                    # Candidates are sorted, so the blocks holding them form one contiguous range.
+                    docs, weights = segment.decode_blocks(
+                        term, first_block + blocks[0], first_block + blocks[len(in_range) - 1] + 1
+                    )
+                    found = np.searchsorted(docs, in_range)
+                    hit = docs[np.minimum(found, len(docs) - 1)] == in_range
+                    scores[in_range[hit]] += query_weight * weights[found[hit]]
+                threshold = self._kth_best(scores[candidates], delta_values, top_k)
+
+            ranked_docs = np.concatenate([candidates, np.fromiter(delta_scores.keys(), dtype=np.int64, count=len(delta_scores))])
+            ranked_scores = np.concatenate([scores[candidates], delta_values])
+            k = min(top_k, len(ranked_docs))
+            top = np.argpartition(-ranked_scores, k - 1)[:k] if k else np.zeros(0, dtype=np.int64)
+            top = top[np.lexsort((ranked_docs[top], -ranked_scores[top]))]
+
+            matches = []
+            for doc, score in zip(ranked_docs[top].tolist(), ranked_scores[top].tolist()):
+                match = {"id": self.doc_ids[doc], "score": score}
+                if include_metadata:
+                    match["metadata"] = self.metadata[doc]
+                if include_values:
+                    match["sparse_values"] = self._document_vector(doc)
+                matches.append(match)
+            return matches
+
+    def _document_vector(self, doc: int) -> Dict:
+        indices, values = [], []
+        for term_id, postings in self.delta.items():
+            for posting_doc, weight in postings:
+                if posting_doc == doc:
+                    indices.append(term_id)
+                    values.append(weight)
+        if doc < self.segment.doc_limit:
+            for term, term_id in enumerate(self.segment.term_ids):
+                docs, weights = self.segment.decode_term(term)
+                found = np.searchsorted(docs, doc)
+                if found < len(docs) and docs[found] == doc:
+                    indices.append(int(term_id))
+                    values.append(float(weights[found]))
+        return {"indices": indices, "values": values}
+
+    def fetch(self, ids: List[str]) -> Dict[str, Dict]:
+        with self.lock:
+            return {
+                record_id: {
+                    "id": record_id,
+                    "sparse_values": self._document_vector(self.doc_of[record_id]),
+                    "metadata": self.metadata[self.doc_of[record_id]],
+                }
+                for record_id in ids if record_id in self.doc_of
+            }
+
+    def count(self) -> int:
+        return len(self.doc_of)
+
+
+class LocalSparseIndex:
+    def __init__(self, directory: str, compact_every: int = 2048) -> None:
+        """
+        An on-disk sparse (dot product) index with the same async surface as a Pinecone sparse
+        IndexAsyncio. It stores the {"indices", "values"} vectors produced by
+        SparseEmbeddingsService and answers `query(sparse_vector=...)` from compressed,
+        memory-mapped posting lists with MaxScore pruning, so BM25 retrieval needs no network.
+
+        Args:
+            directory (str): Where the index is persisted.
+            compact_every (int): Writes buffered in memory before they are merged into the segment.
+        """
+        self.directory = directory
+        self.compact_every = compact_every
+        self.namespaces: Dict[str, _SparseNamespace] = {}
+        self._lock = threading.Lock()
+        os.makedirs(directory, exist_ok=True)
+        marker = os.path.join(directory, _SPARSE_MARKER)
+        if not os.path.exists(marker):
+            with open(marker, "w") as f:
+                json.dump({"vector_type": "sparse", "metric": "dotproduct"}, f)
+        for name in os.listdir(directory):
+            if os.path.isdir(os.path.join(directory, name)):
+                self._namespace(name)
+
+    @staticmethod
+    def is_sparse_index(directory: str) -> bool:
+        return os.path.exists(os.path.join(directory, _SPARSE_MARKER))
+
+    def _namespace(self, namespace: Optional[str]) -> _SparseNamespace:
+        namespace = namespace or "__default__"
+        with self._lock:
+            if namespace not in self.namespaces:
+                self.namespaces[namespace] = _SparseNamespace(os.path.join(self.directory, namespace), self.compact_every)
+            return self.namespaces[namespace]
+
+    async def upsert(self, vectors: list, namespace: Optional[str] = None, **kwargs):
+        upserted = await asyncio.to_thread(self._namespace(namespace).upsert, vectors)
+        return {"upserted_count": upserted}
+
+    async def query(
+        self,
+        sparse_vector=None,
+        top_k: int = 10,
+        include_metadata: bool = False,
+        include_values: bool = False,
+        namespace: Optional[str] = None,
+        vector=None,
+        **kwargs,
+    ) -> LocalQueryResponse:
+        if sparse_vector is None:
+            raise ValueError("Local sparse index only supports sparse queries.")
+        matches = await asyncio.to_thread(
+            self._namespace(namespace).query,
+            list(_record_field(sparse_vector, "indices")),
+            list(_record_field(sparse_vector, "values")),
+            top_k,
+            include_metadata,
+            include_values,
+        )
+        return LocalQueryResponse(matches=matches, namespace=namespace or "", usage={"read_units": 0})
+
+    async def fetch(self, ids: List[str], namespace: Optional[str] = None, **kwargs):
+        vectors = await asyncio.to_thread(self._namespace(namespace).fetch, ids)
+        return LocalQueryResponse(vectors=vectors, namespace=namespace or "", usage={"read_units": 0})
+
+    async def delete(self, ids: Optional[List[str]] = None, namespace: Optional[str] = None, **kwargs):
+        await asyncio.to_thread(self._namespace(namespace).delete, ids or [])
+        return {}
+
+    async def describe_index_stats(self, **kwargs):
+        namespaces = {name: {"vector_count": ns.count()} for name, ns in self.namespaces.items()}
+        return LocalQueryResponse(
+            dimension=None,
+            namespaces=namespaces,
+            total_vector_count=sum(ns["vector_count"] for ns in namespaces.values()),
+        )
+
+    async def close(self):
+        for namespace in self.namespaces.values():
+            if namespace.delta_docs:
+                await asyncio.to_thread(namespace.compact)
@@ -0,0 +1,401 @@
+import asyncio
+import json
+import os
+import threading
+from typing import Dict, List, Optional
+
+import numpy as np
+
+from src.app.services.hnsw_index import HNSWIndex
+
+
+class LocalQueryResponse(dict):
+    """Query result that, like Pinecone's, supports both results["matches"] and results.usage."""
+
+    def __getattr__(self, name):
+        try:
+            return self[name]
+        except KeyError:
+            raise AttributeError(name)
+
+
+def _record_field(record, name, default=None):
+    # Records may be plain dicts or Pinecone Vector objects.
+    if isinstance(record, dict):
+        return record.get(name, default)
+    return getattr(record, name, default)
+
+
+class _DenseNamespace:
+    def __init__(self, directory: str, dimension: Optional[int], index_type: str = "flat", hnsw_params: Optional[Dict] = None) -> None:
+        """
+        One namespace on disk:
+            manifest.json  - dimension and row capacity
+            vectors.f32    - float32 matrix of L2-normalized rows, memory-mapped
+            records.jsonl  - append-only log of {"id", "row", "metadata"} / {"id", "deleted"}
+            hnsw.npz       - HNSW graph over the rows (index_type="hnsw" only)
+        Deleted rows are reused by later inserts. The line number of a log entry is its
+        sequence number; the HNSW graph remembers the last sequence number it has applied,
+        so after a restart it only replays the writes it missed.
+        """
+        if index_type not in ("flat", "hnsw"):
+            raise ValueError(f"Unknown local index type '{index_type}'.")
+        self.directory = directory
+        self.dimension = dimension
+        self.index_type = index_type
+        self.hnsw_params = dict(hnsw_params or {})
+        self.hnsw_save_every = self.hnsw_params.pop("save_every", 1000)
+        # Below this many rows an exact scan is faster than the graph, so none is built.
+        self.hnsw_min_rows = self.hnsw_params.pop("min_rows", 0)
+        self.ann: Optional[HNSWIndex] = None
+        self._ann_unsaved = 0
+        self.seq = 0
+        self.row_seq: Dict[int, int] = {}
+        self.capacity = 0
+        self.matrix: Optional[np.memmap] = None
+        self.live = np.zeros(0, dtype=bool)
+        self.ids: List[Optional[str]] = []
+        self.metadata: List[Optional[Dict]] = []
+        self.row_of: Dict[str, int] = {}
+        self.free_rows: List[int] = []
+        self.lock = threading.RLock()
+        self._load()
+
+    @property
+    def _manifest_path(self):
+        return os.path.join(self.directory, "manifest.json")
+
+    @property
+    def _vectors_path(self):
+        return os.path.join(self.directory, "vectors.f32")
+
+    @property
+    def _records_path(self):
+        return os.path.join(self.directory, "records.jsonl")
+
+    @property
+    def _hnsw_path(self):
+        return os.path.join(self.directory, "hnsw.npz")
+
+    def _row_vectors(self, rows: np.ndarray) -> np.ndarray:
+        return self.matrix[rows]
+
+    def _load(self):
+        if not os.path.exists(self._manifest_path):
+            return
+        with open(self._manifest_path) as f:
+            manifest = json.load(f)
+        self.dimension = manifest["dimension"]
+        self.capacity = manifest["capacity"]
+        self.matrix = np.memmap(self._vectors_path, dtype=np.float32, mode="r+", shape=(self.capacity, self.dimension))
+
+        row_count = 0
+        if os.path.exists(self._records_path):
+            with open(self._records_path) as f:
+                for line in f:
+                    if not line.strip():
+                        continue
+                    entry = json.loads(line)
+                    self.seq += 1
+                    if entry.get("deleted"):
+                        self.row_of.pop(entry["id"], None)
+                    else:
+                        self.row_of[entry["id"]] = entry["row"]
+                        self.row_seq[entry["row"]] = self.seq
+                        row_count = max(row_count, entry["row"] + 1)
+                        self._ensure_rows(row_count)
+                        self.metadata[entry["row"]] = entry.get("metadata")
+
+        self._ensure_rows(row_count)
+        for record_id, row in self.row_of.items():
+            self.ids[row] = record_id
+            self.live[row] = True
+        self.free_rows = [row for row in range(row_count) if not self.live[row]]
+
+        if self.index_type == "hnsw" and (os.path.exists(self._hnsw_path) or self._ann_wanted()):
+            self._load_ann()
+
+    def _load_ann(self):
+        if os.path.exists(self._hnsw_path):
+            self.ann = HNSWIndex.load(self._hnsw_path, self._row_vectors)
+        else:
+            self.ann = HNSWIndex(self._row_vectors, **self.hnsw_params)
+
+        # Catch the graph up with writes logged after it was last saved.
+        stale_rows = [
+            row for row in self.ann.row_node
+            if row >= len(self.live) or not self.live[row] or self.row_seq.get(row, 0) > self.ann.applied_seq
+        ]
+        for row in stale_rows:
+            self.ann.mark_deleted(row)
+        missing_rows = [row for row in self.row_of.values() if row not in self.ann.row_node]
+        for row in missing_rows:
+            self.ann.insert(row)
+        if stale_rows or missing_rows or self.ann.applied_seq != self.seq:
+            self.ann.applied_seq = self.seq
+            self.ann.save(self._hnsw_path)
+
+    def _ann_wanted(self) -> bool:
+        return self.index_type == "hnsw" and len(self.row_of) >= self.hnsw_min_rows
+
+    def _ann_applied(self, operations: int):
+        self.ann.applied_seq = self.seq
+        self._ann_unsaved += operations
+        if self._ann_unsaved >= self.hnsw_save_every:
+            self.save_ann()
+
+    def save_ann(self):
+        with self.lock:
+            if self.ann is not None and self._ann_unsaved:
+                self.ann.save(self._hnsw_path)
+                self._ann_unsaved = 0
+
+    def _ensure_rows(self, row_count: int):
+        while len(self.ids) < row_count:
+            self.ids.append(None)
+            self.metadata.append(None)
+        if len(self.live) < row_count:
+            self.live = np.concatenate([self.live, np.zeros(row_count - len(self.live), dtype=bool)])
+
+    def _write_manifest(self):
+        temp_path = self._manifest_path + ".tmp"
+        with open(temp_path, "w") as f:
+            json.dump({"dimension": self.dimension, "capacity": self.capacity}, f)
+        os.replace(temp_path, self._manifest_path)
+
+    def _grow(self, required_rows: int):
+        if required_rows <= self.capacity:
+            return
+        new_capacity = max(1024, self.capacity)
+        while new_capacity < required_rows:
+            new_capacity *= 2
+        os.makedirs(self.directory, exist_ok=True)
+        if self.matrix is not None:
+            self.matrix.flush()
+            del self.matrix
+        # Extending the file zero-fills the new rows.
+        with open(self._vectors_path, "ab") as f:
+            f.truncate(new_capacity * self.dimension * 4)
+        self.capacity = new_capacity
+        self.matrix = np.memmap(self._vectors_path, dtype=np.float32, mode="r+", shape=(self.capacity, self.dimension))
+        self._write_manifest()
+
+    def upsert(self, records: list) -> int:
+        with self.lock:
+            if not records:
+                return 0
+            values = np.asarray([_record_field(r, "values") for r in records], dtype=np.float32)
+            if values.ndim != 2 or values.shape[1] == 0:
+                raise ValueError("Local vector index only stores dense vectors.")
+            if self.dimension is None:
+                self.dimension = values.shape[1]
+            if values.shape[1] != self.dimension:
+                raise ValueError(f"Vector dimension {values.shape[1]} does not match index dimension {self.dimension}.")
+
+            norms = np.linalg.norm(values, axis=1, keepdims=True)
+            values = values / np.where(norms == 0, 1, norms)
+
+            rows = []
+            assigned = {}
+            next_row = len(self.ids)
+            for record in records:
+                record_id = _record_field(record, "id")
+                if record_id in assigned:
+                    row = assigned[record_id]
+                elif record_id in self.row_of:
+                    row = self.row_of[record_id]
+                elif self.free_rows:
+                    row = self.free_rows.pop()
+                else:
+                    row = next_row
+                    next_row += 1
+                assigned[record_id] = row
+                rows.append(row)
+
+            self._grow(next_row)
+            self._ensure_rows(next_row)
+            self.matrix[rows] = values
+            self.matrix.flush()
+
+            log_lines = []
+            for record, row in zip(records, rows):
+                record_id = _record_field(record, "id")
+                metadata = _record_field(record, "metadata") or {}
+                self.row_of[record_id] = row
+                self.ids[row] = record_id
+                self.metadata[row] = metadata
+                self.live[row] = True
+                self.seq += 1
+                self.row_seq[row] = self.seq
+                log_lines.append(json.dumps({"id": record_id, "row": row, "metadata": metadata}))
+            with open(self._records_path, "a") as f:
+                f.write("\n".join(log_lines) + "\n")
+
+            if self.ann is not None:
+                for row in dict.fromkeys(rows):
+                    self.ann.insert(row)
+                self._ann_applied(len(records))
+            elif self._ann_wanted():
+                # Crossed the size threshold: build the graph over every live row.
+                self.ann = HNSWIndex(self._row_vectors, **self.hnsw_params)
+                for row in self.row_of.values():
+                    self.ann.insert(row)
+                self.ann.applied_seq = self.seq
+                self.ann.save(self._hnsw_path)
+            return len(records)
+
+    def delete(self, ids: List[str]) -> int:
+        with self.lock:
+            log_lines = []
+            for record_id in ids:
+                row = self.row_of.pop(record_id, None)
+                if row is None:
+                    continue
+                self.live[row] = False
+                self.ids[row] = None
+                self.metadata[row] = None
+                self.free_rows.append(row)
+                self.seq += 1
+                if self.ann is not None:
+                    self.ann.mark_deleted(row)
+                log_lines.append(json.dumps({"id": record_id, "deleted": True}))
+            if log_lines:
+                with open(self._records_path, "a") as f:
+                    f.write("\n".join(log_lines) + "\n")
+                if self.ann is not None:
+                    self._ann_applied(len(log_lines))
+            return len(log_lines)
+
+    def fetch(self, ids: List[str]) -> Dict[str, Dict]:
+        with self.lock:
+            return {
+                record_id: {
+                    "id": record_id,
+                    "values": self.matrix[self.row_of[record_id]].tolist(),
+                    "metadata": self.metadata[self.row_of[record_id]],
+                }
+                for record_id in ids if record_id in self.row_of
+            }
+
+    def _exact_top_k(self, query: np.ndarray, k: int):
+        row_count = len(self.ids)
+        # Rows are unit length, so the dot product is the cosine similarity.
+        scores = self.matrix[:row_count] @ query
+        scores = np.where(self.live[:row_count], scores, -np.inf)
+        top_rows = np.argpartition(-scores, k - 1)[:k]
+        top_rows = top_rows[np.argsort(-scores[top_rows])]
+        return [(int(row), float(scores[row])) for row in top_rows]
+
+    def query(self, vector: List[float], top_k: int, include_metadata: bool, include_values: bool, exact: bool = False, ef_search: Optional[int] = None) -> List[Dict]:
+        with self.lock:
+            if not self.row_of:
+                return []
+            query = np.asarray(vector, dtype=np.float32)
+            norm = np.linalg.norm(query)
+            if norm:
+                query = query / norm
+
+            k = min(top_k, len(self.row_of))
+            if self.ann is not None and not exact:
+                top = self.ann.search(query, k, ef_search)
+            else:
+                top = self._exact_top_k(query, k)
+
+            matches = []
+            for row, score in top:
+                match = {"id": self.ids[row], "score": float(score)}
+                if include_metadata:
+                    match["metadata"] = self.metadata[row]
+                if include_values:
+                    match["values"] = self.matrix[row].tolist()
+                matches.append(match)
+            return matches
+
+    def count(self) -> int:
+        return len(self.row_of)
+
+
+class LocalVectorIndex:
+    def __init__(self, directory: str, dimension: Optional[int] = None, index_type: str = "flat", hnsw_params: Optional[Dict] = None) -> None:
+        """
+        An on-disk dense vector index with the same async surface as Pinecone's IndexAsyncio
+        (upsert, query, fetch, delete, describe_index_stats, close), so it can be used in its place.
+        Each namespace is stored in its own sub-directory.
+
+        Args:
+            directory (str): Where the index is persisted.
+            dimension (int, optional): Vector dimension; inferred from the first upsert if not given.
+            index_type (str): "flat" for exact search, "hnsw" for approximate search.
+            hnsw_params (Dict, optional): m, ef_construction, ef_search, save_every, and min_rows
+                (namespaces smaller than this are searched exactly, without a graph) (HNSW only).
+        """
+        self.directory = directory
+        self.dimension = dimension
+        self.index_type = index_type
+        self.hnsw_params = hnsw_params
+        self.namespaces: Dict[str, _DenseNamespace] = {}
+        self._lock = threading.Lock()
+        os.makedirs(directory, exist_ok=True)
+        for name in os.listdir(directory):
+            if os.path.isdir(os.path.join(directory, name)):
+                self._namespace(name)
+
+    def _namespace(self, namespace: Optional[str]) -> _DenseNamespace:
+        namespace = namespace or "__default__"
+        with self._lock:
+            if namespace not in self.namespaces:
+                self.namespaces[namespace] = _DenseNamespace(
+                    os.path.join(self.directory, namespace), self.dimension, self.index_type, self.hnsw_params
+                )
+            return self.namespaces[namespace]
+
+    async def upsert(self, vectors: list, namespace: Optional[str] = None, **kwargs):
+        upserted = await asyncio.to_thread(self._namespace(namespace).upsert, vectors)
+        return {"upserted_count": upserted}
+
+    async def query(
+        self,
+        vector: Optional[List[float]] = None,
+        top_k: int = 10,
+        include_metadata: bool = False,
+        include_values: bool = False,
+        namespace: Optional[str] = None,
+        sparse_vector=None,
+        exact: bool = False,
+        ef_search: Optional[int] = None,
+        **kwargs,
+    ) -> LocalQueryResponse:
+        """
+        Top-k cosine search. With index_type="hnsw", `exact=True` forces a brute-force scan
+        (for recall measurement) and `ef_search` overrides the default candidate list size.
+        """
+        if vector is None:
+            raise ValueError("Local vector index only supports dense queries.")
+        matches = await asyncio.to_thread(
+            self._namespace(namespace).query, vector, top_k, include_metadata, include_values, exact, ef_search
+        )
+        return LocalQueryResponse(matches=matches, namespace=namespace or "", usage={"read_units": 0})
+
+    async def fetch(self, ids: List[str], namespace: Optional[str] = None, **kwargs):
+        vectors = await asyncio.to_thread(self._namespace(namespace).fetch, ids)
+        return LocalQueryResponse(vectors=vectors, namespace=namespace or "", usage={"read_units": 0})
+
+    async def delete(self, ids: Optional[List[str]] = None, namespace: Optional[str] = None, **kwargs):
+        await asyncio.to_thread(self._namespace(namespace).delete, ids or [])
+        return {}
+
+    async def describe_index_stats(self, **kwargs):
+        namespaces = {name: {"vector_count": ns.count()} for name, ns in self.namespaces.items()}
+        dimensions = [ns.dimension for ns in self.namespaces.values() if ns.dimension]
+        return LocalQueryResponse(
+            dimension=self.dimension or (dimensions[0] if dimensions else None),
+            namespaces=namespaces,
+            total_vector_count=sum(ns["vector_count"] for ns in namespaces.values()),
+        )
+
+    async def close(self):
+        for namespace in self.namespaces.values():
+            with namespace.lock:
+                if namespace.matrix is not None:
+                    namespace.matrix.flush()
+                namespace.save_ann()
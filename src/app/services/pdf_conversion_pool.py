@@ -0,0 +1,147 @@
+import asyncio
+import multiprocessing
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from typing import AsyncIterator, List, Optional
+
+import pymupdf
+import pymupdf4llm
+
+# pymupdf4llm >= 0.2 switches to layout mode when pymupdf-layout is installed. Layout mode has
+# no IdentifyHeaders, so page ranges could not share header levels and every document would
+# convert in one piece. Spawned workers import this module too, so they get the same setting.
+if hasattr(pymupdf4llm, "use_layout"):
+    pymupdf4llm.use_layout(False)
+
+
+def _header_info(pdf_path: str):
+    """
+    Header levels for the whole document, computed once so every page range uses the same
+    mapping from font size to "#" level. Returns None if pymupdf4llm has no IdentifyHeaders.
+    """
+    identify_headers = getattr(pymupdf4llm, "IdentifyHeaders", None)
+    if identify_headers is None:
+        return None
+    with pymupdf.open(pdf_path) as document:
+        return identify_headers(document)
+
+
+def _convert_pages(pdf_path: str, pages: Optional[List[int]], hdr_info) -> str:
+    with pymupdf.open(pdf_path) as document:
+        if hdr_info is None:
+            return pymupdf4llm.to_markdown(document, pages=pages, write_images=False)
+        return pymupdf4llm.to_markdown(document, pages=pages, hdr_info=hdr_info, write_images=False)
+
+
+class PdfConversionPool:
+    def __init__(self, processes: int, pages_per_task: int, timeout_seconds: float) -> None:
+        """
+        Converts PDFs to markdown in worker processes. A document longer than `pages_per_task`
+        pages is split into page ranges that convert in parallel and are joined in page order.
+        The header levels are computed once for the whole document, so the result is the same
+        as converting it in one call.
+
+        Each document gets `timeout_seconds`. On timeout or cancellation, its queued page ranges
+        are cancelled. Ranges already running finish in the background; keeping ranges small
+        bounds that leftover work.
+        """
+        self.processes = processes
+        self.pages_per_task = pages_per_task
+        self.timeout_seconds = timeout_seconds
+        self._executor: Optional[ProcessPoolExecutor] = None
+
+    def _get_executor(self) -> ProcessPoolExecutor:
+        if self._executor is None:
+            # Spawned workers do not inherit the server's threads, sockets or event loop.
+            self._executor = ProcessPoolExecutor(
+                max_workers=self.processes, mp_context=multiprocessing.get_context("spawn")
+            )
+        return self._executor
+
+    @staticmethod
+    def _page_count(pdf_path: str) -> int:
+        with pymupdf.open(pdf_path) as document:
+            return document.page_count
+
+    async def _page_ranges(self, loop, executor, pdf_path: str, futures: List[asyncio.Future]):
+        """Returns (page ranges, shared header info); a None range means the whole document."""
+        page_count = await asyncio.to_thread(self._page_count, pdf_path)
+        if page_count <= self.pages_per_task:
+            return [None], None
+
+        header_future = loop.run_in_executor(executor, _header_info, pdf_path)
+        futures.append(header_future)
+        hdr_info = await header_future
+        if hdr_info is None:
+            # Splitting would change header levels, so convert in one piece.
+            return [None], None
+        page_ranges = [
+            list(range(start, min(start + self.pages_per_task, page_count)))
+            for start in range(0, page_count, self.pages_per_task)
+        ]
+        return page_ranges, hdr_info
+
+    async def _convert(self, pdf_path: str, futures: List[asyncio.Future]) -> str:
+        loop = asyncio.get_running_loop()
+        executor = self._get_executor()
+        page_ranges, hdr_info = await self._page_ranges(loop, executor, pdf_path, futures)
+
+        range_futures = [
+            loop.run_in_executor(executor, _convert_pages, pdf_path, pages, hdr_info) for pages in page_ranges
+        ]
+        futures.extend(range_futures)
+        parts = await asyncio.gather(*range_futures)
+        return "".join(parts)
+
+    async def convert(self, pdf_path: str) -> str:
+        futures: List[asyncio.Future] = []
+        try:
+            return await asyncio.wait_for(self._convert(pdf_path, futures), self.timeout_seconds)
+        finally:
+            for future in futures:
+                future.cancel()
+
+    async def convert_stream(self, pdf_path: str) -> AsyncIterator[str]:
+        """
+        Yields the markdown of each page range in page order. Joined together, the parts equal
+        `convert`. At most `processes` ranges are converted ahead of the consumer, so a slow
+        consumer holds back conversion instead of letting converted pages pile up. With 0
+        processes the ranges are converted one at a time in a thread.
+
+        The timeout counts only the time spent waiting for conversion. Time the consumer spends
+        between parts does not count.
+        """
+        loop = asyncio.get_running_loop()
+        executor = self._get_executor() if self.processes > 0 else None
+        futures: List[asyncio.Future] = []
+        budget = self.timeout_seconds
+        try:
+            started_at = loop.time()
+            page_ranges, hdr_info = await asyncio.wait_for(
+                self._page_ranges(loop, executor, pdf_path, futures), budget
+            )
+            budget -= loop.time() - started_at
+
+            in_flight = deque()
+            next_range = 0
+            while next_range < len(page_ranges) or in_flight:
+                while next_range < len(page_ranges) and len(in_flight) < max(self.processes, 1):
+                    future = loop.run_in_executor(
+                        executor, _convert_pages, pdf_path, page_ranges[next_range], hdr_info
+                    )
+                    futures.append(future)
+                    in_flight.append(future)
+                    next_range += 1
+
+                started_at = loop.time()
+                markdown = await asyncio.wait_for(in_flight.popleft(), max(budget, 0))
+                budget -= loop.time() - started_at
+                yield markdown
+        finally:
+            for future in futures:
+                future.cancel()
+
+    def shutdown(self):
+        if self._executor is not None:
+            self._executor.shutdown(wait=False, cancel_futures=True)
+            self._executor = None
@@ -0,0 +1,148 @@
+import json
+import math
+import os
+import re
+from collections import Counter
+from typing import Dict, Iterable, List, Optional
+
+from src.app.config.settings import settings
+from src.app.utils.embedding_cache import EmbeddingCache
+
+MULTI_PASSAGE = "multi_passage"
+SINGLE_PASSAGE = "single_passage"
+
+_WORD = re.compile(r"[a-z0-9']+")
+_COMPARISON = re.compile(
+    r"\b(compare[sd]?|comparison|versus|vs\.?|differences? between|whereas)\b"
+    r"|\b(more|less|better|worse|larger|smaller|higher|lower|bigger)\b.*\b(or|than)\b"
+    r"|\bor\b.*\b(more|less|better|worse|larger|smaller|higher|lower|bigger)\b"
+)
+_JOINED_QUESTIONS = re.compile(r"\?\s*\S|\b(and|also)\s+(what|how|why|when|where|who|which)\b")
+
+
+def question_features(question: str) -> List[str]:
+    # Lower-cased words and adjacent word pairs; the first word (what/which/how ...) is marked.
+    words = _WORD.findall(question.lower())
+    features = list(words)
+    features.extend(f"{a}_{b}" for a, b in zip(words, words[1:]))
+    if words:
+        features.append(f"^{words[0]}")
+    return features
+
+
+class NaiveBayesQuestionClassifier:
+    def __init__(self, class_counts: Optional[Dict[str, int]] = None, feature_counts: Optional[Dict[str, Dict[str, int]]] = None) -> None:
+        """
+        Multinomial naive Bayes over question_features with add-one smoothing. Trained offline
+        (src/testing/train_query_planner.py) and stored as JSON.
+        """
+        self.class_counts = dict(class_counts or {})
+        self.feature_counts = {label: Counter(counts) for label, counts in (feature_counts or {}).items()}
+        self._refresh()
+
+    def _refresh(self):
+        self.vocabulary = set().union(*self.feature_counts.values()) if self.feature_counts else set()
+        self.totals = {label: sum(counts.values()) for label, counts in self.feature_counts.items()}
+
+    def train(self, questions: Iterable[str], labels: Iterable[str]) -> "NaiveBayesQuestionClassifier":
+        for question, label in zip(questions, labels):
+            self.class_counts[label] = self.class_counts.get(label, 0) + 1
+            self.feature_counts.setdefault(label, Counter()).update(question_features(question))
+        self._refresh()
+        return self
+
+    def probabilities(self, question: str) -> Dict[str, float]:
+        documents = sum(self.class_counts.values())
+        if not documents:
+            return {}
+        features = [feature for feature in question_features(question) if feature in self.vocabulary]
+        log_scores = {}
+        for label, count in self.class_counts.items():
+            counts, denominator = self.feature_counts[label], self.totals[label] + len(self.vocabulary)
+            log_scores[label] = math.log(count / documents) + sum(
+                math.log((counts[feature] + 1) / denominator) for feature in features
+            )
+        best = max(log_scores.values())
+        exp_scores = {label: math.exp(score - best) for label, score in log_scores.items()}
+        total = sum(exp_scores.values())
+        return {label: score / total for label, score in exp_scores.items()}
+
+    def to_dict(self) -> Dict:
+        return {"class_counts": self.class_counts, "feature_counts": {label: dict(c) for label, c in self.feature_counts.items()}}
+
+    @classmethod
+    def load(cls, path: str) -> "NaiveBayesQuestionClassifier":
+        with open(path, encoding="utf-8") as f:
+            return cls(**json.load(f))
+
+    def save(self, path: str):
+        with open(path, "w", encoding="utf-8") as f:
+            json.dump(self.to_dict(), f, sort_keys=True)
+
+
+class QueryPlanner:
+    def __init__(self, model_path: str, decompose_threshold: float, short_query_words: int = 0) -> None:
+        """
+        Decides on the CPU whether a query is worth an LLM decomposition call.
+
+        Rules come first: several questions in one, or a comparison, are decomposed, and
+        (optionally) short single questions are not. Other queries go to the classifier, which
+        estimates how likely the question needs several passages (the multi-passage questions
+        of RAG_Evaluation_Dataset). They are decomposed above `decompose_threshold`. Without a
+        trained model every such query is decomposed, as before the planner existed.
+
+        Args:
+            model_path (str): JSON model written by src/testing/train_query_planner.py.
+            decompose_threshold (float): Minimum multi-passage probability to decompose.
+            short_query_words (int): Queries with at most this many words are never decomposed
+                unless a rule asks for it; 0 leaves them to the classifier. Many short questions
+                need several passages, so the rule costs recall.
+        """
+        self.model_path = model_path
+        self.decompose_threshold = decompose_threshold
+        self.short_query_words = short_query_words
+        self._classifier: Optional[NaiveBayesQuestionClassifier] = None
+        self._loaded = False
+
+    @property
+    def classifier(self) -> Optional[NaiveBayesQuestionClassifier]:
+        if not self._loaded:
+            self._loaded = True
+            if os.path.exists(self.model_path):
+                self._classifier = NaiveBayesQuestionClassifier.load(self.model_path)
+            else:
+                print(f"Query planner model '{self.model_path}' not found; queries the rules do not decide are decomposed.")
+        return self._classifier
+
+    def plan(self, query: str) -> Dict:
+        """
+        Returns {"decompose": bool, "reason": str, "multi_passage_probability": float or None}.
+        """
+        if query.count("?") > 1 or _JOINED_QUESTIONS.search(query.strip().rstrip("?")):
+            return {"decompose": True, "reason": "several questions", "multi_passage_probability": None}
+        if _COMPARISON.search(query.lower()):
+            return {"decompose": True, "reason": "comparison", "multi_passage_probability": None}
+        if len(query.split()) <= self.short_query_words:
+            return {"decompose": False, "reason": "short single question", "multi_passage_probability": None}
+        if self.classifier is None:
+            return {"decompose": True, "reason": "no classifier", "multi_passage_probability": None}
+
+        probability = self.classifier.probabilities(query).get(MULTI_PASSAGE, 0.0)
+        return {
+            "decompose": probability >= self.decompose_threshold,
+            "reason": "classifier",
+            "multi_passage_probability": round(probability, 3),
+        }
+
+
+query_planner = QueryPlanner(
+    settings.QUERY_PLANNER_MODEL_PATH,
+    settings.QUERY_PLANNER_DECOMPOSE_THRESHOLD,
+    settings.QUERY_PLANNER_SHORT_QUERY_WORDS,
+)
+
+# Sub-queries of recurring queries. EmbeddingCache stores any JSON value, here a list of strings.
+query_decomposition_cache = EmbeddingCache(
+    max_entries=settings.QUERY_DECOMPOSITION_CACHE_SIZE,
+    ttl_seconds=settings.QUERY_DECOMPOSITION_CACHE_TTL_SECONDS,
+)
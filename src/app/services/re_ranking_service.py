@@ -1,26 +1,190 @@
+import hashlib
+import time
+import unicodedata
+from collections import OrderedDict
+from typing import Dict, List, Optional, Tuple
+from fastapi import Depends
 from src.app.config.settings import settings
-from pinecone import PineconeAsyncio, ServerlessSpec, VectorType
+from src.app.config.vector_store import vector_store_registry
+from src.app.utils.content_hash import chunk_id
 
 
-class ReRanker:
+class RerankScoreCache:
+    def __init__(self, max_entries: int) -> None:
+        """
+        Cross-encoder scores by (query hash, chunk hash). A pair scored once is never sent to
+        the rerank endpoint again while it stays in the cache.
+
+        Args:
+            max_entries (int): Number of scores kept, least recently used first out.
+        """
+        self.max_entries = max_entries
+        self._scores: "OrderedDict[Tuple[str, str], float]" = OrderedDict()
+
+    @staticmethod
+    def query_hash(query: str) -> str:
+        normalized = " ".join(unicodedata.normalize("NFKC", query).split())
+        return hashlib.sha256(normalized.encode("utf-8")).hexdigest()
+
+    def get(self, query_hash: str, chunk_hash: str) -> Optional[float]:
+        score = self._scores.get((query_hash, chunk_hash))
+        if score is not None:
+            self._scores.move_to_end((query_hash, chunk_hash))
+        return score
+
+    def set(self, query_hash: str, chunk_hash: str, score: float):
+        self._scores[(query_hash, chunk_hash)] = score
+        self._scores.move_to_end((query_hash, chunk_hash))
+        while len(self._scores) > self.max_entries:
+            self._scores.popitem(last=False)
+
+    def __len__(self):
+        return len(self._scores)
+
+
+class RerankMetrics:
     def __init__(self) -> None:
+        self.requests = 0
+        self.candidates = 0
+        self.remote_calls = 0
+        self.remote_documents = 0
+        self.cached_scores = 0
+        self.skipped_calls = 0
+        self.remote_seconds = 0.0
+
+    def to_dict(self) -> Dict:
+        return {
+            "requests": self.requests,
+            "candidates": self.candidates,
+            "remote_calls": self.remote_calls,
+            "remote_documents": self.remote_documents,
+            "cached_scores": self.cached_scores,
+            "skipped_calls": self.skipped_calls,
+            "remote_seconds": round(self.remote_seconds, 3),
+            "cache_entries": len(rerank_score_cache),
+        }
+
+
+class ReRanker:
+    def __init__(self, vector_store = Depends(vector_store_registry.get_registry)) -> None:
+        self.vector_store = vector_store
         self.reranker_model = "bge-reranker-v2-m3"
-        
-    async def re_ranker(self,query, chunks):
-        async with PineconeAsyncio(api_key= settings.PINECONE_API_KEY) as pc:
-            results = await pc.inference.rerank(
-                model= self.reranker_model,
-                query= query,
-                documents= chunks,
-                return_documents= True,
-                top_n=3,
-                parameters={
-                    "truncate": "END"
-                }
-            )
-        docs =    [entry["document"]["text"] for entry in results.data]
-        #return docs
-         
-        return [{"score" : entry["score"], "document": entry["document"]["text"]} for entry in results.data], docs #, results.usage["rerank_units"]
-        
-        
\ No newline at end of file
+        self.top_n = 3
+
+    async def re_ranker(self, query, chunks, signals: Optional[Dict[str, Dict[str, float]]] = None):
+        """
+        Returns the top_n chunks for the query as ([entry], docs). An entry scored by the
+        cross-encoder is {"score", "document", "score_source": "rerank"}, as without the cascade.
+        One the cascade accepted on local signals is {"local_score", "document",
+        "score_source": "local"}. The two scales are not comparable, so they never share a key.
+
+        Without `signals`, or with CASCADE_RERANK_ENABLED off, every chunk is scored by the
+        remote cross-encoder. With them, the cascade in cascade_order decides which chunks
+        need it. Either way, pairs already in the score cache are not sent again.
+
+        :param signals: {"dense": {chunk: cosine}, "sparse": {chunk: BM25 score}, "rrf": {chunk: RRF score}}
+        """
+        rerank_metrics.requests += 1
+        rerank_metrics.candidates += len(chunks)
+        if signals is None or not settings.CASCADE_RERANK_ENABLED:
+            remote = await self._remote_scores(query, chunks)
+            ranked = sorted(chunks, key=lambda chunk: remote.get(chunk, 0.0), reverse=True)[:self.top_n]
+            final = [{"score": remote.get(chunk, 0.0), "document": chunk, "score_source": "rerank"} for chunk in ranked]
+            return final, ranked
+
+        local = self.local_scores(chunks, signals)
+        accepted, band = self.cascade_order(chunks, local)
+        remote = await self._remote_scores(query, band) if band else {}
+        if not band:
+            rerank_metrics.skipped_calls += 1
+
+        # Accepted chunks outrank the band by construction; the band is ordered by the cross-encoder.
+        ranked = accepted + sorted(band, key=lambda chunk: remote.get(chunk, 0.0), reverse=True)
+        final = [
+            {"score": remote[chunk], "document": chunk, "score_source": "rerank"} if chunk in remote
+            else {"local_score": local[chunk], "document": chunk, "score_source": "local"}
+            for chunk in ranked[:self.top_n]
+        ]
+        return final, [entry["document"] for entry in final]
+
+    @staticmethod
+    def local_scores(chunks: List[str], signals: Dict[str, Dict[str, float]]) -> Dict[str, float]:
+        """
+        Cheap relevance in [0, 1]: a weighted sum of the dense cosine similarity, the BM25 score
+        divided by the best BM25 score for the query, and the RRF score divided by its best value.
+        A chunk that one retriever did not return gets 0 for that signal.
+        """
+        dense = signals.get("dense", {})
+        sparse = signals.get("sparse", {})
+        rrf = signals.get("rrf", {})
+        best_sparse = max(sparse.values(), default=0.0) or 1.0
+        best_rrf = max(rrf.values(), default=0.0) or 1.0
+        weight_total = settings.CASCADE_DENSE_WEIGHT + settings.CASCADE_SPARSE_WEIGHT + settings.CASCADE_RRF_WEIGHT
+        return {
+            chunk: (
+                settings.CASCADE_DENSE_WEIGHT * min(max(dense.get(chunk, 0.0), 0.0), 1.0)
+                + settings.CASCADE_SPARSE_WEIGHT * max(sparse.get(chunk, 0.0), 0.0) / best_sparse
+                + settings.CASCADE_RRF_WEIGHT * rrf.get(chunk, 0.0) / best_rrf
+            ) / weight_total
+            for chunk in chunks
+        }
+
+    def cascade_order(self, chunks: List[str], local: Dict[str, float]) -> Tuple[List[str], List[str]]:
+        """
+        Splits candidates by local score around the top_n boundary (the top_n-th best score):
+            accepted - more than CASCADE_MARGIN above it; kept without a remote score
+            band     - within CASCADE_MARGIN of it; ordered by the remote cross-encoder
+        Chunks further below are dropped. If the top_n are CASCADE_MARGIN clear of the next
+        candidate and each scores at least CASCADE_ACCEPT_SCORE, the retrievers agree well
+        enough to skip the remote call: everything is accepted and the band is empty.
+        """
+        ranked = sorted(chunks, key=lambda chunk: local[chunk], reverse=True)
+        if not ranked:
+            return [], []
+        margin = settings.CASCADE_MARGIN
+        boundary = local[ranked[min(self.top_n, len(ranked)) - 1]]
+        following = local[ranked[self.top_n]] if len(ranked) > self.top_n else float("-inf")
+        if boundary - following >= margin and boundary >= settings.CASCADE_ACCEPT_SCORE:
+            return ranked[:self.top_n], []
+
+        accepted = [chunk for chunk in ranked if local[chunk] > boundary + margin]
+        band = [chunk for chunk in ranked if abs(local[chunk] - boundary) <= margin]
+        return accepted, band
+
+    async def _remote_scores(self, query: str, chunks: List[str]) -> Dict[str, float]:
+        # Cross-encoder scores for `chunks`, from the cache where possible and one rerank call for the rest.
+        query_hash = rerank_score_cache.query_hash(query)
+        scores, missing = {}, []
+        for chunk in dict.fromkeys(chunks):
+            score = rerank_score_cache.get(query_hash, chunk_id(chunk))
+            if score is None:
+                missing.append(chunk)
+            else:
+                scores[chunk] = score
+        rerank_metrics.cached_scores += len(scores)
+        if not missing:
+            return scores
+
+        started_at = time.perf_counter()
+        results = await self.vector_store.inference.rerank(
+            model= self.reranker_model,
+            query= query,
+            documents= missing,
+            return_documents= False,
+            top_n=len(missing),
+            parameters={
+                "truncate": "END"
+            }
+        )
+        rerank_metrics.remote_seconds += time.perf_counter() - started_at
+        rerank_metrics.remote_calls += 1
+        rerank_metrics.remote_documents += len(missing)
+        for entry in results.data:
+            chunk = missing[entry["index"]]
+            scores[chunk] = entry["score"]
+            rerank_score_cache.set(query_hash, chunk_id(chunk), entry["score"])
+        return scores
+
+
+rerank_score_cache = RerankScoreCache(settings.RERANK_SCORE_CACHE_SIZE)
+rerank_metrics = RerankMetrics()
@@ -0,0 +1,50 @@
+import asyncio
+import time
+from typing import Any, Awaitable, Callable, Dict
+
+from src.app.config.settings import settings
+
+
+class RetrievalFanoutService:
+    def __init__(self) -> None:
+        # Per-source time budgets in seconds; sources without an entry have no timeout.
+        self.timeouts = {
+            "dense": settings.RETRIEVAL_DENSE_TIMEOUT_SECONDS,
+            "sparse": settings.RETRIEVAL_SPARSE_TIMEOUT_SECONDS,
+            "images": settings.RETRIEVAL_IMAGES_TIMEOUT_SECONDS,
+        }
+
+    async def _run_source(self, name: str, source: Callable[[], Awaitable[Any]]):
+        started_at = time.perf_counter()
+        try:
+            result = await asyncio.wait_for(source(), timeout=self.timeouts.get(name))
+            error = None
+        except asyncio.TimeoutError:
+            result, error = None, f"timed out after {self.timeouts.get(name)}s"
+        except Exception as e:
+            result, error = None, str(e)
+        return name, result, error, round(time.perf_counter() - started_at, 3)
+
+    async def fan_out(self, sources: Dict[str, Callable[[], Awaitable[Any]]]) -> Dict[str, Dict]:
+        """
+        Runs every retrieval source concurrently, each under its own timeout. A slow or failing
+        source does not fail the others; its result is None and the reason is reported.
+
+        Args:
+            sources (Dict[str, Callable]): Source name -> coroutine function performing the search.
+
+        Returns:
+            Dict[str, Dict]: {"results": name -> result or None,
+                              "errors": name -> error message (only failed sources),
+                              "timings": name -> seconds}
+        """
+        outcomes = await asyncio.gather(*(self._run_source(name, source) for name, source in sources.items()))
+
+        fanout = {"results": {}, "errors": {}, "timings": {}}
+        for name, result, error, elapsed in outcomes:
+            fanout["results"][name] = result
+            fanout["timings"][name] = elapsed
+            if error is not None:
+                print(f"Retrieval source '{name}' failed: {error}")
+                fanout["errors"][name] = error
+        return fanout
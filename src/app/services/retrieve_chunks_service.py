@@ -1,5 +1,4 @@
 from src.app.config.settings import settings
-from pinecone import PineconeAsyncio
 from src.app.services.vector_db_service import VectorDBService
 from qdrant_client import AsyncQdrantClient, models
 from src.app.config.settings import settings
@@ -7,10 +6,15 @@ from pymilvus import AsyncMilvusClient, MilvusClient, DataType
 from src.app.services.sparse_embedding_service import SparseEmbeddingsService
 from fastapi import Depends
 from src.app.repositories.images_repository import ImageMappingRepo
+from src.app.config.vector_store import vector_store_registry
+from src.app.utils.embedding_cache import query_embedding_cache
 
 class RetrieveChunksService:
-    def __init__(self, query_embedding_service = Depends(SparseEmbeddingsService), images_repository = Depends(ImageMappingRepo)):
+    def __init__(self, query_embedding_service = Depends(SparseEmbeddingsService), images_repository = Depends(ImageMappingRepo), vector_store = Depends(vector_store_registry.get_registry)):
+        self.vector_store = vector_store
         self.index_name = "idx001"
+        self.embedding_model = "llama-text-embed-v2"
+        self.embedding_dimension = 1024
         self.collection_name = "rag_collection"
         self.qdrant_client = AsyncQdrantClient(url=settings.QDRANT_URL)
         self.milvus_async_client = None
@@ -23,59 +27,55 @@ class RetrieveChunksService:
         """
         Retrieves top-k most similar chunks to the user query from Pinecone.
         """
-        async with PineconeAsyncio(api_key=settings.PINECONE_API_KEY) as pc:
-            if not await pc.has_index(self.index_name):
-                raise ValueError(f"Index '{self.index_name}' does not exist.")
+        idx = await self.vector_store.get_index(self.index_name)
+
+        try:
+            # Generate (or reuse the cached) embedding for the query
+            query_vector, query_token_usage = await self._embed_query(query)
             
-            index_info = await pc.describe_index(name=self.index_name)
-
-            try:
-
-                async with pc.IndexAsyncio(host=index_info.host) as idx:
-                    # Generate embedding for the query
-                    embedding_result = await pc.inference.embed(
-                        model="llama-text-embed-v2",
-                        inputs=[query],
-                        parameters={
-                            "input_type": "query",
-                            "truncate": "END",
-                            "dimension" : 1024
-                        }
-                    )
-                    query_token_usage = embedding_result.usage["total_tokens"]
-                    
-                    # Perform similarity search
-                    results = await idx.query(
-                        vector=embedding_result[0].values,
-                        top_k=top_k,
-                        include_metadata=True,
-                        namespace="textportion"
-                    )
-
-                    # Extract retrieved chunks
-                    retrieved_chunks = [match["metadata"]["text"] for match in results["matches"]]
-                    
-                    return retrieved_chunks, query_token_usage, results.usage["read_units"]
-
-            except Exception as e:
-                print(f"Error retrieving chunks: {e}")
-                return []
+            # Perform similarity search
+            results = await idx.query(
+                vector=query_vector,
+                top_k=top_k,
+                include_metadata=True,
+                namespace="textportion"
+            )
+
+            # Extract retrieved chunks; the similarity scores feed the cascade reranker.
+            retrieved_chunks = [match["metadata"]["text"] for match in results["matches"]]
+            scores = [match["score"] for match in results["matches"]]
             
-    async def generate_query_embedding(self, query: str):
-        """Generates an embedding for the query using Pinecone's hosted model."""
-        async with PineconeAsyncio(api_key=settings.PINECONE_API_KEY) as pc:
+            return retrieved_chunks, query_token_usage, results.usage["read_units"], scores
+
+        except Exception as e:
+            print(f"Error retrieving chunks: {e}")
+            return []
             
-            embedding_result = await pc.inference.embed(
-                    model="llama-text-embed-v2",
+    async def _embed_query(self, query: str):
+        """
+        Returns (embedding, tokens used) for the query. Each distinct query is embedded once
+        per process; repeats come from the query embedding cache and cost no tokens.
+        """
+        async def compute():
+            embedding_result = await self.vector_store.inference.embed(
+                    model=self.embedding_model,
                     inputs=[query],
                     parameters={
                         "input_type": "query",
                         "truncate": "END",
-                        "dimension" : 1024
+                        "dimension" : self.embedding_dimension
                     }
                 )
-        
-        return embedding_result[0].values  # Extracting embedding vector
+            return embedding_result[0].values, embedding_result.usage["total_tokens"]
+
+        return await query_embedding_cache.get_or_compute(
+            self.embedding_model, "query", self.embedding_dimension, query, compute
+        )
+
+    async def generate_query_embedding(self, query: str):
+        """Generates an embedding for the query using Pinecone's hosted model."""
+        query_vector, _ = await self._embed_query(query)
+        return query_vector  # Extracting embedding vector
 
     async def search_qdrant(self, query: str, limit: int = 10):
         """Searches Qdrant for the most relevant chunks based on the query embedding."""
@@ -149,62 +149,53 @@ class RetrieveChunksService:
         """
         Retrieves top-k most similar chunks to the user query from Pinecone.
         """
-        async with PineconeAsyncio(api_key=settings.PINECONE_API_KEY) as pc:
-            if not await pc.has_index(self.sparse_index_name):
-                raise ValueError(f"Index '{self.sparse_index_name}' does not exist.")
-            
-            index_info = await pc.describe_index(name=self.sparse_index_name)
-
-            try:
-                async with pc.IndexAsyncio(host=index_info.host) as idx:
-                    vector = self.query_emebedding_service.generate_query_embedding(query)
-                    # Perform similarity search
-                    results = await idx.query(
-                        sparse_vector =  vector,
-                        top_k=top_k,
-                        include_metadata=True,
-                        include_values= False,
-                        
-                    )
-
-                    # Extract retrieved chunks
-                    retrieved_chunks = [match["metadata"]["text"] for match in results["matches"]]
-                    return retrieved_chunks, results.usage["read_units"]
-
-            except Exception as e:
-                print(f"Error retrieving chunks: {e}")
-                return []
+        idx = await self.vector_store.get_index(self.sparse_index_name)
+
+        try:
+            vector = self.query_emebedding_service.generate_query_embedding(query)
+            # Perform similarity search
+            results = await idx.query(
+                sparse_vector =  vector,
+                top_k=top_k,
+                include_metadata=True,
+                include_values= False,
+                
+            )
+
+            # Extract retrieved chunks; the BM25 scores feed the cascade reranker.
+            retrieved_chunks = [match["metadata"]["text"] for match in results["matches"]]
+            scores = [match["score"] for match in results["matches"]]
+            return retrieved_chunks, results.usage["read_units"], scores
+
+        except Exception as e:
+            print(f"Error retrieving chunks: {e}")
+            return []
             
     async def pinecone_retrieve_similar_chunks_images(self, query: str, top_k: int = 3):
         """
         Retrieves top-k most similar chunks to the user query from Pinecone.
         """
-        async with PineconeAsyncio(api_key=settings.PINECONE_API_KEY) as pc:
-            if not await pc.has_index("idx001"):
-                raise ValueError(f"Index {'idx001'} does not exist.")
+        idx = await self.vector_store.get_index(self.index_name)
+
+        try:
+            vector = await self.generate_query_embedding(query)
+            # Perform similarity search
+            results = await idx.query(
+                vector = vector,
+                top_k=top_k,
+                include_metadata=True,
+                include_values= False,
+                namespace="imgportion"
+            )
+
+            # Extract retrieved chunks
+            retrieved_record_ids = [match["metadata"]["record_id"] for match in results["matches"] if match["score"]>0.45]
+            print(f"============{len(retrieved_record_ids)}")
             
-            index_info = await pc.describe_index(name="idx001")
-
-            try:
-                async with pc.IndexAsyncio(host=index_info.host) as idx:
-                    vector = await self.generate_query_embedding(query)
-                    # Perform similarity search
-                    results = await idx.query(
-                        vector = vector,
-                        top_k=top_k,
-                        include_metadata=True,
-                        include_values= False,
-                        namespace="imgportion"
-                    )
-
-                    # Extract retrieved chunks
-                    retrieved_record_ids = [match["metadata"]["record_id"] for match in results["matches"] if match["score"]>0.45]
-                    print(f"============{len(retrieved_record_ids)}")
-                    
-                    retrieved_images  = await self.images_repository.fetch_base64_images(retrieved_record_ids)
-                    return retrieved_images
-                    #return retrieved_chunks, results.usage["read_units"]
-
-            except Exception as e:
-                print(f"Error retrieving chunks: {e}")
-                return []
+            retrieved_images  = await self.images_repository.fetch_base64_images(retrieved_record_ids)
+            return retrieved_images
+            #return retrieved_chunks, results.usage["read_units"]
+
+        except Exception as e:
+            print(f"Error retrieving chunks: {e}")
+            return []
@@ -1,80 +1,84 @@
-import os
-import pickle
-from pinecone_text.sparse import BM25Encoder
+import numpy as np
 from typing import List, Dict
+from src.app.services.bm25_batch_encoder import bm25_batch_encoder
+from src.app.services.bm25_stats_store import bm25_stats_store
 
 class SparseEmbeddingsService:
-    def __init__(self, model_path: str = "bm25_model.pkl"):
+    def __init__(self):
         """
-        Initializes the BM25 encoder.
+        BM25 sparse encoder backed by the process-wide BM25StatsStore. Tokenization and hashing
+        go through the shared BM25BatchEncoder; document counts, lengths and frequencies come
+        from the store, which every ingested chunk updates.
         """
-        self.model_path = model_path
-        self.bm25 = None
-        self.is_fitted = False  # Track if corpus is fitted
-        self.fitted_corpus = None  # Store the corpus used for fitting
+        self.encoder = bm25_batch_encoder
+        self.stats = bm25_stats_store
 
-    def fit_corpus(self, chunks: List[str]):
+    @staticmethod
+    def preload():
         """
-        Fits the BM25 model on the provided list of text chunks and saves it locally.
-        
-        :param chunks: List of text chunks.
+        Loads the BM25 statistics and the tokenizer (stopwords, stemmer) once per process, so
+        the first request does not pay for it.
         """
-        if not chunks:
-            raise ValueError("The corpus (chunks) must not be empty.")
-        
-        # Create and fit the BM25 model.
-        self.bm25 = BM25Encoder()
-        self.bm25.fit(chunks)
-        self.is_fitted = True
-        self.fitted_corpus = chunks
-        
-        # Save the fitted model to a local file.
-        with open(self.model_path, "wb") as f:
-            pickle.dump(self.bm25, f)
+        bm25_stats_store.ensure_loaded()
+        bm25_batch_encoder.tokenizer
 
-    def load_model(self):
+    def generate_sparse_embeddings_csr(self, chunks: List[str]):
         """
-        Loads the BM25 model from the local file if available.
+        Adds the chunks to the corpus statistics and encodes them in one batch.
+
+        :param chunks: List of text chunks.
+        :return: CSR arrays (indptr, indices, values); chunk i owns entries indptr[i]:indptr[i + 1].
         """
-        if os.path.exists(self.model_path):
-            with open(self.model_path, "rb") as f:
-                self.bm25 = pickle.load(f)
-            self.is_fitted = True
-        else:
-            self.is_fitted = False
+        if not chunks:
+            raise ValueError("Chunks list must not be empty.")
+
+        indptr, indices, counts = self.encoder.term_frequencies(chunks)
+        with self.stats.lock:
+            self.stats.add_term_frequencies(indptr, indices, counts)
+            avgdl, k1, b = self.stats.avgdl, self.stats.k1, self.stats.b
+        return indptr, indices, self.encoder.saturate(indptr, counts, avgdl, k1, b)
 
     def generate_sparse_embeddings(self, chunks: List[str]) -> List[Dict]:
         """
         Generates sparse embeddings for each chunk.
-        
+
         :param chunks: List of text chunks.
         :return: List of sparse embeddings for each chunk.
         """
+        return self.encoder.to_sparse_vectors(*self.generate_sparse_embeddings_csr(chunks))
+
+    def remove_documents(self, chunks: List[str]):
+        """
+        Takes chunks that were deleted from the sparse index out of the corpus statistics.
+
+        :param chunks: Text of the deleted chunks.
+        """
         if not chunks:
-            raise ValueError("Chunks list must not be empty.")
-        
-        # Try to load the model from file if not already fitted.
-        if not self.is_fitted:
-            self.load_model()
-        
-        # If still not fitted, then fit the model.
-        if not self.is_fitted:
-            self.fit_corpus(chunks)
-        
-        # Generate embeddings for each chunk.
-        return [self.bm25.encode_documents(chunk) for chunk in chunks]
-    
+            return
+        indptr, indices, counts = self.encoder.term_frequencies(chunks)
+        self.stats.remove_term_frequencies(indptr, indices, counts)
+
     def generate_query_embedding(self, query: str):
         """
-        Generates a sparse embedding for a query.
-        
+        Generates a sparse embedding for a query, weighting terms by their current IDF.
+
         :param query: The query string.
         :return: Sparse query embedding.
         """
-        # Ensure the model is loaded; if not, try to load from file.
-        if not self.is_fitted:
-            self.load_model()
-        if not self.is_fitted:
-            raise RuntimeError("BM25 model is not fitted. Please call fit_corpus with your document corpus first.")
-        
-        return self.bm25.encode_queries(query)
+        _, indices, _ = self.encoder.term_frequencies([query])
+        indices = indices.tolist()
+        with self.stats.lock:
+            self.stats.ensure_loaded()
+            if not self.stats.n_docs:
+                raise RuntimeError("BM25 statistics are empty. Ingest documents before querying.")
+            n_docs = self.stats.n_docs
+            df = self.stats.document_frequencies(indices)
+
+        # Same weighting as BM25Encoder._encode_single_query; unseen terms count as df=1.
+        df = np.where(df == 0, 1, df)
+        idf = np.log((n_docs + 1) / (df + 0.5))
+        idf_norm = idf / idf.sum()
+        return {
+            "indices": indices,
+            "values": idf_norm.tolist(),
+        }
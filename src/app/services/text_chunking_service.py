@@ -1,4 +1,10 @@
+import asyncio
 import re
+from typing import AsyncIterable, List
+from src.app.utils.tokenizers import CachedTokenizer, chunk_tokenizer
+
+# Sentence boundaries: whitespace after '.', '!' or '?'.
+_SENTENCE_BREAK = re.compile(r'(?<=[.!?])\s+')
 
 class TextSplitters:
     def __init__(self) -> None:
@@ -76,42 +82,124 @@ class TextSplitters:
         - A list of chunk strings.
         """
         allowed_size = max_chunk_size - len(prefix)
-        # Use a simple regex to split content into sentences.
-        sentences = re.split(r'(?<=[.!?])\s+', content)
-        
+        if allowed_size <= 0:
+            raise ValueError("The header prefix leaves no room for content in a chunk.")
+
+        # The current chunk is kept as pieces joined by single spaces and only built when it is
+        # emitted. A sentence that is too long is consumed by moving an offset into it instead
+        # of re-slicing the rest. Every character is copied a bounded number of times, so the
+        # cost is linear in the input and output size.
         chunks = []
-        current_chunk = ""
-        i = 0
-        while i < len(sentences):
-            sentence = sentences[i]
-            # Decide if we can add the sentence to the current chunk.
-            candidate = sentence if not current_chunk else current_chunk + " " + sentence
-            if len(candidate) <= allowed_size:
-                current_chunk = candidate
-                i += 1
+        pieces = []
+        current_length = 0
+
+        def emit():
+            nonlocal pieces, current_length
+            current_chunk = " ".join(pieces)
+            chunks.append(prefix + current_chunk)
+            # Prepare overlap: take the last 'chunk_overlap' characters from current_chunk (if possible)
+            if chunk_overlap > 0 and current_length > chunk_overlap:
+                pieces = [current_chunk[-chunk_overlap:]]
+                current_length = chunk_overlap
             else:
+                pieces = []
+                current_length = 0
+
+        # Use a simple regex to split content into sentences.
+        for sentence in _SENTENCE_BREAK.split(content):
+            start = 0
+            while True:
+                sentence_length = len(sentence) - start
+                candidate_length = sentence_length if not current_length else current_length + 1 + sentence_length
+                if candidate_length <= allowed_size:
+                    rest = sentence[start:] if start else sentence
+                    if current_length:
+                        pieces.append(rest)
+                    elif sentence_length:
+                        pieces = [rest]
+                    current_length = candidate_length
+                    break
                 # If the current chunk is empty (i.e. single sentence too long), force-split it.
-                if not current_chunk:
-                    current_chunk = sentence[:allowed_size]
-                    # Update the sentence to the remaining part.
-                    sentences[i] = sentence[allowed_size:]
-                # Create the chunk by prepending the header path.
-                chunk_text = prefix + current_chunk
-                chunks.append(chunk_text)
-                # Prepare overlap: take the last 'chunk_overlap' characters from current_chunk (if possible)
-                if chunk_overlap > 0 and len(current_chunk) > chunk_overlap:
-                    current_chunk = current_chunk[-chunk_overlap:]
-                else:
-                    current_chunk = ""
+                if not current_length:
+                    pieces = [sentence[start:start + allowed_size]]
+                    current_length = allowed_size
+                    start += allowed_size
+                emit()
         # Append any remaining text as a final chunk.
-        if current_chunk:
-            chunk_text = prefix + current_chunk
+        if current_length:
+            chunks.append(prefix + " ".join(pieces))
+
+        return chunks
+
+    def split_content_with_header_tokens(self, prefix: str, content: str, max_tokens: int, overlap_tokens: int, tokenizer: CachedTokenizer = chunk_tokenizer):
+        """
+        Token-count version of split_content_with_header. Chunks hold at most max_tokens tokens
+        (including the prefix), long sentences are cut at token boundaries, and each chunk
+        starts with the last overlap_tokens tokens of the previous one.
+
+        Sentence counts are added up while a chunk is built. That is exact for the whitespace
+        and regex tokenizers; a subword tokenizer may merge differently across the joining
+        space. Each emitted chunk is tokenized once, and its count is kept in the tokenizer's
+        cache for the embedding rate limiter.
+
+        Parameters:
+        - prefix: The header path string to prepend to every chunk.
+        - content: The text content to split.
+        - max_tokens: Maximum number of tokens in a chunk (including the prefix).
+        - overlap_tokens: Number of tokens from the end of the previous chunk to repeat.
+        - tokenizer: Token counter; the shared chunk_tokenizer by default.
+
+        Returns:
+        - A list of chunk strings.
+        """
+        allowed_tokens = max_tokens - (tokenizer.count(prefix) if prefix else 0)
+        if allowed_tokens <= 0:
+            raise ValueError("The header prefix leaves no room for content in a chunk.")
+
+        chunks = []
+        pieces = []
+        current_tokens = 0
+
+        def emit(final: bool = False):
+            nonlocal pieces, current_tokens
+            chunk_text = prefix + " ".join(pieces)
+            spans = tokenizer.token_spans(chunk_text)
             chunks.append(chunk_text)
-        
+            if final:
+                return
+            content_spans = [span for span in spans if span[0] >= len(prefix)]
+            if overlap_tokens > 0 and len(content_spans) > overlap_tokens:
+                pieces = [chunk_text[content_spans[-overlap_tokens][0]:]]
+                current_tokens = overlap_tokens
+            else:
+                pieces = []
+                current_tokens = 0
+
+        for sentence in _SENTENCE_BREAK.split(content):
+            spans = tokenizer.token_spans(sentence, remember=False)
+            start = 0
+            while True:
+                sentence_tokens = len(spans) - start
+                if current_tokens + sentence_tokens <= allowed_tokens:
+                    rest = sentence[spans[start][0]:] if start else sentence
+                    if rest:
+                        pieces.append(rest)
+                    current_tokens += sentence_tokens
+                    break
+                # A single sentence over the limit is cut after allowed_tokens tokens.
+                if not pieces:
+                    end = start + allowed_tokens
+                    pieces = [sentence[spans[start][0]:spans[end - 1][1]]]
+                    current_tokens = allowed_tokens
+                    start = end
+                emit()
+        if pieces:
+            emit(final=True)
+
         return chunks
 
 
-    def hierarchical_markdown_chunker(self,markdown_text: str, max_chunk_size: int = 1000, chunk_overlap: int = 200):
+    def hierarchical_markdown_chunker(self,markdown_text: str, max_chunk_size: int = 1000, chunk_overlap: int = 200, size_unit: str = "characters"):
         """
         Split a markdown document into chunks while preserving the hierarchical header context.
         For each content block, the full header path is prepended so that each chunk is self-contained.
@@ -127,48 +215,106 @@ class TextSplitters:
         - markdown_text: The complete markdown document as a string.
         - max_chunk_size: Maximum size (in characters) for each chunk (including header path).
         - chunk_overlap: Number of overlapping characters between consecutive chunks.
+        - size_unit: "characters", or "tokens" to measure max_chunk_size and chunk_overlap in
+            tokens of the shared chunk_tokenizer.
         
         Returns:
         - A list of text chunks.
         """
-        lines = markdown_text.splitlines()
-        header_stack = []  # List of tuples: (header_level, header_text)
-        current_content_lines = []
+        chunker = HierarchicalMarkdownChunker(self, max_chunk_size, chunk_overlap, size_unit)
+        return chunker.feed(markdown_text) + chunker.finish()
+
+    async def stream_hierarchical_markdown_chunks(self, markdown_parts: AsyncIterable[str], max_chunk_size: int = 1000, chunk_overlap: int = 200, size_unit: str = "characters"):
+        """
+        Streaming version of hierarchical_markdown_chunker. It takes markdown in consecutive
+        parts, such as converted page ranges, and yields each chunk once its section is complete.
+        The chunks are the same as chunking the joined parts.
+
+        Parameters:
+        - markdown_parts: Async iterator of consecutive pieces of one markdown document.
+        - max_chunk_size: Maximum size (in characters) for each chunk (including header path).
+        - chunk_overlap: Number of overlapping characters between consecutive chunks.
+        - size_unit: "characters" or "tokens", as in hierarchical_markdown_chunker.
+        """
+        chunker = HierarchicalMarkdownChunker(self, max_chunk_size, chunk_overlap, size_unit)
+        async for part in markdown_parts:
+            for chunk in await asyncio.to_thread(chunker.feed, part):
+                yield chunk
+        for chunk in chunker.finish():
+            yield chunk
+
+
+class HierarchicalMarkdownChunker:
+    def __init__(self, splitter: TextSplitters, max_chunk_size: int, chunk_overlap: int, size_unit: str = "characters") -> None:
+        """
+        Incremental state of hierarchical_markdown_chunker. Text can be fed in any number of
+        pieces. The header stack, the content of the open section and an unfinished last line
+        are carried over to the next piece. A section is chunked when the next header arrives
+        or when finish() is called.
+        """
+        if size_unit not in ("characters", "tokens"):
+            raise ValueError(f"Unknown chunk size unit '{size_unit}'.")
+        self.splitter = splitter
+        self.size_unit = size_unit
+        self.max_chunk_size = max_chunk_size
+        self.chunk_overlap = chunk_overlap
+        self.header_stack = []  # List of tuples: (header_level, header_text)
+        self.current_content_lines = []
+        self.partial_line = ""
+
+    def _flush_current_content(self, chunks: List[str]):
+        if self.current_content_lines:
+            content = "\n".join(self.current_content_lines).strip()
+            if content:
+                # Build the header breadcrumb string from the current header stack.
+                header_prefix = " > ".join(f"[H{level}] {text}" for level, text in self.header_stack)
+                if header_prefix:
+                    header_prefix += "\n\n"
+                # Split the content into chunks, each with the header prefix.
+                if self.size_unit == "tokens":
+                    sub_chunks = self.splitter.split_content_with_header_tokens(header_prefix, content, self.max_chunk_size, self.chunk_overlap)
+                else:
+                    sub_chunks = self.splitter.split_content_with_header(header_prefix, content, self.max_chunk_size, self.chunk_overlap)
+                chunks.extend(sub_chunks)
+            self.current_content_lines = []
+
+    def _process_line(self, line: str, chunks: List[str]):
+        stripped = line.lstrip()
+        # Check if the line is a markdown header.
+        if stripped.startswith("#"):
+            # Flush any accumulated content before updating the header context.
+            self._flush_current_content(chunks)
+            # Determine header level (count of '#' characters)
+            level = len(stripped) - len(stripped.lstrip("#"))
+            header_text = stripped[level:].strip()
+            # Remove headers from the stack that are at the same or deeper level.
+            while self.header_stack and self.header_stack[-1][0] >= level:
+                self.header_stack.pop()
+            # Add the new header to the stack.
+            self.header_stack.append((level, header_text))
+        else:
+            # Normal content: accumulate the line.
+            self.current_content_lines.append(line)
+
+    def feed(self, markdown_text: str) -> List[str]:
+        """Processes the complete lines of the text and returns the chunks of any sections they close."""
         chunks = []
-        
-        def flush_current_content():
-            nonlocal current_content_lines, header_stack, chunks
-            if current_content_lines:
-                content = "\n".join(current_content_lines).strip()
-                if content:
-                    # Build the header breadcrumb string from the current header stack.
-                    header_prefix = " > ".join(f"[H{level}] {text}" for level, text in header_stack)
-                    if header_prefix:
-                        header_prefix += "\n\n"
-                    # Split the content into chunks, each with the header prefix.
-                    sub_chunks = self.split_content_with_header(header_prefix, content, max_chunk_size, chunk_overlap)
-                    chunks.extend(sub_chunks)
-                current_content_lines = []
-        
+        lines = (self.partial_line + markdown_text).splitlines(keepends=True)
+        self.partial_line = ""
+        # Keep an unterminated last line (or a "\r" that may be half of "\r\n") for the next piece.
+        if lines and (lines[-1].splitlines()[0] == lines[-1] or lines[-1].endswith("\r")):
+            self.partial_line = lines.pop()
         for line in lines:
-            stripped = line.lstrip()
-            # Check if the line is a markdown header.
-            if stripped.startswith("#"):
-                # Flush any accumulated content before updating the header context.
-                flush_current_content()
-                # Determine header level (count of '#' characters)
-                level = len(stripped) - len(stripped.lstrip("#"))
-                header_text = stripped[level:].strip()
-                # Remove headers from the stack that are at the same or deeper level.
-                while header_stack and header_stack[-1][0] >= level:
-                    header_stack.pop()
-                # Add the new header to the stack.
-                header_stack.append((level, header_text))
-            else:
-                # Normal content: accumulate the line.
-                current_content_lines.append(line)
-        
-        # Flush any remaining content after processing all lines.
-        flush_current_content()
+            self._process_line(line.splitlines()[0], chunks)
         return chunks
 
+    def finish(self) -> List[str]:
+        """Processes the last line and chunks the open section."""
+        chunks = []
+        if self.partial_line:
+            for line in self.partial_line.splitlines():
+                self._process_line(line, chunks)
+            self.partial_line = ""
+        # Flush any remaining content after processing all lines.
+        self._flush_current_content(chunks)
+        return chunks
@@ -1,9 +1,10 @@
 import os
+from typing import BinaryIO, Union
 import httpx
 import unstructured_client
 from unstructured_client.models import shared
 from src.app.config.settings import settings
-from fastapi import UploadFile
+from src.app.utils.ingestion_scheduler import ingestion_scheduler, UNSTRUCTURED
 
 class UnstructuredAPIService:
     def __init__(self):
@@ -14,30 +15,31 @@ class UnstructuredAPIService:
             client=httpx.Client(verify=False)
         )
 
-    async def process_file(self, upload_file: UploadFile):
+    async def process_file(self, file_content: Union[bytes, BinaryIO], file_name: str):
         """
-        Process the UploadFile by sending its content to the unstructured API.
+        Process the uploaded file content by sending it to the unstructured API.
         
         Args:
-            upload_file (UploadFile): The uploaded file from FastAPI.
+            file_content (bytes | BinaryIO): Raw content of the uploaded file, or an open binary
+                file that the client streams from instead of holding a copy in memory.
+            file_name (str): Name of the uploaded file.
         
         Returns:
             List[str]: A list of base64 encoded images (and table data) extracted from the file.
         """
-        # Ensure the file pointer is at the beginning.
-        upload_file.file.seek(0)
+        if isinstance(file_content, (bytes, bytearray)):
+            size = len(file_content)
+        else:
+            size = os.fstat(file_content.fileno()).st_size
+        if not size:
+            raise Exception(f"Uploaded file {file_name} is empty.")
         
-        # Read file content asynchronously.
-        file_content = await upload_file.read()
-        if not file_content:
-            raise Exception(f"Uploaded file {upload_file.filename} is empty.")
-        
-        # Build the request payload using the raw bytes.
+        # Build the request payload using the raw bytes or file handle.
         req = {
             "partition_parameters": {
                 "files": {
-                    "content": file_content,  # raw bytes are passed directly
-                    "file_name": upload_file.filename,
+                    "content": file_content,  # bytes or a file handle are passed directly
+                    "file_name": file_name,
                 },
                 "strategy": shared.Strategy.HI_RES,
                 "languages": ['eng'],
@@ -50,11 +52,12 @@ class UnstructuredAPIService:
         }
         
         try:
-            # Call the unstructured API asynchronously.
+            # Wait for an Unstructured request slot, then call the API asynchronously.
+            await ingestion_scheduler.acquire(UNSTRUCTURED)
             response = await self.client.general.partition_async(request=req)
             # Convert response elements to a list.
             elements = list(response.elements)
             # Filter and return the base64 images (or table images) from the metadata.
             return [x["metadata"]["image_base64"] for x in elements if x["type"] in ["Image", "Table"]]
         except Exception as e:
-            raise Exception(f"Error processing file {upload_file.filename}: {e}")
+            raise Exception(f"Error processing file {file_name}: {e}")
@@ -1,8 +1,7 @@
 from src.app.config.settings import settings
 import asyncio
-from pinecone import PineconeAsyncio, ServerlessSpec, VectorType
+from pinecone import ServerlessSpec, VectorType
 import uuid
-import time
 import asyncio
 import uuid
 from qdrant_client import AsyncQdrantClient, models
@@ -10,89 +9,114 @@ from src.app.config.settings import settings
 from pymilvus import AsyncMilvusClient, MilvusClient, DataType
 from pinecone import Pinecone, SparseValues, Vector
 import uuid
-import time
+from src.app.utils.ingestion_scheduler import ingestion_scheduler, PINECONE_INFERENCE
+from src.app.utils.bounded_pipeline import BoundedBatchPipeline, abatch
+from src.app.config.vector_store import vector_store_registry
+from src.app.utils.content_hash import chunk_id
+from src.app.utils.cost_tracking import cost_tracker
+from src.app.utils.tokenizers import embedding_token_count
+from fastapi import Depends
 
 
 class VectorDBService:
-    def __init__(self) -> None:
+    def __init__(self, vector_store = Depends(vector_store_registry.get_registry)) -> None:
+        self.vector_store = vector_store
         self.index_name = "idx001"
-        self.token_limit_per_minute = 250000  # Pinecone's token limit
         self.batch_size = 50  # Adjust based on your use case
+        self.embed_upsert_window = settings.EMBED_UPSERT_WINDOW  # Batches in flight at once
         self.collection_name = "rag_collection"
         self.qdrant_client = AsyncQdrantClient(url=settings.QDRANT_URL)
         self.milvus_async_client = None  # Example: "sqlite:///:memory:"
         #self.milvus_client = MilvusClient(uri="http://localhost:19530/") # Example: ""
         self.sparse_index_name = "sparse001"
+        self.fetch_batch_size = 1000  # Pinecone's limit on ids per fetch
+
+    async def existing_ids(self, idx, ids: list[str], namespace: str = "") -> set[str]:
+        """
+        Returns the ids that are already stored in `namespace` of the index.
+        """
+        existing = set()
+        for start in range(0, len(ids), self.fetch_batch_size):
+            response = await idx.fetch(ids=ids[start:start + self.fetch_batch_size], namespace=namespace)
+            existing.update(response.vectors.keys())
+        return existing
+
+    async def _embed_and_upsert_batch(self, idx, batch_number: int, batch: list[str]) -> int:
+        """
+        Embeds one batch of chunks and upserts it into the dense index. Chunks are stored under
+        the hash of their text, and chunks that are already stored are skipped.
+
+        :return: Embedding tokens reported by Pinecone for the batch.
+        """
+        chunks = {chunk_id(text): text for text in batch}
+        existing = await self.existing_ids(idx, list(chunks), namespace="textportion")
+        batch = [text for cid, text in chunks.items() if cid not in existing]
+        if not batch:
+            print(f"Batch {batch_number + 1} already stored, skipped.")
+            return 0
+
+        # Counted with the chunking tokenizer; chunks cut by token count reuse their cached count.
+        batch_token_count = embedding_token_count(batch)
+
+        # Wait for the shared Pinecone inference budget without blocking the loop.
+        await ingestion_scheduler.acquire(PINECONE_INFERENCE, batch_token_count)
+
+        # Generate embeddings
+        embeddings = await self.vector_store.inference.embed(
+            model="llama-text-embed-v2",
+            inputs=batch,
+            parameters={
+                "input_type": "passage",
+                "truncate": "END",
+                "dimension" : 1024
+            }
+            
+        )
+        records = [
+            {
+                "id": chunk_id(d),  # Content hash, so re-ingesting a chunk overwrites it
+                "values": e["values"],  # Correct embedding extraction
+                "metadata": {"text": d},
+            }
+            for d, e in zip(batch, embeddings)
+        ]
+
+        # Upsert records into Pinecone
+        await idx.upsert(vectors=records, namespace="textportion")
+        print(f"Batch {batch_number + 1} upserted successfully.")
+        cost_tracker.add_embedding_tokens(embeddings.usage["total_tokens"])
+        cost_tracker.add_custom_cost("estimated_embedding_tokens", batch_token_count)
+        return embeddings.usage["total_tokens"]
 
-    
     async def pinecone_generate_and_store_embeddings(self, chunks):
-        async with PineconeAsyncio(api_key= settings.PINECONE_API_KEY) as pc:
-        # Check if the index exists
-            if not await pc.has_index(self.index_name):
-                print(f"Index '{self.index_name}' not found. Creating index...")
-                await pc.create_index(
-                    name=self.index_name,
-                    dimension=1024,
-                    metric="cosine",
-                    spec=ServerlessSpec(cloud="aws", region="us-east-1"),
-                    deletion_protection="disabled",
-                    tags={"environment": "development"},
-                    vector_type=VectorType.DENSE
-                )
-                print("Index created successfully.")
-            else:
-                print(f"Index '{self.index_name}' already exists.")
-                
+        """
+        Embeds and upserts chunks as a stream of batches. Up to `embed_upsert_window` batches
+        are in flight, so the embedding call for one batch overlaps the upsert of another.
+
+        :param chunks: List, generator or async iterator of text chunks.
+        :return: Total embedding tokens used.
+        :raises: Any embedding or upsert error, so the document is not recorded as ingested.
+        """
+        # Resolve (and create if missing) the dense index through the shared registry.
+        idx = await self.vector_store.get_index(self.index_name, create_kwargs={
+            "dimension": 1024,
+            "metric": "cosine",
+            "spec": ServerlessSpec(cloud="aws", region="us-east-1"),
+            "deletion_protection": "disabled",
+            "tags": {"environment": "development"},
+            "vector_type": VectorType.DENSE,
+        })
         
-            index_info = await pc.describe_index(name= self.index_name)  
-            
-            try:    
-                async with pc.IndexAsyncio(host= index_info.host) as idx:            
-                    total_tokens_used = 0
-                    e_total_tokens_used = 0
-                    # Process in batches
-                    for i in range(0, len(chunks), self.batch_size):
-                        batch = chunks[i:i + self.batch_size]
-                        
-                        # **Count tokens by splitting text on spaces**
-                        batch_token_count = sum(len(text.split()) for text in batch)
-
-                        # If token limit exceeded, wait
-                        if total_tokens_used + batch_token_count > self.token_limit_per_minute:
-                            print("Rate limit reached, sleeping for 60 seconds...")
-                            time.sleep(60)  # Wait before resuming
-                            total_tokens_used = 0  # Reset counter
-
-                        # Generate embeddings
-                        embeddings = await pc.inference.embed(
-                            model="llama-text-embed-v2",
-                            inputs=batch,
-                            parameters={
-                                "input_type": "passage",
-                                "truncate": "END",
-                                "dimension" : 1024
-                            }
-                            
-                        )
-                        e_total_tokens_used += embeddings.usage["total_tokens"]
-                        records = [
-                            {
-                                "id": str(uuid.uuid4()),  # Ensure ID is a string
-                                "values": e["values"],  # Correct embedding extraction
-                                "metadata": {"text": d},
-                            }
-                            for d, e in zip(batch, embeddings)
-                        ]
-
-                        # Upsert records into Pinecone
-                        await idx.upsert(vectors=records, namespace="textportion")
-                        print(f"Batch {i // self.batch_size + 1} upserted successfully.")
-
-                        # Update total token usage
-                        total_tokens_used += batch_token_count
-                return e_total_tokens_used                    
-            except Exception as e:
-                print(e) 
+        try:    
+            pipeline = BoundedBatchPipeline(self.embed_upsert_window)
+            token_usages = await pipeline.run(
+                abatch(chunks, self.batch_size),
+                lambda batch_number, batch: self._embed_and_upsert_batch(idx, batch_number, batch),
+            )
+            return sum(token_usages)
+        except Exception as e:
+            print(e)
+            raise e
 
     async def qdrant_setup_collection(self, vector_size: int):
         """
@@ -196,43 +220,80 @@ class VectorDBService:
         await self.milvus_async_client.insert(self.collection_name, data)
         print(f"Stored {len(data)} embeddings in Milvus.")'''
         
+    async def _get_sparse_index(self):
+        # Resolve (and create if missing) the sparse index through the shared registry.
+        return await self.vector_store.get_index(self.sparse_index_name, create_kwargs={
+            "metric": "dotproduct",
+            "spec": ServerlessSpec(cloud="aws", region="us-east-1"),
+            "deletion_protection": "disabled",
+            "tags": {"environment": "development"},
+            "vector_type": "sparse",
+        })
+
+    async def pinecone_new_sparse_chunks(self, chunks):
+        """
+        Returns the chunks that are not in the sparse index yet, without repeats. Only these
+        are encoded, so stored chunks are not counted twice in the BM25 statistics.
+        """
+        idx = await self._get_sparse_index()
+        unique_chunks = {chunk_id(text): text for text in chunks}
+        existing = await self.existing_ids(idx, list(unique_chunks))
+        return [text for cid, text in unique_chunks.items() if cid not in existing]
+
+    async def _delete_ids(self, idx, ids: list[str], namespace: str = ""):
+        for start in range(0, len(ids), self.fetch_batch_size):
+            await idx.delete(ids=ids[start:start + self.fetch_batch_size], namespace=namespace)
+
+    async def pinecone_delete_chunks(self, ids: list[str]) -> list[str]:
+        """
+        Deletes chunks from the dense and the sparse index.
+
+        :param ids: Chunk ids (content hashes) to delete.
+        :return: Text of the chunks that were removed from the sparse index, so the caller can
+                 take them out of the BM25 statistics.
+        """
+        if not ids:
+            return []
+        dense_idx = await self.vector_store.get_index(self.index_name)
+        sparse_idx = await self._get_sparse_index()
+
+        removed_texts = []
+        for start in range(0, len(ids), self.fetch_batch_size):
+            response = await sparse_idx.fetch(ids=ids[start:start + self.fetch_batch_size], namespace="")
+            removed_texts.extend(vector["metadata"]["text"] for vector in response.vectors.values())
+
+        await self._delete_ids(dense_idx, ids, namespace="textportion")
+        await self._delete_ids(sparse_idx, ids)
+        return removed_texts
+
+    async def pinecone_delete_images(self, ids: list[str]):
+        """Deletes image summary vectors (stored under the image hash) from the dense index."""
+        if not ids:
+            return
+        idx = await self.vector_store.get_index(self.index_name)
+        await self._delete_ids(idx, ids, namespace="imgportion")
+
     async def pinecone_store_sparse_embeddings(self, chunks,embeddings):
-        async with PineconeAsyncio(api_key= settings.PINECONE_API_KEY) as pc:
-        # Check if the index exists
-            if not await pc.has_index(self.sparse_index_name):
-                print(f"Index '{self.sparse_index_name}' not found. Creating index...")
-                await pc.create_index(
-                    name=self.sparse_index_name,
-                    metric="dotproduct",
-                    spec=ServerlessSpec(cloud="aws", region="us-east-1"),
-                    deletion_protection="disabled",
-                    tags={"environment": "development"},
-                    vector_type="sparse"
+        if not chunks:
+            return
+        idx = await self._get_sparse_index()
+        
+        try:    
+            vectors = []
+            for d,e in zip(chunks, embeddings):
+                vec = Vector(
+                    id= chunk_id(d),
+                    sparse_values=SparseValues(
+                        values=e["values"],
+                        indices=e["indices"]
+                    ),
+                    metadata={"text": d}
                 )
-                print("Index created successfully.")
-            else:
-                print(f"Index '{self.sparse_index_name}' already exists.")
+                vectors.append(vec) 
                 
+            await idx.upsert(vectors = vectors)
         
-            index_info = await pc.describe_index(name= self.sparse_index_name)  
-            
-            try:    
-                async with pc.IndexAsyncio(host= index_info.host) as idx:  
-
-                    vectors = []
-                    for d,e in zip(chunks, embeddings):
-                        vec = Vector(
-                            id= str(uuid.uuid4()),
-                            sparse_values=SparseValues(
-                                values=e["values"],
-                                indices=e["indices"]
-                            ),
-                            metadata={"text": d}
-                        )
-                        vectors.append(vec) 
-                        
-                    await idx.upsert(vectors = vectors)
+        except Exception as e:
+            print(e)
+            raise e
                 
-            except Exception as e:
-                print(e)
-                
\ No newline at end of file
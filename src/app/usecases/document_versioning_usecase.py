@@ -0,0 +1,132 @@
+# src/app/usecases/document_versioning_usecase.py
+import asyncio
+from typing import Dict, List
+from fastapi import Depends
+from src.app.config.settings import settings
+from src.app.repositories.documents_repository import DocumentRepo, DOCUMENT_INGESTED
+from src.app.repositories.images_repository import ImageMappingRepo
+from src.app.services.sparse_embedding_service import SparseEmbeddingsService
+from src.app.services.vector_db_service import VectorDBService
+from src.app.usecases.file_processing_usecase import FileProcessingUsecase
+from src.app.utils.upload_spool import SpooledUpload
+
+
+class DocumentVersioningUsecase:
+    def __init__(
+        self,
+        file_processing_usecase: FileProcessingUsecase = Depends(FileProcessingUsecase),
+        documents_repository: DocumentRepo = Depends(DocumentRepo),
+        images_repository: ImageMappingRepo = Depends(ImageMappingRepo),
+        vector_db_service: VectorDBService = Depends(VectorDBService),
+        sparse_embedding_service: SparseEmbeddingsService = Depends(SparseEmbeddingsService),
+    ) -> None:
+        self.file_processing_usecase = file_processing_usecase
+        self.documents_repository = documents_repository
+        self.images_repository = images_repository
+        self.vector_db_service = vector_db_service
+        self.sparse_embedding_service = sparse_embedding_service
+
+    async def ingest_version(self, upload: SpooledUpload, document_key: str, chunk_size: int, chunk_overlap: int, progress=None) -> Dict:
+        """
+        Ingests an upload as the next version of `document_key` and removes what the previous
+        version had but this one does not.
+
+        Chunks and images are stored under content hashes, so a new version only embeds the
+        chunks and summarizes the images that changed. After it is recorded, the chunk and
+        image ids of the old version are diffed against the new ones. The removed ids that no
+        other document uses are deleted from the dense and sparse indexes, and from the BM25
+        statistics. Nothing is diffed or deleted unless every write of the new version succeeded.
+
+        The key is claimed atomically, so a second upload of a key that is still ingesting
+        fails. While another document is ingesting, removed ids are deferred instead of
+        deleted, because that document may be reusing them; the next version ingested with no
+        other ingestion running deletes them.
+
+        :param upload: The upload, spooled to disk once.
+        :param document_key: Stable name of the document across versions.
+        :param progress: Optional per-stage progress reporter (see StageDAG).
+        :return: {"status": "unchanged" | "copied" | "ingested", "version": ..., "added_chunks": ...,
+                  "removed_chunks": ..., "timings": ...}
+        """
+        content_sha256 = await asyncio.to_thread(upload.sha256)
+        # The same numbers mean different chunks in character and token mode.
+        chunk_settings = (chunk_size, chunk_overlap, settings.CHUNK_SIZE_UNIT)
+        current = await self.documents_repository.get_document(document_key) or {}
+        if (
+            current.get("status") == DOCUMENT_INGESTED
+            and current.get("content_sha256") == content_sha256
+            and (current.get("chunk_size"), current.get("chunk_overlap"), current.get("chunk_size_unit")) == chunk_settings
+        ):
+            print(f"Document '{document_key}' is unchanged, skipping.")
+            return {"status": "unchanged", "version": current["version"]}
+
+        # The document as the claim found it; another version may have completed since the read above.
+        current = await self.documents_repository.start_version(
+            document_key, upload.filename, settings.DOCUMENT_INGESTION_STALE_SECONDS
+        ) or {}
+        try:
+            # The same file may already be ingested under another key; its ids are then reused as they are.
+            copy = await self.documents_repository.find_ingested_copy(content_sha256, *chunk_settings)
+            if copy is not None:
+                status, timings = "copied", {}
+                new_chunk_ids, new_image_ids = copy["chunk_ids"], copy["image_ids"]
+            else:
+                result = await self.file_processing_usecase.process_file_storage(
+                    upload, chunk_size, chunk_overlap, progress=progress
+                )
+                status, timings = "ingested", result["timings"]
+                new_chunk_ids, new_image_ids = result["chunk_ids"], result["image_ids"]
+
+            await self.documents_repository.complete_version(
+                document_key, content_sha256, *chunk_settings, new_chunk_ids, new_image_ids
+            )
+        except Exception as e:
+            await self.documents_repository.fail_version(document_key, str(e))
+            # A failed version may still have written vectors, so cached answers are invalidated too.
+            await self.documents_repository.bump_index_generation()
+            raise
+
+        kept_chunk_ids, kept_image_ids = set(new_chunk_ids), set(new_image_ids)
+        dropped_chunk_ids = [i for i in current.get("chunk_ids", []) if i not in kept_chunk_ids]
+        dropped_image_ids = [i for i in current.get("image_ids", []) if i not in kept_image_ids]
+        if await self.documents_repository.other_ingestion_running(document_key, settings.DOCUMENT_INGESTION_STALE_SECONDS):
+            await self.documents_repository.defer_deletions(dropped_chunk_ids, dropped_image_ids)
+            removed_chunk_ids, removed_image_ids = [], []
+        else:
+            deferred = await self.documents_repository.take_deferred_deletions()
+            removed_chunk_ids = await self._unreferenced(document_key, "chunk_ids", dropped_chunk_ids + deferred["chunk_ids"], new_chunk_ids)
+            removed_image_ids = await self._unreferenced(document_key, "image_ids", dropped_image_ids + deferred["image_ids"], new_image_ids)
+            await self._delete_chunks(removed_chunk_ids)
+            await self._delete_images(removed_image_ids)
+        await self.documents_repository.bump_index_generation()
+
+        added_chunks = len(set(new_chunk_ids).difference(current.get("chunk_ids", [])))
+        print(
+            f"Document '{document_key}' version {current.get('version', 0) + 1}: "
+            f"{added_chunks} chunks added, {len(removed_chunk_ids)} removed."
+        )
+        return {
+            "status": status,
+            "version": current.get("version", 0) + 1,
+            "added_chunks": added_chunks,
+            "removed_chunks": len(removed_chunk_ids),
+            "timings": timings,
+        }
+
+    async def _unreferenced(self, document_key: str, field: str, candidate_ids: List[str], new_ids: List[str]) -> List[str]:
+        # Candidate ids the new version does not use, unless another document still uses them.
+        dropped = set(candidate_ids).difference(new_ids)
+        referenced = await self.documents_repository.referenced_ids(field, dropped, exclude_key=document_key)
+        return [i for i in dict.fromkeys(candidate_ids) if i in dropped and i not in referenced]
+
+    async def _delete_chunks(self, chunk_ids: List[str]):
+        if not chunk_ids:
+            return
+        removed_texts = await self.vector_db_service.pinecone_delete_chunks(chunk_ids)
+        await asyncio.to_thread(self.sparse_embedding_service.remove_documents, removed_texts)
+
+    async def _delete_images(self, image_ids: List[str]):
+        if not image_ids:
+            return
+        await self.vector_db_service.pinecone_delete_images(image_ids)
+        await self.images_repository.delete_images(image_ids)
@@ -1,5 +1,5 @@
 # src/app/usecases/file_processing_usecase.py
-import time
+import asyncio
 from fastapi import Depends
 from src.app.services.file_conversion_service import FileConversionService
 from src.app.services.text_chunking_service import TextSplitters
@@ -7,6 +7,11 @@ from src.app.services.vector_db_service import VectorDBService
 from src.app.services.unstructured_api_service import UnstructuredAPIService
 from src.app.services.sparse_embedding_service import SparseEmbeddingsService
 from src.app.services.image_summary_service import ImageSummaryService
+from src.app.utils.stage_dag import StageDAG
+from src.app.utils.bounded_pipeline import ReplayableStream
+from src.app.utils.upload_spool import SpooledUpload
+from src.app.utils.content_hash import chunk_ids
+from src.app.config.settings import settings
 
 class FileProcessingUsecase:
     def __init__(
@@ -25,26 +30,99 @@ class FileProcessingUsecase:
         self.sparse_embedding_service = sparse_embedding_service
         self.image_summary_service = image_summary_service
 
-    async def process_file_storage(self, file_bytes: bytes, chunk_size: int, chunk_overlap: int):
+    async def _extract_images(self, upload: SpooledUpload):
+        # The Unstructured client streams the spooled file instead of a bytes copy.
+        with upload.open() as f:
+            return await self.unstructured_api_service.process_file(f, upload.filename)
+
+    def _encode_sparse(self, chunks):
+        # Every chunk may already be in the sparse index.
+        return self.sparse_embedding_service.generate_sparse_embeddings(chunks) if chunks else []
+
+    async def _store_sparse(self, chunks, embeddings):
+        try:
+            await self.vector_db_service.pinecone_store_sparse_embeddings(chunks, embeddings)
+        except Exception:
+            # Encoding already counted these chunks in the BM25 statistics; a retry counts them again.
+            await asyncio.to_thread(self.sparse_embedding_service.remove_documents, chunks)
+            raise
+
+    async def process_file_storage(self, upload: SpooledUpload, chunk_size: int, chunk_overlap: int, progress=None):
+        """
+        Ingests a spooled upload as a DAG of stages. The dense, sparse and image branches each
+        read the spooled file on their own (and share the chunk list), so they run concurrently:
+
+            convert -> chunk -> dense_embeddings
+                             -> sparse_new_chunks -> sparse_encoding -> sparse_upsert
+            extract_images -> summarize_images
+
+        Chunk and image vectors are stored under the hash of their content: chunks already in
+        an index are not embedded or encoded again, and stored image summaries are reused.
+        Skipping whole documents and cleaning up old versions is DocumentVersioningUsecase's job.
+        A failed embedding or upsert fails the whole run, so a document is never recorded
+        with vectors that were not written.
+
+        With PDF_STREAMING_CONVERSION, conversion and chunking run as one streaming stage.
+        Dense embedding reads chunks as they are produced, while sparse encoding still waits
+        for the full chunk list, which the BM25 statistics need:
+
+            chunk_stream -> chunk -> sparse_new_chunks -> sparse_encoding -> sparse_upsert
+                         -> dense_embeddings
+
+        :param upload: The upload, spooled to disk once.
+        :param progress: Optional per-stage progress reporter (see StageDAG).
+        :return: {"chunk_ids": ids of the document's chunks, in order and without repeats,
+                  "image_ids": ids of its images, "timings": per-stage timings in seconds}
+        """
         try:
-            # Convert file to markdown and chunk it.
-            text = await self.file_conversion_service.convert_to_makedown(file_bytes)
-            chunks = self.text_splitter.hierarchical_markdown_chunker(text, chunk_size, chunk_overlap)
-            
+            dag = StageDAG(progress)
+
+            if settings.PDF_STREAMING_CONVERSION:
+                # Convert page ranges and chunk them as they arrive; the "chunk" stage drives the stream.
+                dag.add_stage(
+                    "chunk_stream",
+                    lambda: ReplayableStream(
+                        self.text_splitter.stream_hierarchical_markdown_chunks(
+                            self.file_conversion_service.stream_markdown(upload.path), chunk_size, chunk_overlap,
+                            settings.CHUNK_SIZE_UNIT,
+                        )
+                    ),
+                )
+                dag.add_stage("chunk", lambda stream: stream.collect(), ["chunk_stream"])
+                dense_input = "chunk_stream"
+            else:
+                # Convert file to markdown and chunk it.
+                dag.add_stage("convert", lambda: self.file_conversion_service.convert_to_makedown(upload.path))
+                dag.add_stage(
+                    "chunk",
+                    lambda text: self.text_splitter.hierarchical_markdown_chunker(
+                        text, chunk_size, chunk_overlap, settings.CHUNK_SIZE_UNIT
+                    ),
+                    ["convert"],
+                    run_in_thread=True,
+                )
+                dense_input = "chunk"
+
             # Generate and store dense embeddings.
-            await self.vector_db_service.pinecone_generate_and_store_embeddings(chunks)
-            time.sleep(15)
-            
+            # Provider pacing is handled by the ingestion scheduler inside each service.
+            dag.add_stage("dense_embeddings", self.vector_db_service.pinecone_generate_and_store_embeddings, [dense_input])
+
             # Process the file through the unstructured API to extract base64 images.
-            base64s = await self.unstructured_api_service.process_file(file_bytes)
-            await self.image_summary_service.summarize_images(base64s)
-            
-            # Generate sparse embeddings and store them.
-            sparse_embeddings = self.sparse_embedding_service.generate_sparse_embeddings(chunks)
-            await self.vector_db_service.pinecone_store_sparse_embeddings(chunks, sparse_embeddings)
-            time.sleep(45)
-            
-            return 
+            dag.add_stage("extract_images", lambda: self._extract_images(upload))
+            dag.add_stage("summarize_images", self.image_summary_service.summarize_images, ["extract_images"])
+
+            # Generate sparse embeddings for the chunks the sparse index does not have and store them.
+            dag.add_stage("sparse_new_chunks", self.vector_db_service.pinecone_new_sparse_chunks, ["chunk"])
+            dag.add_stage("sparse_encoding", self._encode_sparse, ["sparse_new_chunks"], run_in_thread=True)
+            dag.add_stage("sparse_upsert", self._store_sparse, ["sparse_new_chunks", "sparse_encoding"])
+
+            results = await dag.run()
+            print(f"Ingestion stage timings: {dag.timings}")
+            return {
+                "chunk_ids": list(dict.fromkeys(chunk_ids(results["chunk"]))),
+                "image_ids": list(dict.fromkeys(results["summarize_images"])),
+                "timings": dag.timings,
+            }
 
         except Exception as e:
             print(e)
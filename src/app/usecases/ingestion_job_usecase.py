@@ -0,0 +1,211 @@
+# src/app/usecases/ingestion_job_usecase.py
+import asyncio
+import os
+import time
+import uuid
+from datetime import datetime, timezone
+from typing import Dict, Optional
+from fastapi import Depends, UploadFile
+from src.app.config.database import mongodb_database
+from src.app.config.settings import settings
+from src.app.config.vector_store import vector_store_registry
+from src.app.repositories.documents_repository import DocumentRepo
+from src.app.repositories.images_repository import ImageMappingRepo
+from src.app.repositories.jobs_repository import IngestionJobRepo, JOB_COMPLETED, JOB_FAILED
+from src.app.services.dense_embedding_service import EmbeddingService
+from src.app.services.file_conversion_service import FileConversionService
+from src.app.services.image_summary_service import ImageSummaryService
+from src.app.services.sparse_embedding_service import SparseEmbeddingsService
+from src.app.services.text_chunking_service import TextSplitters
+from src.app.services.unstructured_api_service import UnstructuredAPIService
+from src.app.services.vector_db_service import VectorDBService
+from src.app.usecases.file_processing_usecase import FileProcessingUsecase
+from src.app.usecases.document_versioning_usecase import DocumentVersioningUsecase
+from src.app.utils.upload_spool import SpooledUpload, peak_rss_mb
+
+
+def build_file_processing_usecase() -> FileProcessingUsecase:
+    """
+    Wires FileProcessingUsecase by hand for use outside of a request, where Depends is not resolved.
+    """
+    vector_store = vector_store_registry.get_registry()
+    return FileProcessingUsecase(
+        file_conversion_service=FileConversionService(),
+        text_splitter=TextSplitters(),
+        vector_db_service=VectorDBService(vector_store),
+        unstructured_api_service=UnstructuredAPIService(),
+        sparse_embedding_service=SparseEmbeddingsService(),
+        image_summary_service=ImageSummaryService(
+            dense_embedding_service=EmbeddingService(vector_store),
+            images_repossitory=ImageMappingRepo(mongodb_database.get_images_collection()),
+            vector_store=vector_store,
+        ),
+    )
+
+
+def build_document_versioning_usecase() -> DocumentVersioningUsecase:
+    """
+    Wires DocumentVersioningUsecase by hand for use outside of a request, where Depends is not resolved.
+    """
+    vector_store = vector_store_registry.get_registry()
+    return DocumentVersioningUsecase(
+        file_processing_usecase=build_file_processing_usecase(),
+        documents_repository=DocumentRepo(mongodb_database.get_documents_collection()),
+        images_repository=ImageMappingRepo(mongodb_database.get_images_collection()),
+        vector_db_service=VectorDBService(vector_store),
+        sparse_embedding_service=SparseEmbeddingsService(),
+    )
+
+
+class JobProgress:
+    def __init__(self, jobs_repository: IngestionJobRepo, job_id: str) -> None:
+        """
+        Records per-stage status and timings of one ingestion job in the jobs collection.
+        """
+        self.jobs_repository = jobs_repository
+        self.job_id = job_id
+        self._started = {}
+
+    async def start_stage(self, stage: str):
+        self._started[stage] = time.perf_counter()
+        await self.jobs_repository.update_stage(self.job_id, stage, {
+            "status": "running",
+            "started_at": datetime.now(timezone.utc),
+        })
+
+    async def finish_stage(self, stage: str):
+        await self.jobs_repository.update_stage(self.job_id, stage, {
+            "status": "completed",
+            "finished_at": datetime.now(timezone.utc),
+            "duration_seconds": round(time.perf_counter() - self._started.pop(stage), 3),
+        })
+
+    async def fail_stage(self, stage: str, error: str):
+        await self.jobs_repository.update_stage(self.job_id, stage, {
+            "status": "failed",
+            "finished_at": datetime.now(timezone.utc),
+            "duration_seconds": round(time.perf_counter() - self._started.pop(stage), 3),
+            "error": error,
+        })
+
+
+class IngestionWorkerPool:
+    def __init__(self, concurrency: int) -> None:
+        """
+        A fixed number of asyncio workers that pull job ids from an in-process queue.
+        The job documents in MongoDB are the source of truth, so unfinished jobs are
+        re-queued when the pool starts.
+
+        Args:
+            concurrency (int): Number of jobs processed at the same time.
+        """
+        if concurrency < 1:
+            raise ValueError("Ingestion worker concurrency must be at least 1.")
+        self.concurrency = concurrency
+        self.queue: Optional[asyncio.Queue] = None
+        self.workers = []
+        self.active_jobs = 0
+
+    async def start(self):
+        self.queue = asyncio.Queue()
+        jobs_repository = IngestionJobRepo(mongodb_database.get_jobs_collection())
+        for job_id in await jobs_repository.find_unfinished_job_ids():
+            self.queue.put_nowait(job_id)
+        self.workers = [asyncio.create_task(self._worker()) for _ in range(self.concurrency)]
+
+    async def stop(self):
+        for worker in self.workers:
+            worker.cancel()
+        await asyncio.gather(*self.workers, return_exceptions=True)
+        self.workers = []
+
+    async def enqueue(self, job_id: str):
+        if self.queue is None:
+            raise RuntimeError("Ingestion worker pool is not started.")
+        await self.queue.put(job_id)
+
+    def metrics(self) -> Dict:
+        return {
+            "concurrency": self.concurrency,
+            "queued_jobs": self.queue.qsize() if self.queue else 0,
+            "active_jobs": self.active_jobs,
+        }
+
+    async def _worker(self):
+        while True:
+            job_id = await self.queue.get()
+            self.active_jobs += 1
+            try:
+                await self._process_job(job_id)
+            except Exception as e:
+                print(f"Ingestion job {job_id} crashed: {e}")
+            finally:
+                self.active_jobs -= 1
+                self.queue.task_done()
+
+    async def _process_job(self, job_id: str):
+        jobs_repository = IngestionJobRepo(mongodb_database.get_jobs_collection())
+        job = await jobs_repository.get_job(job_id)
+        if job is None or job["status"] in (JOB_COMPLETED, JOB_FAILED):
+            return
+
+        await jobs_repository.mark_running(job_id)
+        try:
+            usecase = build_document_versioning_usecase()
+            upload = SpooledUpload(job["file_path"], job["file_name"], job.get("content_sha256"))
+            peak_rss_before = peak_rss_mb()
+            await usecase.ingest_version(
+                upload, job.get("document_key") or upload.sha256(), job["chunk_size"], job["chunk_overlap"],
+                progress=JobProgress(jobs_repository, job_id),
+            )
+            # Process-wide high-water marks; with concurrent jobs the growth is shared between them.
+            await jobs_repository.record_memory(job_id, {
+                "peak_rss_mb": peak_rss_mb(),
+                "peak_rss_growth_mb": round(peak_rss_mb() - peak_rss_before, 1),
+                "children_peak_rss_mb": peak_rss_mb(children=True),
+            })
+            await jobs_repository.mark_completed(job_id)
+        except Exception as e:
+            await jobs_repository.mark_failed(job_id, str(e))
+        finally:
+            if os.path.exists(job["file_path"]):
+                os.remove(job["file_path"])
+
+
+ingestion_worker_pool = IngestionWorkerPool(settings.INGESTION_WORKER_CONCURRENCY)
+
+
+class IngestionJobUsecase:
+    def __init__(self, jobs_repository: IngestionJobRepo = Depends(IngestionJobRepo)) -> None:
+        self.jobs_repository = jobs_repository
+
+    async def enqueue_file(self, upload_file: UploadFile, chunk_size: int, chunk_overlap: int, document_key: Optional[str] = None) -> str:
+        """
+        Spools the upload to disk, records a queued job and hands it to the worker pool.
+        Without a document key, the upload is keyed by its content hash.
+
+        Returns:
+            str: The id of the new job.
+        """
+        job_id = str(uuid.uuid4())
+        os.makedirs(settings.INGESTION_SPOOL_DIR, exist_ok=True)
+        _, extension = os.path.splitext(upload_file.filename or "")
+        file_path = os.path.join(settings.INGESTION_SPOOL_DIR, f"{job_id}{extension}")
+
+        # The only copy of the upload; ingestion reads this file, and the hash is taken while writing it.
+        upload = await SpooledUpload.from_upload(upload_file, file_path)
+
+        await self.jobs_repository.create_job(
+            job_id, upload_file.filename, file_path, chunk_size, chunk_overlap,
+            content_sha256=upload.sha256(), document_key=document_key or upload.sha256(),
+        )
+        await ingestion_worker_pool.enqueue(job_id)
+        return job_id
+
+    async def get_job(self, job_id: str) -> Optional[Dict]:
+        job = await self.jobs_repository.get_job(job_id)
+        if job is None:
+            return None
+        job["job_id"] = job.pop("_id")
+        job.pop("file_path", None)
+        return job
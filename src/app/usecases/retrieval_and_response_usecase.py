@@ -6,7 +6,24 @@ from src.app.services.llm_response_service import LLMResponseService
 from src.app.services.delete_index import DeleteIndex
 from src.app.services.vector_db_service import VectorDBService
 from src.app.services.query_decomposition_service import QueryDecompositioneService
+from src.app.services.retrieval_fanout_service import RetrievalFanoutService
+from src.app.repositories.documents_repository import DocumentRepo
+from src.app.config.settings import settings
+from src.app.utils.answer_cache import semantic_answer_cache
+from src.app.services.query_planner import query_planner, query_decomposition_cache
 import asyncio
+import time
+from typing import AsyncIterator, Callable, Dict, List, Optional, Tuple
+
+# Outcomes of retrieving the raw query while it is being decomposed.
+speculation_metrics = {"reused": 0, "cancelled": 0}
+
+
+def _same_query(a: str, b: str) -> bool:
+    # Case, spacing and trailing punctuation differences do not change what is retrieved.
+    def normalize(text):
+        return " ".join(text.casefold().split()).rstrip("?.! ")
+    return normalize(a) == normalize(b)
 
 
 class RetrievalAndResponseUsecase:
@@ -18,7 +35,9 @@ class RetrievalAndResponseUsecase:
         llm_response_service: LLMResponseService = Depends(LLMResponseService),
         delete_index: DeleteIndex = Depends(DeleteIndex),
         vector_db_service: VectorDBService = Depends(VectorDBService),
-        query_decomposition_service = Depends(QueryDecompositioneService)
+        query_decomposition_service = Depends(QueryDecompositioneService),
+        retrieval_fanout_service: RetrievalFanoutService = Depends(RetrievalFanoutService),
+        documents_repository: DocumentRepo = Depends(DocumentRepo)
     ) -> None:
         self.retrieve_chunks_service = retrieve_chunks_service
         self.rrf_service = rrf_service
@@ -27,39 +46,294 @@ class RetrievalAndResponseUsecase:
         self.delete_index = delete_index
         self.vector_db_service = vector_db_service
         self.query_decomposition_service= query_decomposition_service
+        self.retrieval_fanout_service = retrieval_fanout_service
+        self.documents_repository = documents_repository
 
     async def retrieve_and_generate(self, query: str):
+        """
+        Returns (response, final chunks per sub-query, plan). The plan reports the planner's
+        decisions and the LLM calls they saved (see _plan_sub_queries), and the retrieval
+        sources that failed or timed out. An answer built without all of them is not cached.
+        """
+        if not settings.ANSWER_CACHE_ENABLED:
+            return await self._retrieve_and_generate(query)
+
+        started_at = time.perf_counter()
+        generation, query_vector, cached = await self._lookup_answer(query)
+        if cached is not None:
+            return cached["response"], cached["final_chunks"], self._cached_answer_plan(cached)
+
+        response, all_final_chunks_with_score, plan = await self._retrieve_and_generate(query)
+        await self._store_answer(
+            query, query_vector, generation, response, all_final_chunks_with_score, plan, time.perf_counter() - started_at
+        )
+        return response, all_final_chunks_with_score, plan
+
+    async def _lookup_answer(self, query: str) -> Tuple[int, list, Optional[Dict]]:
+        # Read before answering: if ingestion runs meanwhile, the entry is stored already stale.
+        generation = await self.documents_repository.get_index_generation()
+        # The query embedding is cached too, so dense retrieval on a miss does not embed again.
+        query_vector = await self.retrieve_chunks_service.generate_query_embedding(query)
+        cached = await semantic_answer_cache.lookup(query, query_vector, generation)
+        if cached is not None:
+            print(f"Answer cache hit (similarity {cached['similarity']:.3f}) for: {query}")
+        return generation, query_vector, cached
+
+    @staticmethod
+    async def _store_answer(query: str, query_vector: list, generation: int, response, final_chunks, plan: Dict, latency_seconds: float):
+        # A partial retrieval gives a worse answer, which a later, healthy request should replace.
+        if plan["retrieval_failures"]:
+            print(f"Answer not cached, retrieval sources failed: {plan['retrieval_failures']}")
+            return
+        await semantic_answer_cache.store(query, query_vector, generation, response, final_chunks, latency_seconds, plan)
+
+    @staticmethod
+    def _cached_answer_plan(cached: Dict) -> Dict:
+        """
+        The plan of a cache hit, with the same keys as a computed plan. Nothing is decomposed,
+        retrieved or synthesized; llm_calls_saved counts the calls the cached answer took: its
+        decomposition (unless that was itself cached), one answer per sub-query and the synthesis.
+        """
+        original = cached.get("plan") or {}
+        # Entries stored without a plan: one answer per chunk list, decomposed and synthesized if several.
+        sub_queries = original.get("sub_queries", len(cached["final_chunks"]) or 1)
+        synthesized = original.get("synthesize", sub_queries > 1)
+        decomposed = original.get("decompose", True) and not original.get("decomposition_cached", False)
+        return {
+            "decompose": False,
+            "reason": "cached answer",
+            "multi_passage_probability": None,
+            "decomposition_cached": False,
+            "sub_queries": sub_queries,
+            "synthesize": False,
+            "llm_calls_saved": int(decomposed) + sub_queries + int(synthesized),
+            "retrieval_failures": [],
+            "cached_answer": True,
+        }
+
+    async def stream_retrieve_and_generate(self, query: str) -> AsyncIterator[Tuple[str, Dict]]:
+        """
+        The same pipeline as retrieve_and_generate, as a stream of (event, data) pairs:
+            sub_queries - {"sub_queries", "plan"} once the query is planned (and decomposed)
+            retrieval   - {"index", "sub_query", "chunks", "images"} when a sub-query's chunks are reranked
+            sub_answer  - {"index", "sub_query", "answer"} when its Gemini answer is ready
+            delta       - {"text"} for each piece of the streamed final synthesis
+            done        - {"response", "final_chunks", "cached", "plan"} at the end; the plan
+                          includes "retrieval_failures", as in retrieve_and_generate
+        Sub-queries run concurrently, so their events arrive in completion order. A cached
+        answer, or the answer of a single sub-query, is sent as a single delta. If the consumer stops early, the work is cancelled.
+        """
+        started_at = time.perf_counter()
+        if settings.ANSWER_CACHE_ENABLED:
+            generation, query_vector, cached = await self._lookup_answer(query)
+            if cached is not None:
+                yield "delta", {"text": cached["response"]}
+                yield "done", {
+                    "response": cached["response"], "final_chunks": cached["final_chunks"], "cached": True,
+                    "plan": self._cached_answer_plan(cached),
+                }
+                return
+
+        sub_queries, retrievals, plan = await self._plan_sub_queries(query)
+        yield "sub_queries", {"sub_queries": sub_queries, "plan": plan}
+
+        events: asyncio.Queue = asyncio.Queue()
+
+        async def answer(index: int, sub_query: str):
+            try:
+                def on_retrieval(chunks, images):
+                    events.put_nowait(("retrieval", {"index": index, "sub_query": sub_query, "chunks": chunks, "images": len(images)}))
+
+                result = await self._retrieve_and_generate_for_subquery(sub_query, on_retrieval, retrievals.get(index))
+                events.put_nowait(("sub_answer", {"index": index, "sub_query": sub_query, "answer": result[0]}))
+                return result
+            finally:
+                # One marker per sub-query, also on failure, so the loop below knows when all are done.
+                events.put_nowait(None)
+
+        tasks = [asyncio.create_task(answer(i, sub_q)) for i, sub_q in enumerate(sub_queries)]
         try:
-            sub_queries = await self.query_decomposition_service.decompose_query(query)
+            finished = 0
+            while finished < len(tasks):
+                event = await events.get()
+                if event is None:
+                    finished += 1
+                else:
+                    yield event
+            results = await asyncio.gather(*tasks)
+        finally:
+            for task in tasks:
+                task.cancel()
+
+        sub_responses = [sub_response for sub_response, _, _ in results]
+        all_final_chunks_with_score = [final_chunks_with_score for _, final_chunks_with_score, _ in results]
+        plan["retrieval_failures"] = [failure for _, _, failures in results for failure in failures]
+        if plan["synthesize"]:
+            parts = []
+            async for text in self.llm_response_service.stream_final_response(query, sub_queries, sub_responses):
+                parts.append(text)
+                yield "delta", {"text": text}
+            response = "".join(parts).strip()
+        else:
+            response = sub_responses[0]
+            yield "delta", {"text": response}
+
+        if settings.ANSWER_CACHE_ENABLED:
+            await self._store_answer(
+                query, query_vector, generation, response, all_final_chunks_with_score, plan, time.perf_counter() - started_at
+            )
+        yield "done", {"response": response, "final_chunks": all_final_chunks_with_score, "cached": False, "plan": plan}
+
+    async def _retrieve_and_generate(self, query: str):
+        try:
+            sub_queries, retrievals, plan = await self._plan_sub_queries(query)
             
-            tasks = [self._retrieve_and_generate_for_subquery(sub_q) for sub_q in sub_queries]
+            tasks = [
+                self._retrieve_and_generate_for_subquery(sub_q, retrieval=retrievals.get(i))
+                for i, sub_q in enumerate(sub_queries)
+            ]
             results = await asyncio.gather(*tasks)
 
             all_final_chunks_with_score = []
             sub_responses = []
+            plan["retrieval_failures"] = []
             for res in results:
-                sub_response, final_chunks_with_score =  res
+                sub_response, final_chunks_with_score, failures = res
                 all_final_chunks_with_score.append(final_chunks_with_score)
                 sub_responses.append(sub_response)
-            response = await self.llm_response_service.generate_final_response(query, sub_queries, sub_responses)
+                plan["retrieval_failures"].extend(failures)
+            if plan["synthesize"]:
+                response = await self.llm_response_service.generate_final_response(query, sub_queries, sub_responses)
+            else:
+                response = sub_responses[0]
             # Delete all indexes.
             #self.delete_index.delete_all_index()
             # Return the final results.
-            return response, all_final_chunks_with_score
+            return response, all_final_chunks_with_score, plan
         
         except Exception as e:
             print(e)
             raise e
         
-    async def _retrieve_and_generate_for_subquery(self, sub_query: str):
+    @staticmethod
+    def _as_sub_queries(query: str, decomposed) -> List[str]:
+        # The decomposer answers with a list, but a query it keeps as it is comes back as a plain
+        # string; that means "answer the query itself".
+        if isinstance(decomposed, (list, tuple)):
+            sub_queries = [sub_q.strip() for sub_q in decomposed if isinstance(sub_q, str) and sub_q.strip()]
+            if sub_queries:
+                return sub_queries
+        return [query]
+
+    async def _decompose(self, query: str) -> Tuple[List[str], bool]:
+        """
+        Returns (sub-queries, whether they came from the decomposition cache). Only successful
+        decompositions are cached; a failed call falls back to the query itself.
+        """
+        async def compute():
+            decomposed = await self.query_decomposition_service.decompose_query(query)
+            if isinstance(decomposed, str) and decomposed.startswith("Error generating LLM response"):
+                raise RuntimeError(decomposed)
+            return self._as_sub_queries(query, decomposed), 1
+
         try:
-            retrieved_images = await self.retrieve_chunks_service.pinecone_retrieve_similar_chunks_images(sub_query, top_k=3)
-            dense_chunks, _, _ = await self.retrieve_chunks_service.pinecone_retrieve_similar_chunks(sub_query, 5)
-            sparse_chunks, _ = await self.retrieve_chunks_service.pinecone_retrieve_similar_chunks_s(sub_query, 5)
+            sub_queries, llm_calls = await query_decomposition_cache.get_or_compute(
+                self.query_decomposition_service.model, "decomposition", 0, query, compute
+            )
+        except RuntimeError as e:
+            print(e)
+            return [query], False
+        return list(sub_queries), llm_calls == 0
+
+    async def _plan_sub_queries(self, query: str) -> Tuple[List[str], Dict[int, asyncio.Task], Dict]:
+        """
+        Asks the local query planner whether the query needs decomposing. If it does, the query
+        is decomposed (or the cached decomposition reused) while retrieval for the query itself
+        already runs. Most queries come back unchanged, and then their retrieval no longer
+        waits for the decomposer.
+
+        Returns:
+            The sub-queries; the speculative retrieval task keyed by the index of every
+            sub-query equal to the original query (without such a sub-query it is cancelled);
+            and the plan: {"decompose", "reason", "multi_passage_probability",
+            "decomposition_cached", "sub_queries", "synthesize", "llm_calls_saved", "cached_answer"}.
+            A final synthesis is only planned for more than one sub-query.
+        """
+        if settings.QUERY_PLANNER_ENABLED:
+            plan = query_planner.plan(query)
+        else:
+            plan = {"decompose": True, "reason": "planner disabled", "multi_passage_probability": None}
+
+        retrievals = {}
+        if not plan["decompose"]:
+            sub_queries, cached = [query], False
+        elif not settings.SPECULATIVE_RETRIEVAL_ENABLED:
+            sub_queries, cached = await self._decompose(query)
+        else:
+            speculative = asyncio.create_task(self._retrieve(query))
+            try:
+                sub_queries, cached = await self._decompose(query)
+            except BaseException:
+                speculative.cancel()
+                raise
+
+            matching = [i for i, sub_q in enumerate(sub_queries) if _same_query(sub_q, query)]
+            if matching:
+                speculation_metrics["reused"] += 1
+                retrievals = {i: speculative for i in matching}
+            else:
+                speculative.cancel()
+                speculation_metrics["cancelled"] += 1
+
+        plan["decomposition_cached"] = cached
+        plan["sub_queries"] = len(sub_queries)
+        plan["synthesize"] = len(sub_queries) > 1
+        plan["llm_calls_saved"] = int(not plan["decompose"] or cached) + int(not plan["synthesize"])
+        plan["cached_answer"] = False
+        return sub_queries, retrievals, plan
+
+    async def _retrieve(self, sub_query: str) -> Dict:
+        # Image, dense and sparse search are independent; run them at the same time.
+        return await self.retrieval_fanout_service.fan_out({
+            "images": lambda: self.retrieve_chunks_service.pinecone_retrieve_similar_chunks_images(sub_query, top_k=3),
+            "dense": lambda: self.retrieve_chunks_service.pinecone_retrieve_similar_chunks(sub_query, 5),
+            "sparse": lambda: self.retrieve_chunks_service.pinecone_retrieve_similar_chunks_s(sub_query, 5),
+        })
+
+    async def _retrieve_and_generate_for_subquery(self, sub_query: str, on_retrieval: Optional[Callable] = None, retrieval: Optional[asyncio.Task] = None):
+        """
+        Returns (answer, reranked chunks with scores, failures). Failures name the retrieval
+        sources that failed or timed out, as "<source>: <reason>"; the answer is then built
+        from the others.
+        """
+        try:
+            # A speculative retrieval of the same query may already be running or done.
+            fanout = await retrieval if retrieval is not None else await self._retrieve(sub_query)
+            results = fanout["results"]
+            # The retrieval services return [] instead of a tuple when they fail internally.
+            retrieved_images = results["images"] or []
+            dense_chunks = results["dense"][0] if results["dense"] else []
+            sparse_chunks = results["sparse"][0] if results["sparse"] else []
+            failures = [f"{name}: {error}" for name, error in fanout["errors"].items()]
+            failures.extend(
+                f"{name}: failed" for name in ("dense", "sparse") if name not in fanout["errors"] and not results[name]
+            )
+
             sorted_items, sorted_documents = self.rrf_service.fuse(dense_chunks, sparse_chunks)
-            final_chunks_with_score, final_chunks = await self.re_ranking_service.re_ranker(sub_query, sorted_documents)
+            # Retrieval scores let the reranker skip the remote cross-encoder where they agree.
+            signals = {
+                "dense": dict(zip(dense_chunks, results["dense"][-1])) if results["dense"] else {},
+                "sparse": dict(zip(sparse_chunks, results["sparse"][-1])) if results["sparse"] else {},
+                "rrf": dict(sorted_items),
+            }
+            if sorted_documents:
+                final_chunks_with_score, final_chunks = await self.re_ranking_service.re_ranker(sub_query, sorted_documents, signals)
+            else:
+                final_chunks_with_score, final_chunks = [], []
+            if on_retrieval is not None:
+                on_retrieval(final_chunks_with_score, retrieved_images)
             response = await self.llm_response_service.generate_response_gemini(final_chunks, sub_query, retrieved_images)
-            return response, final_chunks_with_score
+            return response, final_chunks_with_score, failures
             
         except Exception as e:
             print(e)
@@ -0,0 +1,200 @@
+import asyncio
+import fcntl
+import hashlib
+import json
+import os
+import re
+import time
+import unicodedata
+from typing import Dict, FrozenSet, List, Optional, Tuple
+
+from src.app.config.settings import settings
+from src.app.services.local_vector_index import LocalVectorIndex
+
+ANSWER_NAMESPACE = "answers"
+
+_NUMBER = re.compile(r"\d+(?:[.,]\d+)*")
+_WORD = re.compile(r"[^\W_][\w&'-]*")
+_SENTENCE_END = re.compile(r"[.?!:]\s*$")
+
+
+def query_signature(query: str) -> Tuple[FrozenSet[str], FrozenSet[str]]:
+    """
+    The numbers (years, quarters, amounts) and capitalised names in a query. The first word
+    of each sentence is skipped, since it is capitalised anyway.
+    """
+    query = unicodedata.normalize("NFKC", query)
+    numbers = frozenset(_NUMBER.findall(query))
+    names = set()
+    for match in _WORD.finditer(query):
+        word = match.group()
+        if word[0].isupper() and match.start() > 0 and not _SENTENCE_END.search(query[:match.start()]):
+            names.add(re.sub(r"'s$", "", word).lower())
+    return numbers, frozenset(names)
+
+
+class SemanticAnswerCache:
+    def __init__(self, directory: str, similarity_threshold: float, ttl_seconds: float, candidates: int = 5) -> None:
+        """
+        Caches final answers by query embedding. A new query whose embedding has a cosine
+        similarity of at least `similarity_threshold` with a cached query gets the cached
+        answer and chunks, without decomposition, retrieval or LLM calls. Embeddings barely
+        separate "revenue in 2022" from "revenue in 2023", so a cached query must also have
+        the same numbers and capitalised names (query_signature) to be a hit.
+
+        Each entry records the index generation it was answered at (see
+        DocumentRepo.get_index_generation). Entries from an older generation, or older than
+        `ttl_seconds`, are never returned and are deleted when a lookup finds them.
+
+        The cache is single-process: LocalVectorIndex keeps its row state in memory, so two
+        processes appending to one directory would corrupt it. The first process to open the
+        cache holds an exclusive flock on `<directory>/.lock` for its lifetime; in any other
+        process (e.g. further uvicorn workers) every lookup misses and nothing is stored.
+
+        Args:
+            directory (str): Where the cache's local vector index is persisted.
+            similarity_threshold (float): Minimum cosine similarity for a hit.
+            ttl_seconds (float): Maximum age of an entry.
+            candidates (int): Nearest cached queries examined per lookup.
+        """
+        self.directory = directory
+        self.similarity_threshold = similarity_threshold
+        self.ttl_seconds = ttl_seconds
+        self.candidates = candidates
+        self._index: Optional[LocalVectorIndex] = None
+        self._index_lock = asyncio.Lock()
+        self._lock_file = None
+        self._owner: Optional[bool] = None  # Whether this process holds the directory; None until opened.
+
+        self.hits = 0
+        self.misses = 0
+        self.stale_evictions = 0
+        self.signature_mismatches = 0
+        self.latency_saved_seconds = 0.0
+
+    @staticmethod
+    def make_id(query: str) -> str:
+        normalized = " ".join(unicodedata.normalize("NFKC", query).split()).lower()
+        return hashlib.sha256(normalized.encode("utf-8")).hexdigest()
+
+    def _claim_directory(self) -> bool:
+        os.makedirs(self.directory, exist_ok=True)
+        lock_file = open(os.path.join(self.directory, ".lock"), "a+b")
+        try:
+            fcntl.flock(lock_file, fcntl.LOCK_EX | fcntl.LOCK_NB)
+        except BlockingIOError:
+            lock_file.close()
+            print(f"Answer cache '{self.directory}' is used by another process; caching is off in process {os.getpid()}.")
+            return False
+        self._lock_file = lock_file
+        return True
+
+    async def _get_index(self) -> Optional[LocalVectorIndex]:
+        # Opened on first use, so importing the module does not touch the disk. None when
+        # another process owns the directory.
+        if self._owner is None:
+            async with self._index_lock:
+                if self._owner is None:
+                    if await asyncio.to_thread(self._claim_directory):
+                        self._index = await asyncio.to_thread(LocalVectorIndex, self.directory)
+                    self._owner = self._index is not None
+        return self._index
+
+    async def lookup(self, query: str, query_vector: List[float], generation: int) -> Optional[Dict]:
+        """
+        Returns {"query", "response", "final_chunks", "plan", "similarity"} of the closest valid
+        entry, or None on a miss. "plan" is the plan the answer was produced with; {} for
+        entries stored without one.
+        """
+        started_at = time.perf_counter()
+        index = await self._get_index()
+        if index is None:
+            self.misses += 1
+            return None
+        results = await index.query(
+            vector=query_vector, top_k=self.candidates, include_metadata=True, namespace=ANSWER_NAMESPACE
+        )
+
+        hit, stale_ids = None, []
+        signature = query_signature(query)
+        for match in results["matches"]:
+            if match["score"] < self.similarity_threshold:
+                break
+            metadata = match["metadata"]
+            if metadata["generation"] != generation or metadata["created_at"] + self.ttl_seconds < time.time():
+                stale_ids.append(match["id"])
+                continue
+            if query_signature(metadata["query"]) != signature:
+                # Similar wording about a different year, quarter or company.
+                self.signature_mismatches += 1
+                continue
+            hit = {
+                "query": metadata["query"],
+                "response": json.loads(metadata["response"]),
+                "final_chunks": json.loads(metadata["final_chunks"]),
+                "plan": json.loads(metadata.get("plan", "{}")),
+                "similarity": match["score"],
+            }
+            break
+
+        if stale_ids:
+            await index.delete(ids=stale_ids, namespace=ANSWER_NAMESPACE)
+            self.stale_evictions += len(stale_ids)
+
+        if hit is None:
+            self.misses += 1
+            return None
+        self.hits += 1
+        # What answering would have cost, as measured when the entry was stored, minus the lookup.
+        self.latency_saved_seconds += max(0.0, metadata["latency_seconds"] - (time.perf_counter() - started_at))
+        return hit
+
+    async def store(self, query: str, query_vector: List[float], generation: int, response, final_chunks, latency_seconds: float, plan: Optional[Dict] = None):
+        index = await self._get_index()
+        if index is None:
+            return
+        await index.upsert(
+            vectors=[{
+                "id": self.make_id(query),
+                "values": query_vector,
+                "metadata": {
+                    "query": query,
+                    "response": json.dumps(response, default=str),
+                    "final_chunks": json.dumps(final_chunks, default=str),
+                    "plan": json.dumps(plan or {}, default=str),
+                    "generation": generation,
+                    "created_at": time.time(),
+                    "latency_seconds": latency_seconds,
+                },
+            }],
+            namespace=ANSWER_NAMESPACE,
+        )
+
+    async def close(self):
+        if self._index is not None:
+            await self._index.close()
+        if self._lock_file is not None:
+            self._lock_file.close()
+            self._lock_file = None
+
+    def metrics(self) -> Dict:
+        lookups = self.hits + self.misses
+        return {
+            "entries": self._index.namespaces[ANSWER_NAMESPACE].count()
+            if self._index is not None and ANSWER_NAMESPACE in self._index.namespaces else 0,
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_ratio": round(self.hits / lookups, 3) if lookups else 0.0,
+            "stale_evictions": self.stale_evictions,
+            "signature_mismatches": self.signature_mismatches,
+            "latency_saved_seconds": round(self.latency_saved_seconds, 3),
+            "similarity_threshold": self.similarity_threshold,
+            "owner_process": self._owner,
+        }
+
+
+semantic_answer_cache = SemanticAnswerCache(
+    directory=settings.ANSWER_CACHE_DIR,
+    similarity_threshold=settings.ANSWER_CACHE_SIMILARITY_THRESHOLD,
+    ttl_seconds=settings.ANSWER_CACHE_TTL_SECONDS,
+)
@@ -0,0 +1,127 @@
+import asyncio
+from typing import Any, AsyncIterable, AsyncIterator, Awaitable, Callable, Iterable, List, Union
+
+
+async def abatch(items: Union[Iterable, AsyncIterable], batch_size: int) -> AsyncIterator[list]:
+    """
+    Groups a list, generator or async iterator into lists of at most `batch_size` items.
+    """
+    batch = []
+    if hasattr(items, "__aiter__"):
+        async for item in items:
+            batch.append(item)
+            if len(batch) == batch_size:
+                yield batch
+                batch = []
+    else:
+        for item in items:
+            batch.append(item)
+            if len(batch) == batch_size:
+                yield batch
+                batch = []
+    if batch:
+        yield batch
+
+
+class BoundedBatchPipeline:
+    def __init__(self, window: int) -> None:
+        """
+        Processes a stream of batches with at most `window` batches in flight. Once the window
+        is full the next batch is not pulled from the producer until one finishes, which gives
+        backpressure all the way up to the source.
+
+        Args:
+            window (int): Maximum number of batches processed concurrently.
+        """
+        if window < 1:
+            raise ValueError("Pipeline window must be at least 1.")
+        self.window = window
+        self.peak_in_flight = 0
+
+    async def run(self, batches: AsyncIterable[list], process: Callable[[int, list], Awaitable[Any]]) -> List[Any]:
+        """
+        Calls `process(batch_number, batch)` for every batch.
+
+        Returns:
+            List[Any]: The results of `process`, in batch order.
+        """
+        slots = asyncio.Semaphore(self.window)
+        tasks: List[asyncio.Task] = []
+        in_flight = 0
+
+        def release(task: asyncio.Task):
+            nonlocal in_flight
+            in_flight -= 1
+            slots.release()
+
+        try:
+            batch_number = 0
+            async for batch in batches:
+                await slots.acquire()
+                # Stop feeding new work as soon as an earlier batch has failed.
+                for task in tasks:
+                    if task.done() and not task.cancelled() and task.exception():
+                        raise task.exception()
+
+                in_flight += 1
+                self.peak_in_flight = max(self.peak_in_flight, in_flight)
+                task = asyncio.create_task(process(batch_number, batch))
+                task.add_done_callback(release)
+                tasks.append(task)
+                batch_number += 1
+
+            return list(await asyncio.gather(*tasks))
+
+        except BaseException:
+            for task in tasks:
+                task.cancel()
+            await asyncio.gather(*tasks, return_exceptions=True)
+            raise
+
+
+class ReplayableStream:
+    def __init__(self, source: AsyncIterable) -> None:
+        """
+        Lets several consumers read one async iterator while it is still producing. `collect()`
+        drives the source and returns every item. Each `async for` over the stream yields all
+        items from the first one, waiting for new ones until the source is exhausted. If the
+        source fails, the consumers raise as well.
+
+        Args:
+            source (AsyncIterable): The iterator to drive; it is consumed exactly once.
+        """
+        self.source = source
+        self.items: List[Any] = []
+        self.done = False
+        self.error: Union[BaseException, None] = None
+        self._changed = asyncio.Event()
+
+    def _notify(self):
+        self._changed.set()
+        self._changed = asyncio.Event()
+
+    async def collect(self) -> List[Any]:
+        try:
+            async for item in self.source:
+                self.items.append(item)
+                self._notify()
+        except BaseException as e:
+            self.error = e
+            raise
+        finally:
+            self.done = True
+            self._notify()
+        return self.items
+
+    async def __aiter__(self) -> AsyncIterator[Any]:
+        position = 0
+        while True:
+            changed = self._changed
+            while position < len(self.items):
+                yield self.items[position]
+                position += 1
+            if self.done:
+                if self.error is not None:
+                    raise RuntimeError("The stream's source failed.") from self.error
+                return
+            await changed.wait()
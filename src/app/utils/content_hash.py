@@ -0,0 +1,20 @@
+import base64
+import hashlib
+from typing import Iterable, List
+
+
+def chunk_id(text: str) -> str:
+    """
+    Vector id of a chunk: the SHA-256 of its text. Identical chunks get the same id in the dense
+    and sparse indexes, whichever document they come from.
+    """
+    return hashlib.sha256(text.encode("utf-8")).hexdigest()
+
+
+def chunk_ids(texts: Iterable[str]) -> List[str]:
+    return [chunk_id(text) for text in texts]
+
+
+def image_id(image_base64: str) -> str:
+    """Id of an extracted image: the SHA-256 of its decoded bytes."""
+    return hashlib.sha256(base64.b64decode(image_base64)).hexdigest()
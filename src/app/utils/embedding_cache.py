@@ -0,0 +1,156 @@
+import asyncio
+import hashlib
+import time
+import unicodedata
+from collections import OrderedDict
+from datetime import datetime, timedelta, timezone
+from typing import Awaitable, Callable, Dict, List, Optional, Tuple
+
+from src.app.config.database import mongodb_database
+from src.app.config.settings import settings
+
+
+class EmbeddingCache:
+    def __init__(self, max_entries: int, ttl_seconds: float, shared_collection_provider: Optional[Callable] = None) -> None:
+        """
+        Two-tier cache for query embeddings: an in-process LRU with TTL, and an optional
+        shared tier (a MongoDB collection) so that several workers reuse each other's work.
+        Concurrent lookups of the same key share a single computation. It runs in its own task,
+        so cancelling one caller (a cancelled speculative retrieval, say) only detaches that
+        caller; the others still get the result.
+
+        Args:
+            max_entries (int): Maximum entries kept in the in-process tier.
+            ttl_seconds (float): Time to live of an entry in both tiers.
+            shared_collection_provider (Callable, optional): Returns the shared-tier collection.
+        """
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+        self.shared_collection_provider = shared_collection_provider
+        self._entries: "OrderedDict[str, Tuple[float, List[float]]]" = OrderedDict()
+        self._in_flight: Dict[str, asyncio.Task] = {}
+
+        self.hits = 0
+        self.shared_hits = 0
+        self.misses = 0
+
+    @staticmethod
+    def make_key(model: str, input_type: str, dimension: int, text: str) -> str:
+        # Unicode-normalize and collapse whitespace so trivially different strings share an entry.
+        normalized = " ".join(unicodedata.normalize("NFKC", text).split())
+        raw = f"{model}\x1f{input_type}\x1f{dimension}\x1f{normalized}"
+        return hashlib.sha256(raw.encode("utf-8")).hexdigest()
+
+    def _get_local(self, key: str) -> Optional[List[float]]:
+        entry = self._entries.get(key)
+        if entry is None:
+            return None
+        expires_at, values = entry
+        if expires_at < time.monotonic():
+            del self._entries[key]
+            return None
+        self._entries.move_to_end(key)
+        return values
+
+    def _set_local(self, key: str, values: List[float]):
+        self._entries[key] = (time.monotonic() + self.ttl_seconds, values)
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+
+    async def _get_shared(self, key: str) -> Optional[List[float]]:
+        if not self.shared_collection_provider:
+            return None
+        try:
+            document = await self.shared_collection_provider().find_one(
+                {"_id": key, "expires_at": {"$gt": datetime.now(timezone.utc)}}
+            )
+            return document["values"] if document else None
+        except Exception as e:
+            print(f"Shared embedding cache lookup failed: {e}")
+            return None
+
+    async def _set_shared(self, key: str, values: List[float]):
+        if not self.shared_collection_provider:
+            return
+        try:
+            await self.shared_collection_provider().replace_one(
+                {"_id": key},
+                {"_id": key, "values": values, "expires_at": datetime.now(timezone.utc) + timedelta(seconds=self.ttl_seconds)},
+                upsert=True,
+            )
+        except Exception as e:
+            print(f"Shared embedding cache write failed: {e}")
+
+    async def get_or_compute(
+        self,
+        model: str,
+        input_type: str,
+        dimension: int,
+        text: str,
+        compute: Callable[[], Awaitable[Tuple[List[float], int]]],
+    ) -> Tuple[List[float], int]:
+        """
+        Returns the cached embedding for `text`, or calls `compute` once to produce it.
+
+        Args:
+            compute: Coroutine function returning (embedding values, tokens used).
+
+        Returns:
+            Tuple[List[float], int]: The embedding and the tokens spent (0 on a cache hit).
+        """
+        key = self.make_key(model, input_type, dimension, text)
+
+        values = self._get_local(key)
+        if values is not None:
+            self.hits += 1
+            return values, 0
+
+        # Someone else is already computing this key; wait for their result.
+        task = self._in_flight.get(key)
+        if task is not None:
+            self.hits += 1
+            values, _ = await asyncio.shield(task)
+            return values, 0
+
+        task = asyncio.create_task(self._compute(key, compute))
+        # Every caller may be gone by the time it fails; mark the exception as retrieved.
+        task.add_done_callback(lambda t: t.cancelled() or t.exception())
+        self._in_flight[key] = task
+        return await asyncio.shield(task)
+
+    async def _compute(self, key: str, compute: Callable[[], Awaitable[Tuple[List[float], int]]]) -> Tuple[List[float], int]:
+        try:
+            values = await self._get_shared(key)
+            tokens_used = 0
+            if values is not None:
+                self.shared_hits += 1
+            else:
+                self.misses += 1
+                values, tokens_used = await compute()
+                await self._set_shared(key, values)
+            self._set_local(key, values)
+            return values, tokens_used
+        finally:
+            del self._in_flight[key]
+
+    def metrics(self) -> Dict:
+        lookups = self.hits + self.shared_hits + self.misses
+        return {
+            "entries": len(self._entries),
+            "hits": self.hits,
+            "shared_hits": self.shared_hits,
+            "misses": self.misses,
+            "hit_ratio": round((self.hits + self.shared_hits) / lookups, 3) if lookups else 0.0,
+        }
+
+
+def _shared_embedding_collection():
+    return mongodb_database.get_mongo_client()[settings.MONGODB_DB_NAME][settings.MONGODB_EMBEDDING_CACHE_COLLECTION_NAME]
+
+
+query_embedding_cache = EmbeddingCache(
+    max_entries=settings.QUERY_EMBEDDING_CACHE_SIZE,
+    ttl_seconds=settings.QUERY_EMBEDDING_CACHE_TTL_SECONDS,
+    shared_collection_provider=_shared_embedding_collection if settings.QUERY_EMBEDDING_SHARED_CACHE else None,
+)
@@ -0,0 +1,114 @@
+import asyncio
+import time
+from typing import Dict
+
+from src.app.config.settings import settings
+
+PINECONE_INFERENCE = "pinecone_inference"
+GEMINI = "gemini"
+UNSTRUCTURED = "unstructured"
+
+
+class TokenBucket:
+    def __init__(self, name: str, capacity: float, refill_per_second: float) -> None:
+        """
+        A token bucket that paces callers with asyncio.sleep instead of blocking the event loop.
+
+        Args:
+            name (str): Provider name, used in metrics.
+            capacity (float): Maximum number of tokens the bucket can hold (the burst size).
+            refill_per_second (float): Number of tokens added back every second.
+        """
+        if capacity <= 0 or refill_per_second <= 0:
+            raise ValueError(f"Budget for '{name}' must be positive.")
+
+        self.name = name
+        self.capacity = float(capacity)
+        self.refill_per_second = float(refill_per_second)
+        self.tokens = float(capacity)
+        self.updated_at = time.monotonic()
+        # Waiters are served one at a time, in arrival order.
+        self._lock = asyncio.Lock()
+
+        self.queue_depth = 0
+        self.total_requests = 0
+        self.total_cost = 0.0
+        self.total_wait_seconds = 0.0
+        self.max_wait_seconds = 0.0
+
+    def _refill(self):
+        now = time.monotonic()
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated_at) * self.refill_per_second)
+        self.updated_at = now
+
+    async def acquire(self, cost: float = 1) -> float:
+        """
+        Waits until `cost` tokens are available and takes them.
+
+        A cost larger than the bucket capacity is clamped to the capacity so that a single
+        oversized batch still goes through once the bucket is full.
+
+        Returns:
+            float: Seconds spent waiting.
+        """
+        cost = min(float(cost), self.capacity)
+        started_at = time.monotonic()
+        self.queue_depth += 1
+        try:
+            async with self._lock:
+                self._refill()
+                while self.tokens < cost:
+                    await asyncio.sleep((cost - self.tokens) / self.refill_per_second)
+                    self._refill()
+                self.tokens -= cost
+        finally:
+            self.queue_depth -= 1
+
+        waited = time.monotonic() - started_at
+        self.total_requests += 1
+        self.total_cost += cost
+        self.total_wait_seconds += waited
+        self.max_wait_seconds = max(self.max_wait_seconds, waited)
+        return waited
+
+    def metrics(self) -> Dict:
+        self._refill()
+        return {
+            "capacity": self.capacity,
+            "available": round(self.tokens, 2),
+            "queue_depth": self.queue_depth,
+            "total_requests": self.total_requests,
+            "total_cost": self.total_cost,
+            "total_wait_seconds": round(self.total_wait_seconds, 3),
+            "avg_wait_seconds": round(self.total_wait_seconds / self.total_requests, 3) if self.total_requests else 0.0,
+            "max_wait_seconds": round(self.max_wait_seconds, 3),
+        }
+
+
+class IngestionScheduler:
+    def __init__(self, budgets_per_minute: Dict[str, float]) -> None:
+        """
+        Holds one token bucket per external provider used during ingestion.
+
+        Args:
+            budgets_per_minute (Dict[str, float]): Provider name -> units allowed per minute.
+        """
+        self.buckets = {
+            name: TokenBucket(name, capacity=budget, refill_per_second=budget / 60)
+            for name, budget in budgets_per_minute.items()
+        }
+
+    async def acquire(self, provider: str, cost: float = 1) -> float:
+        if provider not in self.buckets:
+            raise ValueError(f"Unknown provider '{provider}'.")
+        return await self.buckets[provider].acquire(cost)
+
+    def metrics(self) -> Dict:
+        return {name: bucket.metrics() for name, bucket in self.buckets.items()}
+
+
+ingestion_scheduler = IngestionScheduler({
+    PINECONE_INFERENCE: settings.PINECONE_INFERENCE_TOKENS_PER_MINUTE,
+    GEMINI: settings.GEMINI_REQUESTS_PER_MINUTE,
+    UNSTRUCTURED: settings.UNSTRUCTURED_REQUESTS_PER_MINUTE,
+})
@@ -0,0 +1,88 @@
+import asyncio
+import inspect
+import time
+from typing import Any, Callable, Dict, Iterable
+
+
+class StageDAG:
+    def __init__(self, progress=None) -> None:
+        """
+        A small dependency graph of async (or sync) stages. Every stage starts as soon as the
+        stages it depends on have finished, so independent branches run concurrently.
+
+        Args:
+            progress: Optional reporter with async start_stage/finish_stage/fail_stage methods.
+        """
+        self.progress = progress
+        self.stages: Dict[str, tuple] = {}
+        self.timings: Dict[str, Dict[str, float]] = {}
+
+    def add_stage(self, name: str, func: Callable, depends_on: Iterable[str] = (), run_in_thread: bool = False):
+        """
+        Registers a stage. `func` is called with the results of `depends_on`, in that order.
+
+        Args:
+            name (str): Unique stage name.
+            func (Callable): Coroutine function or plain function.
+            depends_on (Iterable[str]): Names of stages that must finish first. They must already be registered.
+            run_in_thread (bool): Run a plain (CPU-bound or blocking) function in a worker thread
+                so that it does not hold up the other branches.
+        """
+        if name in self.stages:
+            raise ValueError(f"Stage '{name}' is already registered.")
+        depends_on = tuple(depends_on)
+        for dependency in depends_on:
+            if dependency not in self.stages:
+                raise ValueError(f"Stage '{name}' depends on unknown stage '{dependency}'.")
+        self.stages[name] = (func, depends_on, run_in_thread)
+
+    async def run(self) -> Dict[str, Any]:
+        """
+        Runs every stage and returns a mapping of stage name -> result. If any stage fails,
+        the remaining stages are cancelled and the error is raised.
+        """
+        dag_started_at = time.perf_counter()
+        tasks: Dict[str, asyncio.Task] = {}
+
+        async def run_stage(name: str):
+            func, depends_on, run_in_thread = self.stages[name]
+            inputs = [await tasks[dependency] for dependency in depends_on]
+
+            if self.progress:
+                await self.progress.start_stage(name)
+            started_at = time.perf_counter()
+            try:
+                if run_in_thread:
+                    result = await asyncio.to_thread(func, *inputs)
+                else:
+                    result = func(*inputs)
+                    if inspect.isawaitable(result):
+                        result = await result
+            except Exception as e:
+                if self.progress:
+                    await self.progress.fail_stage(name, str(e))
+                raise
+            finished_at = time.perf_counter()
+
+            self.timings[name] = {
+                "started_at": round(started_at - dag_started_at, 3),
+                "duration_seconds": round(finished_at - started_at, 3),
+            }
+            if self.progress:
+                await self.progress.finish_stage(name)
+            return result
+
+        # Stages are registered after their dependencies, so insertion order is a valid topological order.
+        for name in self.stages:
+            tasks[name] = asyncio.create_task(run_stage(name))
+
+        try:
+            await asyncio.gather(*tasks.values())
+        except BaseException:
+            for task in tasks.values():
+                task.cancel()
+            await asyncio.gather(*tasks.values(), return_exceptions=True)
+            raise
+
+        self.timings["total"] = {"started_at": 0.0, "duration_seconds": round(time.perf_counter() - dag_started_at, 3)}
+        return {name: task.result() for name, task in tasks.items()}
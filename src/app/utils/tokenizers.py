@@ -0,0 +1,126 @@
+import re
+import threading
+from collections import OrderedDict
+from typing import List, Tuple
+
+from src.app.config.settings import settings
+from src.app.utils.content_hash import chunk_id
+
+Span = Tuple[int, int]
+
+
+class RegexTokenizer:
+    def __init__(self, pattern: str) -> None:
+        """
+        Tokens are the matches of `pattern`. Needs no model files or extra packages.
+
+        Args:
+            pattern (str): Regular expression matching one token.
+        """
+        self.pattern = re.compile(pattern)
+
+    def token_spans(self, text: str) -> List[Span]:
+        return [match.span() for match in self.pattern.finditer(text)]
+
+
+class HuggingFaceTokenizer:
+    def __init__(self, name: str) -> None:
+        """
+        A tokenizer from the Hugging Face hub, loaded with the `tokenizers` package (installed
+        separately). Use the tokenizer of the embedding model for exact counts.
+
+        Args:
+            name (str): Hub name or local path of a tokenizer.json.
+        """
+        try:
+            from tokenizers import Tokenizer
+        except ImportError as e:
+            raise ImportError("CHUNK_TOKENIZER='hf:...' requires the 'tokenizers' package.") from e
+        self.tokenizer = Tokenizer.from_file(name) if name.endswith(".json") else Tokenizer.from_pretrained(name)
+
+    def token_spans(self, text: str) -> List[Span]:
+        encoding = self.tokenizer.encode(text, add_special_tokens=False)
+        return [offset for offset in encoding.offsets if offset[1] > offset[0]]
+
+
+class CachedTokenizer:
+    def __init__(self, tokenizer, max_entries: int = 65536) -> None:
+        """
+        Remembers the token count of recently seen texts, so a chunk is tokenized once when
+        it is cut and its count is reused by the rate limiter and cost accounting. Counts are
+        keyed by the text's SHA-256 (its chunk id), so the cache does not hold chunk texts.
+
+        Args:
+            tokenizer: Object with token_spans(text) -> [(start, end), ...] character offsets.
+            max_entries (int): Number of counts kept, least recently used first out.
+        """
+        self.tokenizer = tokenizer
+        self.max_entries = max_entries
+        self._counts: "OrderedDict[str, int]" = OrderedDict()  # chunk_id(text) -> count
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def _remember(self, text: str, count: int):
+        key = chunk_id(text)
+        with self._lock:
+            self._counts[key] = count
+            self._counts.move_to_end(key)
+            while len(self._counts) > self.max_entries:
+                self._counts.popitem(last=False)
+
+    def token_spans(self, text: str, remember: bool = True) -> List[Span]:
+        spans = self.tokenizer.token_spans(text)
+        if remember:
+            self._remember(text, len(spans))
+        return spans
+
+    def count(self, text: str) -> int:
+        key = chunk_id(text)
+        with self._lock:
+            count = self._counts.get(key)
+            if count is not None:
+                self._counts.move_to_end(key)
+                self.hits += 1
+                return count
+            self.misses += 1
+        return len(self.token_spans(text))
+
+
+def create_tokenizer(name: str):
+    """
+    "whitespace" (the same counts as text.split()), "regex" (words and punctuation marks,
+    closer to subword counts) or "hf:<name or tokenizer.json path>".
+
+    Only "hf:" with the embedding model's tokenizer counts what the model counts. The other
+    two undercount subword tokens, so token-sized chunks can still exceed
+    EMBEDDING_MAX_INPUT_TOKENS and be truncated without a warning.
+    """
+    if name == "whitespace":
+        return RegexTokenizer(r"\S+")
+    if name == "regex":
+        return RegexTokenizer(r"\w+|[^\w\s]")
+    if name.startswith("hf:"):
+        return HuggingFaceTokenizer(name[len("hf:"):])
+    raise ValueError(f"Unknown tokenizer '{name}'.")
+
+
+# Shared by token-aware chunking and the embedding rate limiter, so both count the same way.
+chunk_tokenizer = CachedTokenizer(create_tokenizer(settings.CHUNK_TOKENIZER))
+
+
+def embedding_token_count(texts: List[str]) -> int:
+    """
+    Token count of a batch of embedding inputs, for the rate limiter and cost accounting.
+    Chunks cut in token mode are already counted, so this is a cache lookup for them.
+    """
+    total = 0
+    for text in texts:
+        count = chunk_tokenizer.count(text)
+        if count > settings.EMBEDDING_MAX_INPUT_TOKENS:
+            print(
+                f"Chunk of {count} tokens ({settings.CHUNK_TOKENIZER}) exceeds the embedding limit of "
+                f"{settings.EMBEDDING_MAX_INPUT_TOKENS} and will be truncated."
+            )
+        total += count
+    return total
@@ -0,0 +1,65 @@
+import hashlib
+import os
+import resource
+import sys
+from typing import BinaryIO, Optional
+
+from fastapi import UploadFile
+
+_COPY_BLOCK_SIZE = 1024 * 1024
+
+
+def peak_rss_mb(children: bool = False) -> float:
+    """
+    Peak resident set size of this process (or of its finished and waited-for child
+    processes) in MB. ru_maxrss is in kilobytes on Linux and in bytes on macOS.
+    """
+    usage = resource.getrusage(resource.RUSAGE_CHILDREN if children else resource.RUSAGE_SELF)
+    divisor = 1024 * 1024 if sys.platform == "darwin" else 1024
+    return round(usage.ru_maxrss / divisor, 1)
+
+
+class SpooledUpload:
+    def __init__(self, path: str, filename: str, sha256: Optional[str] = None) -> None:
+        """
+        An upload written to disk once. Every ingestion stage reads this file: conversion opens
+        it by path, image extraction streams a file handle, and hashing reads it through one
+        fixed buffer. None of them keeps its own copy of the content in memory.
+
+        Args:
+            path (str): Location of the spooled file.
+            filename (str): Original name of the upload.
+            sha256 (str, optional): Hex digest recorded while spooling; computed on first use otherwise.
+        """
+        self.path = path
+        self.filename = filename
+        self._sha256 = sha256
+
+    @classmethod
+    async def from_upload(cls, upload_file: UploadFile, path: str) -> "SpooledUpload":
+        """Copies the upload to `path` block by block and hashes it on the way."""
+        digest = hashlib.sha256()
+        with open(path, "wb") as f:
+            while block := await upload_file.read(_COPY_BLOCK_SIZE):
+                digest.update(block)
+                f.write(block)
+        return cls(path, upload_file.filename, digest.hexdigest())
+
+    @property
+    def size(self) -> int:
+        return os.path.getsize(self.path)
+
+    def sha256(self) -> str:
+        if self._sha256 is None:
+            # One reusable buffer: a memory map would count every page of the file towards RSS.
+            digest = hashlib.sha256()
+            buffer = bytearray(_COPY_BLOCK_SIZE)
+            view = memoryview(buffer)
+            with open(self.path, "rb", buffering=0) as f:
+                while read := f.readinto(buffer):
+                    digest.update(view[:read])
+            self._sha256 = digest.hexdigest()
+        return self._sha256
+
+    def open(self) -> BinaryIO:
+        return open(self.path, "rb")
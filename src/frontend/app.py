@@ -1,3 +1,5 @@
+import json
+import time
 import streamlit as st
 import requests
 import base64
@@ -9,6 +11,25 @@ st.title("RAG Application")
 # Backend endpoint URLs
 FILE_PROCESS_ENDPOINT = "http://127.0.0.1:8000/upload/"
 QUERY_RESPONSE_ENDPOINT = "http://127.0.0.1:8000/query/"
+QUERY_STREAM_ENDPOINT = "http://127.0.0.1:8000/query/stream/"
+JOB_STATUS_ENDPOINT = "http://127.0.0.1:8000/jobs/"
+
+
+def read_events(response):
+    """Yields (event, data) pairs from a server-sent event response."""
+    event, data_lines = "message", []
+    for line in response.iter_lines(decode_unicode=True):
+        if line is None:
+            continue
+        if not line:
+            if data_lines:
+                yield event, json.loads("\n".join(data_lines))
+            event, data_lines = "message", []
+        elif line.startswith("event:"):
+            event = line[len("event:"):].strip()
+        elif line.startswith("data:"):
+            data_lines.append(line[len("data:"):].strip())
+
 
 # Initialize session state variables if not present.
 if "file_processed" not in st.session_state:
@@ -27,6 +48,10 @@ if not st.session_state.file_processed:
         uploaded_file = st.file_uploader("Upload a file (.txt or .pdf)", type=["txt", "pdf"])
         chunk_size = st.number_input("Chunk Size (Characters)", min_value=100, max_value=5000, value=700, step=100)
         chunk_overlap = st.number_input("Chunk Overlap (Characters)", min_value=0, max_value=1000, value=20, step=50)
+        document_key = st.text_input(
+            "Document Key (optional)",
+            help="Uploads with the same key replace each other as versions. Leave empty to key the file by its content.",
+        )
         submit_file = st.form_submit_button("Process File")
     
     if submit_file:
@@ -38,16 +63,28 @@ if not st.session_state.file_processed:
                 "chunk_size": str(chunk_size),
                 "chunk_overlap": str(chunk_overlap)
             }
+            if document_key.strip():
+                data["document_key"] = document_key.strip()
             files = {
                 "file": (uploaded_file.name, uploaded_file.getvalue(), uploaded_file.type)
             }
             try:
                 response = requests.post(url=FILE_PROCESS_ENDPOINT, data=data, files=files)
                 if response.status_code == 200:
-                    result = response.json()
-                    st.session_state.file_processed = True
-                    st.session_state.process_result = result
-                    st.success("File processed successfully!")
+                    job_id = response.json()["job_id"]
+                    # Poll the background ingestion job until it finishes.
+                    with st.spinner("Processing file, please wait..."):
+                        while True:
+                            result = requests.get(url=JOB_STATUS_ENDPOINT + job_id).json()
+                            if result.get("status") in ("completed", "failed"):
+                                break
+                            time.sleep(2)
+                    if result["status"] == "completed":
+                        st.session_state.file_processed = True
+                        st.session_state.process_result = result
+                        st.success("File processed successfully!")
+                    else:
+                        st.error(f"File processing failed: {result.get('error')}")
                 else:
                     st.error("File processing failed with status code " + str(response.status_code))
             except Exception as e:
@@ -76,20 +113,36 @@ if st.session_state.file_processed:
             with st.chat_message("user"):
                 st.markdown(prompt)
             
-            # Send the query as form data.
+            # Send the query as form data and render the answer as it streams in.
             data = {"query": prompt}
             try:
-                response = requests.post(url=QUERY_RESPONSE_ENDPOINT, data=data)
+                response = requests.post(url=QUERY_STREAM_ENDPOINT, data=data, stream=True)
                 if response.status_code == 200:
-                    data_json = response.json()
-                    answer = data_json.get("response", "No answer provided.")
-                    final_chunks = data_json.get("final_chunks", [])
+                    answer, final_chunks = "", []
+                    with st.chat_message("assistant"):
+                        progress = st.status("Retrieving...", expanded=False)
+                        answer_placeholder = st.empty()
+                        for event, payload in read_events(response):
+                            if event == "sub_queries":
+                                progress.update(label=f"Answering {len(payload['sub_queries'])} sub-queries...")
+                            elif event == "retrieval":
+                                progress.write(f"Retrieved {len(payload['chunks'])} chunks for: {payload['sub_query']}")
+                            elif event == "sub_answer":
+                                progress.markdown(f"**{payload['sub_query']}**\n\n{payload['answer']}")
+                            elif event == "delta":
+                                answer += payload["text"]
+                                answer_placeholder.markdown(answer + "▌")
+                            elif event == "done":
+                                answer = payload.get("response") or "No answer provided."
+                                final_chunks = payload.get("final_chunks", [])
+                            elif event == "error":
+                                st.error(f"Error generating query response: {payload['detail']}")
+                        progress.update(label="Done", state="complete")
+                        answer_placeholder.markdown(answer)
                     #retrieved_images = data_json.get("retrieved_images", [])
                     
                     # Append assistant message.
                     st.session_state.messages.append({"role": "assistant", "content": answer})
-                    with st.chat_message("assistant"):
-                        st.markdown(answer)
                     
                     '''# Display retrieved images if available.
                     if retrieved_images:
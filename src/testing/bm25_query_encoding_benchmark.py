@@ -0,0 +1,68 @@
+"""
+Per-query sparse encoding latency, before and after the process-wide BM25 model.
+
+before: what each request used to do - unpickle bm25_model.pkl (SparseEmbeddingsService was
+        created per request with is_fitted=False) and call BM25Encoder.encode_queries.
+after:  a per-request SparseEmbeddingsService over the memory-mapped statistics loaded at startup.
+
+    python -m src.testing.bm25_query_encoding_benchmark --questions RAG_Evaluation_Dataset/single_passage_answer_questions.csv
+"""
+import argparse
+import csv
+import pickle
+import time
+
+import numpy as np
+
+from src.app.services.sparse_embedding_service import SparseEmbeddingsService
+
+
+def percentile_ms(samples, q):
+    return round(float(np.percentile(samples, q)) * 1000, 3)
+
+
+def time_per_query(queries, encode):
+    latencies = []
+    for query in queries:
+        started_at = time.perf_counter()
+        encode(query)
+        latencies.append(time.perf_counter() - started_at)
+    return latencies
+
+
+def encode_with_pickle(model_path):
+    def encode(query):
+        with open(model_path, "rb") as f:
+            bm25 = pickle.load(f)
+        return bm25.encode_queries(query)
+    return encode
+
+
+def encode_with_shared_model(query):
+    return SparseEmbeddingsService().generate_query_embedding(query)
+
+
+def run_benchmark(questions_path: str, model_path: str, repeat: int):
+    with open(questions_path, newline="", encoding="utf-8") as f:
+        queries = [row["question"] for row in csv.DictReader(f)] * repeat
+
+    started_at = time.perf_counter()
+    SparseEmbeddingsService.preload()
+    preload_seconds = time.perf_counter() - started_at
+
+    before = time_per_query(queries, encode_with_pickle(model_path))
+    after = time_per_query(queries, encode_with_shared_model)
+
+    print(f"queries:                  {len(queries)}")
+    print(f"startup preload:          {preload_seconds:.3f}s (once per process)")
+    print(f"before p50 / p95:         {percentile_ms(before, 50)}ms / {percentile_ms(before, 95)}ms")
+    print(f"after  p50 / p95:         {percentile_ms(after, 50)}ms / {percentile_ms(after, 95)}ms")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--questions", default="RAG_Evaluation_Dataset/single_passage_answer_questions.csv")
+    parser.add_argument("--model", default="bm25_model.pkl")
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args()
+    run_benchmark(args.questions, args.model, args.repeat)
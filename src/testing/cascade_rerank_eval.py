@@ -0,0 +1,99 @@
+"""
+Cascade reranking against full reranking on the RAG evaluation questions.
+
+For each question the dense and sparse candidates are retrieved once and fused with RRF.
+They are then reranked twice, each time with an empty score cache:
+    full:    every candidate is scored by the cross-encoder (the previous behaviour)
+    cascade: only the ambiguous band is (ReRanker.cascade_order)
+Reported: rerank calls, documents sent and time spent in rerank calls for both, and how
+often the cascade keeps the full reranker's top 1 and top 3. Needs the evaluation documents
+ingested into the configured backend (VECTOR_STORE_BACKEND / INFERENCE_BACKEND). The cascade
+is enabled for the run whatever CASCADE_RERANK_ENABLED says; try other weights and thresholds
+through the CASCADE_* environment variables.
+
+    python -m src.testing.cascade_rerank_eval --questions 100
+"""
+import argparse
+import asyncio
+import csv
+import time
+
+from src.app.config.settings import settings
+from src.app.config.vector_store import vector_store_registry
+from src.app.services.re_ranking_service import ReRanker, rerank_metrics, rerank_score_cache
+from src.app.services.retrieve_chunks_service import RetrieveChunksService
+from src.app.services.rrf import ReciprocalRankFusionService
+from src.app.services.sparse_embedding_service import SparseEmbeddingsService
+
+QUESTION_FILES = [
+    "RAG_Evaluation_Dataset/single_passage_answer_questions.csv",
+    "RAG_Evaluation_Dataset/multi_passage_answer_questions.csv",
+]
+
+
+def load_questions(limit: int):
+    questions = []
+    for path in QUESTION_FILES:
+        with open(path, encoding="utf-8") as f:
+            questions.extend(row["question"] for row in csv.DictReader(f))
+    return questions[:limit]
+
+
+async def timed_rerank(reranker, query, documents, signals):
+    rerank_score_cache._scores.clear()
+    calls, sent = rerank_metrics.remote_calls, rerank_metrics.remote_documents
+    started_at = time.perf_counter()
+    _, docs = await reranker.re_ranker(query, documents, signals)
+    return docs, time.perf_counter() - started_at, rerank_metrics.remote_calls - calls, rerank_metrics.remote_documents - sent
+
+
+async def run_eval(questions, top_k: int):
+    await vector_store_registry.connect()
+    SparseEmbeddingsService.preload()
+    retriever = RetrieveChunksService(SparseEmbeddingsService(), None, vector_store_registry)
+    reranker = ReRanker(vector_store_registry)
+    rrf = ReciprocalRankFusionService()
+
+    totals = {"full": [0.0, 0, 0], "cascade": [0.0, 0, 0]}
+    top1_agree, top3_overlap, evaluated = 0, 0, 0
+    try:
+        for query in questions:
+            dense = await retriever.pinecone_retrieve_similar_chunks(query, top_k)
+            sparse = await retriever.pinecone_retrieve_similar_chunks_s(query, top_k)
+            dense_chunks, sparse_chunks = (dense[0] if dense else []), (sparse[0] if sparse else [])
+            sorted_items, documents = rrf.fuse(dense_chunks, sparse_chunks)
+            if not documents:
+                continue
+            signals = {
+                "dense": dict(zip(dense_chunks, dense[-1])) if dense else {},
+                "sparse": dict(zip(sparse_chunks, sparse[-1])) if sparse else {},
+                "rrf": dict(sorted_items),
+            }
+
+            full_docs, *full_cost = await timed_rerank(reranker, query, documents, None)
+            cascade_docs, *cascade_cost = await timed_rerank(reranker, query, documents, signals)
+            for name, cost in (("full", full_cost), ("cascade", cascade_cost)):
+                totals[name] = [total + value for total, value in zip(totals[name], cost)]
+
+            evaluated += 1
+            top1_agree += bool(full_docs) and bool(cascade_docs) and full_docs[0] == cascade_docs[0]
+            top3_overlap += len(set(full_docs).intersection(cascade_docs))
+    finally:
+        await vector_store_registry.disconnect()
+
+    print(f"questions: {evaluated}")
+    print(f"{'':>8} {'calls':>7} {'docs':>7} {'seconds':>9}")
+    for name, (seconds, calls, sent) in totals.items():
+        print(f"{name:>8} {calls:>7} {sent:>7} {seconds:>9.3f}")
+    if evaluated:
+        print(f"top-1 agreement: {top1_agree / evaluated:.3f}")
+        print(f"top-3 overlap:   {top3_overlap / (3 * evaluated):.3f}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--questions", type=int, default=100)
+    parser.add_argument("--top-k", type=int, default=5)
+    args = parser.parse_args()
+    settings.CASCADE_RERANK_ENABLED = True
+    asyncio.run(run_eval(load_questions(args.questions), args.top_k))
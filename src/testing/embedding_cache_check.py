@@ -0,0 +1,77 @@
+"""
+Checks that EmbeddingCache.get_or_compute shares one computation between concurrent callers
+and that cancelling one caller does not fail the others. Retrieval cancels a speculative
+search when decomposition changes the query, and that search may be the caller computing
+a query embedding another request is waiting for.
+
+    python -m src.testing.embedding_cache_check
+"""
+import asyncio
+
+from src.app.utils.embedding_cache import EmbeddingCache
+
+
+def slow_compute(calls, values, delay=0.05):
+    async def compute():
+        calls.append(1)
+        await asyncio.sleep(delay)
+        return values, 7
+    return compute
+
+
+def failing_compute(calls):
+    async def compute():
+        calls.append(1)
+        await asyncio.sleep(0.05)
+        raise RuntimeError("embedding failed")
+    return compute
+
+
+async def owner_cancelled_waiter_succeeds():
+    cache, calls = EmbeddingCache(max_entries=10, ttl_seconds=60), []
+    owner = asyncio.create_task(cache.get_or_compute("m", "query", 0, "Q", slow_compute(calls, [1.0])))
+    await asyncio.sleep(0)
+    waiter = asyncio.create_task(cache.get_or_compute("m", "query", 0, "Q", slow_compute(calls, [2.0])))
+    await asyncio.sleep(0.01)
+    owner.cancel()
+
+    result = await waiter
+    assert result == ([1.0], 0), result
+    assert owner.cancelled()
+    assert len(calls) == 1, calls
+    # The finished computation is cached for later callers.
+    assert await cache.get_or_compute("m", "query", 0, "Q", slow_compute(calls, [3.0])) == ([1.0], 0)
+
+
+async def waiter_cancelled_owner_succeeds():
+    cache, calls = EmbeddingCache(max_entries=10, ttl_seconds=60), []
+    owner = asyncio.create_task(cache.get_or_compute("m", "query", 0, "Q", slow_compute(calls, [1.0])))
+    await asyncio.sleep(0)
+    waiter = asyncio.create_task(cache.get_or_compute("m", "query", 0, "Q", slow_compute(calls, [2.0])))
+    await asyncio.sleep(0.01)
+    waiter.cancel()
+
+    assert await owner == ([1.0], 7)
+    assert waiter.cancelled()
+
+
+async def failure_reaches_every_caller():
+    cache, calls = EmbeddingCache(max_entries=10, ttl_seconds=60), []
+    callers = [
+        asyncio.create_task(cache.get_or_compute("m", "query", 0, "Q", failing_compute(calls))) for _ in range(3)
+    ]
+    results = await asyncio.gather(*callers, return_exceptions=True)
+    assert all(isinstance(result, RuntimeError) for result in results), results
+    assert len(calls) == 1, calls
+    # Failures are not cached; the next call computes again.
+    assert await cache.get_or_compute("m", "query", 0, "Q", slow_compute(calls, [4.0])) == ([4.0], 7)
+
+
+async def main():
+    for check in (owner_cancelled_waiter_succeeds, waiter_cancelled_owner_succeeds, failure_reaches_every_caller):
+        await check()
+        print(f"ok  {check.__name__}")
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
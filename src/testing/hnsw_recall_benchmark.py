@@ -0,0 +1,91 @@
+"""
+Recall vs latency of the HNSW option of the local vector backend, measured against the exact
+(flat) scan of the same index over several ef_search values. Runs offline with LocalInference.
+
+    python -m src.testing.hnsw_recall_benchmark --file text.txt --ef-search 16 32 64 128
+"""
+import argparse
+import asyncio
+import shutil
+import tempfile
+import time
+
+import numpy as np
+
+from src.app.services.local_inference import LocalInference
+from src.app.services.local_vector_index import LocalVectorIndex
+from src.app.services.text_chunking_service import TextSplitters
+
+
+def percentile_ms(samples, q):
+    return round(float(np.percentile(samples, q)) * 1000, 3)
+
+
+async def timed_query(index, vector, top_k, **kwargs):
+    started_at = time.perf_counter()
+    response = await index.query(vector=vector, top_k=top_k, namespace="textportion", **kwargs)
+    return time.perf_counter() - started_at, [match["id"] for match in response["matches"]]
+
+
+async def run_benchmark(file_path: str, chunk_size: int, chunk_overlap: int, queries: int, top_k: int, ef_values, m: int, ef_construction: int):
+    with open(file_path, encoding="utf-8") as f:
+        text = f.read()
+    chunks = TextSplitters().hierarchical_markdown_chunker(text, chunk_size, chunk_overlap)
+    inference = LocalInference()
+    directory = tempfile.mkdtemp(prefix="hnsw_recall_")
+
+    try:
+        index = LocalVectorIndex(directory, dimension=1024, index_type="hnsw", hnsw_params={"m": m, "ef_construction": ef_construction})
+
+        started_at = time.perf_counter()
+        for i in range(0, len(chunks), 50):
+            batch = chunks[i:i + 50]
+            embeddings = await inference.embed("llama-text-embed-v2", batch, {"dimension": 1024})
+            await index.upsert(
+                [{"id": str(i + j), "values": e["values"]} for j, e in enumerate(embeddings)],
+                namespace="textportion",
+            )
+        build_seconds = time.perf_counter() - started_at
+
+        rng = np.random.default_rng(0)
+        query_texts = [chunks[i][:200] for i in rng.integers(0, len(chunks), size=queries)]
+        query_vectors = [
+            e.values for e in await inference.embed("llama-text-embed-v2", query_texts, {"dimension": 1024, "input_type": "query"})
+        ]
+
+        exact_latencies, truth = [], []
+        for vector in query_vectors:
+            latency, ids = await timed_query(index, vector, top_k, exact=True)
+            exact_latencies.append(latency)
+            truth.append(set(ids))
+
+        print(f"chunks: {len(chunks)}  m: {m}  ef_construction: {ef_construction}  build: {build_seconds:.3f}s")
+        print(f"{'search':>12} {'recall@' + str(top_k):>10} {'p50 ms':>9} {'p95 ms':>9}")
+        print(f"{'exact':>12} {1.0:>10.4f} {percentile_ms(exact_latencies, 50):>9} {percentile_ms(exact_latencies, 95):>9}")
+        for ef in ef_values:
+            latencies, hits = [], 0
+            for vector, expected in zip(query_vectors, truth):
+                latency, ids = await timed_query(index, vector, top_k, ef_search=ef)
+                latencies.append(latency)
+                hits += len(expected.intersection(ids))
+            recall = hits / max(sum(len(expected) for expected in truth), 1)
+            print(f"{'ef=' + str(ef):>12} {recall:>10.4f} {percentile_ms(latencies, 50):>9} {percentile_ms(latencies, 95):>9}")
+        await index.close()
+    finally:
+        shutil.rmtree(directory, ignore_errors=True)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--file", default="text.txt")
+    parser.add_argument("--chunk-size", type=int, default=700)
+    parser.add_argument("--chunk-overlap", type=int, default=20)
+    parser.add_argument("--queries", type=int, default=200)
+    parser.add_argument("--top-k", type=int, default=5)
+    parser.add_argument("--ef-search", type=int, nargs="+", default=[16, 32, 64, 128])
+    parser.add_argument("--m", type=int, default=16)
+    parser.add_argument("--ef-construction", type=int, default=200)
+    args = parser.parse_args()
+    asyncio.run(run_benchmark(
+        args.file, args.chunk_size, args.chunk_overlap, args.queries, args.top_k, args.ef_search, args.m, args.ef_construction
+    ))
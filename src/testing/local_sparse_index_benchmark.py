@@ -0,0 +1,87 @@
+"""
+Offline benchmark of LocalSparseIndex: BM25-encodes a file's chunks with SparseEmbeddingsService,
+indexes them, and compares MaxScore top-k against an exhaustive dot product.
+
+    python -m src.testing.local_sparse_index_benchmark --file text.txt --chunk-size 300
+"""
+import argparse
+import asyncio
+import shutil
+import tempfile
+import time
+
+import numpy as np
+
+from src.app.services.local_sparse_index import LocalSparseIndex
+from src.app.services.sparse_embedding_service import SparseEmbeddingsService
+from src.app.services.text_chunking_service import TextSplitters
+
+
+def percentile_ms(samples, q):
+    return round(float(np.percentile(samples, q)) * 1000, 3)
+
+
+def exhaustive_top_k(documents, query, top_k):
+    query_terms = dict(zip(query["indices"], query["values"]))
+    scores = [
+        sum(query_terms.get(term, 0.0) * value for term, value in zip(document["indices"], document["values"]))
+        for document in documents
+    ]
+    return sorted(scores, reverse=True)[:top_k]
+
+
+async def run_benchmark(file_path: str, chunk_size: int, chunk_overlap: int, queries: int, query_chars: int, top_k: int):
+    with open(file_path, encoding="utf-8") as f:
+        text = f.read()
+    chunks = TextSplitters().hierarchical_markdown_chunker(text, chunk_size, chunk_overlap)
+    sparse_service = SparseEmbeddingsService()
+    embeddings = sparse_service.generate_sparse_embeddings(chunks)
+    documents = [(chunk, embedding) for chunk, embedding in zip(chunks, embeddings) if embedding["indices"]]
+    directory = tempfile.mkdtemp(prefix="local_sparse_index_")
+
+    try:
+        index = LocalSparseIndex(directory)
+        started_at = time.perf_counter()
+        await index.upsert(
+            [{"id": str(i), "sparse_values": e, "metadata": {"text": c}} for i, (c, e) in enumerate(documents)]
+        )
+        await index.close()
+        build_seconds = time.perf_counter() - started_at
+
+        rng = np.random.default_rng(0)
+        query_vectors = [
+            sparse_service.generate_query_embedding(chunks[i][:query_chars])
+            for i in rng.integers(0, len(chunks), size=queries)
+        ]
+        query_vectors = [q for q in query_vectors if q["indices"]]
+
+        namespace = index._namespace(None)
+        latencies, mismatches = [], 0
+        for query in query_vectors:
+            started_at = time.perf_counter()
+            matches = namespace.query(query["indices"], query["values"], top_k, False, False)
+            latencies.append(time.perf_counter() - started_at)
+            expected = exhaustive_top_k([e for _, e in documents], query, top_k)
+            # Weights are stored as 16-bit fractions of the block max, so compare scores with a tolerance.
+            if not np.allclose([m["score"] for m in matches], expected, atol=1e-3):
+                mismatches += 1
+
+        print(f"documents:           {len(documents)}")
+        print(f"index build:         {build_seconds:.3f}s")
+        print(f"avg query terms:     {np.mean([len(q['indices']) for q in query_vectors]):.1f}")
+        print(f"top-{top_k} mismatches:   {mismatches}/{len(query_vectors)}")
+        print(f"query p50 / p95:     {percentile_ms(latencies, 50)}ms / {percentile_ms(latencies, 95)}ms")
+    finally:
+        shutil.rmtree(directory, ignore_errors=True)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--file", default="text.txt")
+    parser.add_argument("--chunk-size", type=int, default=300)
+    parser.add_argument("--chunk-overlap", type=int, default=20)
+    parser.add_argument("--queries", type=int, default=300)
+    parser.add_argument("--query-chars", type=int, default=40)
+    parser.add_argument("--top-k", type=int, default=5)
+    args = parser.parse_args()
+    asyncio.run(run_benchmark(args.file, args.chunk_size, args.chunk_overlap, args.queries, args.query_chars, args.top_k))
@@ -0,0 +1,69 @@
+"""
+Offline benchmark of the local vector backend: ingest + query through LocalInference and
+LocalVectorIndex, with no network access.
+
+    python -m src.testing.local_vector_index_benchmark --file text.txt --chunk-size 700
+"""
+import argparse
+import asyncio
+import shutil
+import tempfile
+import time
+
+import numpy as np
+
+from src.app.services.local_inference import LocalInference
+from src.app.services.local_vector_index import LocalVectorIndex
+from src.app.services.text_chunking_service import TextSplitters
+
+
+def percentile_ms(samples, q):
+    return round(float(np.percentile(samples, q)) * 1000, 3)
+
+
+async def run_benchmark(file_path: str, chunk_size: int, chunk_overlap: int, queries: int, top_k: int):
+    with open(file_path, encoding="utf-8") as f:
+        text = f.read()
+    chunks = TextSplitters().hierarchical_markdown_chunker(text, chunk_size, chunk_overlap)
+    inference = LocalInference()
+    directory = tempfile.mkdtemp(prefix="local_vector_index_")
+
+    try:
+        index = LocalVectorIndex(directory, dimension=1024)
+
+        started_at = time.perf_counter()
+        for i in range(0, len(chunks), 50):
+            batch = chunks[i:i + 50]
+            embeddings = await inference.embed("llama-text-embed-v2", batch, {"dimension": 1024})
+            await index.upsert(
+                [{"id": str(i + j), "values": e["values"], "metadata": {"text": t}} for j, (t, e) in enumerate(zip(batch, embeddings))],
+                namespace="textportion",
+            )
+        ingest_seconds = time.perf_counter() - started_at
+
+        rng = np.random.default_rng(0)
+        query_texts = [chunks[i][:200] for i in rng.integers(0, len(chunks), size=queries)]
+        latencies = []
+        for query in query_texts:
+            started_at = time.perf_counter()
+            embedding = await inference.embed("llama-text-embed-v2", [query], {"dimension": 1024, "input_type": "query"})
+            await index.query(vector=embedding[0].values, top_k=top_k, include_metadata=True, namespace="textportion")
+            latencies.append(time.perf_counter() - started_at)
+
+        print(f"chunks:            {len(chunks)}")
+        print(f"ingest wall time:  {ingest_seconds:.3f}s")
+        print(f"query p50 / p95:   {percentile_ms(latencies, 50)}ms / {percentile_ms(latencies, 95)}ms")
+        await index.close()
+    finally:
+        shutil.rmtree(directory, ignore_errors=True)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--file", default="text.txt")
+    parser.add_argument("--chunk-size", type=int, default=700)
+    parser.add_argument("--chunk-overlap", type=int, default=20)
+    parser.add_argument("--queries", type=int, default=200)
+    parser.add_argument("--top-k", type=int, default=5)
+    args = parser.parse_args()
+    asyncio.run(run_benchmark(args.file, args.chunk_size, args.chunk_overlap, args.queries, args.top_k))
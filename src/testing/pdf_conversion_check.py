@@ -0,0 +1,64 @@
+"""
+Checks that converting a PDF in page ranges gives the same markdown as converting it in one
+task, for both PdfConversionPool.convert and convert_stream, and prints the time of each.
+It also checks that chunking the stream part by part (PDF_STREAMING_CONVERSION) gives the
+same chunks as chunking the whole markdown.
+
+    python -m src.testing.pdf_conversion_check --file document.pdf --pages-per-task 4
+"""
+import argparse
+import asyncio
+import time
+
+import pymupdf
+
+from src.app.services.pdf_conversion_pool import PdfConversionPool
+from src.app.services.text_chunking_service import TextSplitters
+
+
+async def replay(parts):
+    for part in parts:
+        yield part
+
+
+async def check(pdf_path: str, processes: int, pages_per_task: int, chunk_size: int, chunk_overlap: int):
+    whole = PdfConversionPool(processes, pages_per_task=10**9, timeout_seconds=3600)
+    split = PdfConversionPool(processes, pages_per_task=pages_per_task, timeout_seconds=3600)
+    try:
+        started_at = time.perf_counter()
+        expected = await whole.convert(pdf_path)
+        whole_seconds = time.perf_counter() - started_at
+
+        started_at = time.perf_counter()
+        joined = await split.convert(pdf_path)
+        split_seconds = time.perf_counter() - started_at
+
+        parts = [part async for part in split.convert_stream(pdf_path)]
+    finally:
+        whole.shutdown()
+        split.shutdown()
+
+    with pymupdf.open(pdf_path) as document:
+        print(f"pages: {document.page_count}, ranges: {len(parts)}")
+    print(f"one task:    {whole_seconds:.2f}s")
+    print(f"page ranges: {split_seconds:.2f}s")
+    print(f"convert equal:        {joined == expected}")
+    print(f"convert_stream equal: {''.join(parts) == expected}")
+
+    splitter = TextSplitters()
+    streamed = [
+        chunk async for chunk in splitter.stream_hierarchical_markdown_chunks(replay(parts), chunk_size, chunk_overlap)
+    ]
+    chunks = splitter.hierarchical_markdown_chunker(expected, chunk_size, chunk_overlap)
+    print(f"streamed chunks equal: {streamed == chunks} ({len(streamed)} chunks)")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--file", required=True)
+    parser.add_argument("--processes", type=int, default=4)
+    parser.add_argument("--pages-per-task", type=int, default=8)
+    parser.add_argument("--chunk-size", type=int, default=1000)
+    parser.add_argument("--chunk-overlap", type=int, default=200)
+    args = parser.parse_args()
+    asyncio.run(check(args.file, args.processes, args.pages_per_task, args.chunk_size, args.chunk_overlap))
@@ -0,0 +1,92 @@
+"""
+Scaling of TextSplitters.split_content_with_header, before and after the offset-based rewrite.
+
+before: the previous implementation (kept below). It grew each chunk by string concatenation
+        and force-split long sentences by re-slicing the rest of the sentence.
+after:  TextSplitters.split_content_with_header.
+
+Each input is repeated 1x, 2x, 4x, ... and split as one content block, once as-is and once
+with '.', '!' and '?' removed. Without punctuation the block is one long sentence, which is
+what OCR'd tables look like. Linear scaling shows up as a flat time per MB. The outputs of
+both implementations are compared on every run.
+
+    python -m src.testing.text_splitter_benchmark --files essay.txt text.txt
+"""
+import argparse
+import re
+import time
+
+from src.app.services.text_chunking_service import TextSplitters
+
+PREFIX = "[H1] Benchmark > [H2] Section\n\n"
+
+
+def legacy_split_content_with_header(prefix: str, content: str, max_chunk_size: int, chunk_overlap: int):
+    allowed_size = max_chunk_size - len(prefix)
+    sentences = re.split(r'(?<=[.!?])\s+', content)
+    chunks = []
+    current_chunk = ""
+    i = 0
+    while i < len(sentences):
+        sentence = sentences[i]
+        candidate = sentence if not current_chunk else current_chunk + " " + sentence
+        if len(candidate) <= allowed_size:
+            current_chunk = candidate
+            i += 1
+        else:
+            if not current_chunk:
+                current_chunk = sentence[:allowed_size]
+                sentences[i] = sentence[allowed_size:]
+            chunks.append(prefix + current_chunk)
+            if chunk_overlap > 0 and len(current_chunk) > chunk_overlap:
+                current_chunk = current_chunk[-chunk_overlap:]
+            else:
+                current_chunk = ""
+    if current_chunk:
+        chunks.append(prefix + current_chunk)
+    return chunks
+
+
+def best_of(repeat, func, *args):
+    best, result = float("inf"), None
+    for _ in range(repeat):
+        started_at = time.perf_counter()
+        result = func(*args)
+        best = min(best, time.perf_counter() - started_at)
+    return best, result
+
+
+def run_benchmark(paths, max_factor: int, chunk_size: int, chunk_overlap: int, legacy_max_chars: int, repeat: int):
+    splitter = TextSplitters()
+    for path in paths:
+        with open(path, encoding="utf-8") as f:
+            text = f.read()
+        for variant, base in (("as-is", text), ("no punctuation", re.sub(r"[.!?]", "", text))):
+            print(f"\n{path} ({variant})")
+            print(f"{'size MB':>8} {'before s':>10} {'before s/MB':>12} {'after s':>10} {'after s/MB':>11}")
+            factor = 1
+            while factor <= max_factor:
+                content = " ".join([base] * factor)
+                megabytes = len(content) / 1e6
+                after, new_chunks = best_of(repeat, splitter.split_content_with_header, PREFIX, content, chunk_size, chunk_overlap)
+                if len(content) <= legacy_max_chars:
+                    before, old_chunks = best_of(repeat, legacy_split_content_with_header, PREFIX, content, chunk_size, chunk_overlap)
+                    if old_chunks != new_chunks:
+                        raise AssertionError(f"Chunks differ for {path} ({variant}) x{factor}.")
+                    before_columns = f"{before:>10.3f} {before / megabytes:>12.3f}"
+                else:
+                    before_columns = f"{'skipped':>10} {'':>12}"
+                print(f"{megabytes:>8.2f} {before_columns} {after:>10.3f} {after / megabytes:>11.3f}")
+                factor *= 2
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--files", nargs="+", default=["essay.txt", "text.txt"])
+    parser.add_argument("--max-factor", type=int, default=16)
+    parser.add_argument("--chunk-size", type=int, default=1000)
+    parser.add_argument("--chunk-overlap", type=int, default=200)
+    parser.add_argument("--legacy-max-chars", type=int, default=3_000_000, help="Skip the old implementation above this size.")
+    parser.add_argument("--repeat", type=int, default=3)
+    args = parser.parse_args()
+    run_benchmark(args.files, args.max_factor, args.chunk_size, args.chunk_overlap, args.legacy_max_chars, args.repeat)
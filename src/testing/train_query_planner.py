@@ -0,0 +1,89 @@
+"""
+Trains the query planner's classifier on RAG_Evaluation_Dataset and writes it to
+QUERY_PLANNER_MODEL_PATH.
+
+Multi-passage questions are labelled multi_passage. Single-passage and no-answer questions
+are labelled single_passage, because each names one fact. Leave-one-out results are printed
+for the classifier alone and for the full planner (rules, then classifier) at each threshold:
+accuracy, recall on multi-passage questions (a miss answers such a question without
+decomposing it), the share of queries that skip decomposition, and how many each rule routed.
+
+    python -m src.testing.train_query_planner --thresholds 0.2 0.3 0.4 0.5
+"""
+import argparse
+import csv
+from collections import Counter
+
+from src.app.config.settings import settings
+from src.app.services.query_planner import MULTI_PASSAGE, SINGLE_PASSAGE, NaiveBayesQuestionClassifier, QueryPlanner
+
+QUESTION_FILES = {
+    "RAG_Evaluation_Dataset/multi_passage_answer_questions.csv": MULTI_PASSAGE,
+    "RAG_Evaluation_Dataset/single_passage_answer_questions.csv": SINGLE_PASSAGE,
+    "RAG_Evaluation_Dataset/no_answer_questions.csv": SINGLE_PASSAGE,
+}
+
+
+def load_dataset():
+    questions, labels = [], []
+    for path, label in QUESTION_FILES.items():
+        with open(path, encoding="utf-8") as f:
+            for row in csv.DictReader(f):
+                questions.append(row["question"])
+                labels.append(label)
+    return questions, labels
+
+
+def scores(decisions, labels):
+    multi = [decompose for decompose, label in zip(decisions, labels) if label == MULTI_PASSAGE]
+    return {
+        "accuracy": sum(decompose == (label == MULTI_PASSAGE) for decompose, label in zip(decisions, labels)) / len(labels),
+        "recall": sum(multi) / len(multi) if multi else 0.0,
+        "skipped": decisions.count(False) / len(decisions),
+    }
+
+
+def leave_one_out(questions, labels, thresholds, short_query_words: int):
+    """Returns {threshold: {"classifier": scores, "planner": scores, "reasons": Counter}}."""
+    classifier_decisions = {threshold: [] for threshold in thresholds}
+    planner_decisions = {threshold: [] for threshold in thresholds}
+    reasons = {threshold: Counter() for threshold in thresholds}
+    for i, question in enumerate(questions):
+        classifier = NaiveBayesQuestionClassifier().train(questions[:i] + questions[i + 1:], labels[:i] + labels[i + 1:])
+        probability = classifier.probabilities(question).get(MULTI_PASSAGE, 0.0)
+        for threshold in thresholds:
+            classifier_decisions[threshold].append(probability >= threshold)
+            planner = QueryPlanner("", threshold, short_query_words)
+            planner._classifier, planner._loaded = classifier, True
+            plan = planner.plan(question)
+            planner_decisions[threshold].append(plan["decompose"])
+            reasons[threshold][plan["reason"]] += 1
+    return {
+        threshold: {
+            "classifier": scores(classifier_decisions[threshold], labels),
+            "planner": scores(planner_decisions[threshold], labels),
+            "reasons": reasons[threshold],
+        }
+        for threshold in thresholds
+    }
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--output", default=settings.QUERY_PLANNER_MODEL_PATH)
+    parser.add_argument("--thresholds", type=float, nargs="+", default=[settings.QUERY_PLANNER_DECOMPOSE_THRESHOLD])
+    parser.add_argument("--short-query-words", type=int, default=settings.QUERY_PLANNER_SHORT_QUERY_WORDS)
+    args = parser.parse_args()
+
+    questions, labels = load_dataset()
+    results = leave_one_out(questions, labels, args.thresholds, args.short_query_words)
+    print(f"questions: {len(questions)} ({labels.count(MULTI_PASSAGE)} multi-passage), short query rule: <= {args.short_query_words} words")
+    print(f"{'threshold':>9} {'':>10} {'accuracy':>8} {'recall':>7} {'skipped':>7}")
+    for threshold, result in results.items():
+        for name in ("classifier", "planner"):
+            score = result[name]
+            print(f"{threshold:>9} {name:>10} {score['accuracy']:>8.3f} {score['recall']:>7.3f} {score['skipped']:>7.3f}")
+        print(f"{'':>9} {'routed by':>10} {dict(result['reasons'])}")
+
+    NaiveBayesQuestionClassifier().train(questions, labels).save(args.output)
+    print(f"model written to {args.output}")
@@ -0,0 +1,99 @@
+"""
+Peak RSS of the upload handling in ingestion, before and after spooling the upload once.
+
+before: read_upload read the whole file into bytes. Conversion wrote those bytes to a temp
+        file for pymupdf, and Unstructured received the bytes.
+after:  every stage works from the spooled file. Conversion opens it by path, Unstructured
+        streams a file handle, and hashing uses one fixed buffer.
+
+Each mode runs in a fresh process because ru_maxrss is a process-wide high-water mark. It
+also carries over from the parent, so the large PDF is built in a subprocess as well. The
+network calls and the markdown conversion itself are left out; both modes open the document
+with pymupdf. Pass --copies to build a larger PDF by repeating the input.
+
+    python -m src.testing.upload_memory_benchmark --pdf IF10244.pdf --copies 200
+"""
+import argparse
+import hashlib
+import os
+import subprocess
+import sys
+import tempfile
+
+import pymupdf
+
+from src.app.utils.upload_spool import SpooledUpload, peak_rss_mb
+
+
+def build_pdf(source_path: str, copies: int, output_path: str):
+    with pymupdf.open(source_path) as source, pymupdf.open() as output:
+        for _ in range(copies):
+            output.insert_pdf(source)
+        output.save(output_path)
+
+
+def run_bytes_mode(pdf_path: str):
+    with open(pdf_path, "rb") as f:
+        content = f.read()
+    hashlib.sha256(content).hexdigest()
+    with tempfile.NamedTemporaryFile(delete=False, suffix=".pdf") as temp_pdf:
+        temp_pdf.write(content)
+    try:
+        with pymupdf.open(temp_pdf.name) as document:
+            document.page_count
+        unstructured_payload = content
+    finally:
+        os.remove(temp_pdf.name)
+    return unstructured_payload
+
+
+def run_spool_mode(pdf_path: str):
+    upload = SpooledUpload(pdf_path, os.path.basename(pdf_path))
+    upload.sha256()
+    with pymupdf.open(upload.path) as document:
+        document.page_count
+    with upload.open() as unstructured_payload:
+        os.fstat(unstructured_payload.fileno())
+
+
+def measure(mode: str, pdf_path: str):
+    baseline = peak_rss_mb()
+    if mode == "bytes":
+        run_bytes_mode(pdf_path)
+    else:
+        run_spool_mode(pdf_path)
+    print(round(peak_rss_mb() - baseline, 1))
+
+
+def run_in_subprocess(*args) -> str:
+    return subprocess.run(
+        [sys.executable, "-m", "src.testing.upload_memory_benchmark", *args],
+        capture_output=True, text=True, check=True,
+    ).stdout.strip()
+
+
+def run_benchmark(pdf_path: str, copies: int):
+    with tempfile.TemporaryDirectory() as directory:
+        if copies > 1:
+            large_pdf = os.path.join(directory, "upload.pdf")
+            run_in_subprocess("--pdf", pdf_path, "--copies", str(copies), "--build", large_pdf)
+            pdf_path = large_pdf
+
+        print(f"upload size:              {os.path.getsize(pdf_path) / (1024 * 1024):.1f} MB")
+        for mode, label in (("bytes", "before"), ("spool", "after")):
+            print(f"{label} peak RSS growth:   {run_in_subprocess('--measure', mode, '--pdf', pdf_path)} MB")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--pdf", default="IF10244.pdf")
+    parser.add_argument("--copies", type=int, default=1)
+    parser.add_argument("--measure", choices=["bytes", "spool"], help=argparse.SUPPRESS)
+    parser.add_argument("--build", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+    if args.build:
+        build_pdf(args.pdf, args.copies, args.build)
+    elif args.measure:
+        measure(args.measure, args.pdf)
+    else:
+        run_benchmark(args.pdf, args.copies)